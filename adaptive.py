@@ -0,0 +1,217 @@
+import time
+import threading
+import cv2
+import numpy as np
+from instrumentation import get_logger, metrics
+from landmarks import landmarks_to_array, array_to_landmarks
+from roi import RoiTracker
+
+# Quality levels from best to cheapest: (model_complexity, input scale, frame skip)
+LEVELS = [
+    (2, 1.0, 1),
+    (1, 1.0, 1),
+    (1, 0.75, 1),
+    (0, 0.75, 1),
+    (0, 0.5, 1),
+    (0, 0.5, 2),
+    (0, 0.5, 3),
+]
+DEFAULT_LEVEL = 1  # MediaPipe's default model complexity at full resolution
+TARGET_FPS = 15  # Inference rate the controller tries to sustain
+SMOOTHING = 0.2  # Weight of the newest latency sample in the moving average
+DOWNGRADE_MARGIN = 1.1  # Step down when latency exceeds the budget by 10%
+UPGRADE_MARGIN = 0.6  # Step up when latency is well under the budget
+SETTLE_FRAMES = 15  # Inferred frames to wait after a change before adjusting again
+MAX_EXTRAPOLATION = 0.2  # Seconds the overlay may be extrapolated past the last inference
+
+logger = get_logger(__name__)
+
+
+class LandmarkExtrapolator:
+    """Predict landmarks between inferred frames from the last two detections."""
+
+    def __init__(self):
+        self.previous = None
+        self.last = None
+
+    def update(self, timestamp, landmarks):
+        if landmarks is None:
+            self.previous = self.last = None
+            return
+        self.previous = self.last
+        self.last = (timestamp, landmarks)
+
+    def predict(self, timestamp):
+        """Return (33, 4) landmarks extrapolated linearly to the timestamp, or None."""
+        if self.last is None:
+            return None
+        last_time, last = self.last
+        if self.previous is None:
+            return last
+        previous_time, previous = self.previous
+        interval = last_time - previous_time
+        if interval <= 0:
+            return last
+        elapsed = min(timestamp - last_time, MAX_EXTRAPOLATION)
+        predicted = last + (last - previous) * (elapsed / interval)
+        predicted[:, 3] = last[:, 3]  # Visibility is not extrapolated
+        return predicted
+
+
+class AdaptiveController:
+    """
+    Keep pose inference within a latency budget by adjusting quality at runtime.
+
+    The controller tracks a moving average of ``pose.process`` latency and steps
+    through LEVELS, trading model complexity, input resolution and frame skipping
+    against the target FPS. Skipped frames reuse extrapolated landmarks so the
+    overlay keeps moving smoothly. With ``use_roi`` only the region around the
+    previous frame's landmarks is sent to MediaPipe.
+    """
+
+    def __init__(self, target_fps=TARGET_FPS, level=DEFAULT_LEVEL, static_image_mode=False,
+                 use_roi=False):
+        self.budget = 1.0 / target_fps
+        self.level = level
+        self.static_image_mode = static_image_mode
+        self.latency = None
+        self.frames_since_change = 0
+        self.frame_count = 0
+        self.pose = None
+        self.pose_settings = None
+        self.pose_level = level  # Level the current graph was built for
+        self.unavailable = set()  # Model complexities whose graph could not be created
+        self.extrapolator = LandmarkExtrapolator()
+        self.roi_tracker = RoiTracker() if use_roi else None
+        self.pose_lock = threading.Lock()  # Lets warm_up run on another thread than process
+
+    @property
+    def model_complexity(self):
+        return LEVELS[self.level][0]
+
+    @property
+    def scale(self):
+        return LEVELS[self.level][1]
+
+    @property
+    def frame_skip(self):
+        return LEVELS[self.level][2]
+
+    def describe(self):
+        """Short description of the current settings for on-screen display."""
+        latency = (self.latency or 0) * 1000
+        return (f"Model {self.model_complexity}, scale {self.scale:.2f}, "
+                f"skip {self.frame_skip}, {latency:.0f} ms")
+
+    def set_static_image_mode(self, enabled):
+        """Switch between per-frame detection and tracking; the graph is rebuilt on the next frame."""
+        self.static_image_mode = enabled
+
+    def _get_pose(self):
+        settings = (self.model_complexity, self.static_image_mode)
+        if settings != self.pose_settings:
+            # Changing complexity or mode needs a new MediaPipe graph
+            try:
+                import mediapipe as mp  # Imported on first use; it takes about a second
+                pose = mp.solutions.pose.Pose(static_image_mode=self.static_image_mode,
+                                              model_complexity=self.model_complexity)
+            except Exception as e:
+                # MediaPipe downloads the lite/heavy models on first use, which can fail offline
+                logger.error("Error loading pose model %d: %s", self.model_complexity, e)
+                self.unavailable.add(self.model_complexity)
+                self.level = self.pose_level
+                if self.pose is None:
+                    raise
+                return self.pose
+            if self.pose is not None:
+                self.pose.close()
+            self.pose = pose
+            self.pose_settings = settings
+            self.pose_level = self.level
+        return self.pose
+
+    def _step(self, direction):
+        """Move one usable level cheaper (+1) or better (-1). Returns False at the end of the range."""
+        level = self.level + direction
+        while 0 <= level < len(LEVELS):
+            if LEVELS[level][0] not in self.unavailable:
+                self.level = level
+                return True
+            level += direction
+        return False
+
+    def _adjust(self, latency):
+        """Update the latency average and move to a cheaper or better level if needed."""
+        self.latency = latency if self.latency is None else (
+            SMOOTHING * latency + (1 - SMOOTHING) * self.latency)
+        self.frames_since_change += 1
+        if self.frames_since_change < SETTLE_FRAMES:
+            return
+
+        # Skipped frames do not cost inference time, so compare per-frame cost to the budget
+        cost = self.latency / self.frame_skip
+        if cost > self.budget * DOWNGRADE_MARGIN:
+            changed = self._step(1)
+        elif cost < self.budget * UPGRADE_MARGIN:
+            changed = self._step(-1)
+        else:
+            changed = False
+        if not changed:
+            return
+        self.frames_since_change = 0
+        self.latency = None
+        logger.info("Adaptive quality changed: %s", self.describe())
+
+    def process(self, rgb_frame, timestamp=None):
+        """
+        Return pose landmarks for a frame, running inference only when the skip rate allows.
+
+        The result is a NormalizedLandmarkList (or None) like ``result.pose_landmarks``,
+        plus a flag telling whether this frame was actually inferred.
+        """
+        timestamp = time.monotonic() if timestamp is None else timestamp
+        self.frame_count += 1
+        if self.frame_count % self.frame_skip != 0:
+            predicted = self.extrapolator.predict(timestamp)
+            return (array_to_landmarks(predicted) if predicted is not None else None), False
+
+        with self.pose_lock:
+            return self._infer(rgb_frame, timestamp)
+
+    def warm_up(self, frame_shape=(480, 640, 3)):
+        """Import MediaPipe, build the graph and run one blank frame, e.g. on a background thread at startup."""
+        with self.pose_lock:
+            self._get_pose().process(np.zeros(frame_shape, dtype=np.uint8))
+
+    def _infer(self, rgb_frame, timestamp):
+        pose = self._get_pose()
+        frame_shape = rgb_frame.shape
+        if self.roi_tracker is not None:
+            rgb_frame, roi = self.roi_tracker.crop(rgb_frame)
+        if self.scale != 1.0:
+            rgb_frame = cv2.resize(rgb_frame, None, fx=self.scale, fy=self.scale,
+                                   interpolation=cv2.INTER_AREA)
+        start = time.perf_counter()
+        result = pose.process(np.ascontiguousarray(rgb_frame))
+        latency = time.perf_counter() - start
+        metrics.record("pose_process", latency)
+        self._adjust(latency)
+
+        pose_landmarks = result.pose_landmarks
+        landmarks = landmarks_to_array(pose_landmarks)
+        if self.roi_tracker is not None:
+            if landmarks is not None:
+                # Landmarks are normalized to the crop; map them back to the full frame
+                landmarks = self.roi_tracker.to_frame(landmarks, roi, frame_shape)
+                pose_landmarks = array_to_landmarks(landmarks)
+            self.roi_tracker.update(landmarks, frame_shape)
+
+        self.extrapolator.update(timestamp, landmarks)
+        return pose_landmarks, True
+
+    def close(self):
+        with self.pose_lock:
+            if self.pose is not None:
+                self.pose.close()
+                self.pose = None
+                self.pose_settings = None
@@ -0,0 +1,287 @@
+import argparse
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+import numpy as np
+from instrumentation import get_logger
+from rules import DEFAULT_RULES, RuleEngine
+
+ANALYTICS_FILE = "analytics.db"
+BATCH_SIZE = 256  # Most frames written in one transaction
+FLUSH_INTERVAL = 1.0  # Seconds a frame may wait before its batch is written
+QUEUE_SIZE = 10000  # Frames buffered for the writer; beyond that new frames are dropped
+MAX_FRAME_GAP = 0.5  # Longer gaps between frames (no pose, paused camera) do not count as time
+STUDENT_ENV = "POSE_STUDENT"  # Student name recorded by main_ui.py
+UNNAMED_POSE = "reference"  # Pose name used when the frame loop does not name its reference
+
+logger = get_logger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY, student TEXT NOT NULL, started REAL NOT NULL, ended REAL,
+    frames INTEGER NOT NULL DEFAULT 0, duration REAL NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS frames (
+    session_id TEXT NOT NULL, timestamp REAL NOT NULL, pose TEXT, similarity REAL,
+    matched INTEGER NOT NULL, hold_complete INTEGER NOT NULL, violations TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS pose_stats (
+    session_id TEXT NOT NULL, pose TEXT NOT NULL, frames INTEGER NOT NULL, similarity_sum REAL NOT NULL,
+    time_in_pose REAL NOT NULL, holds INTEGER NOT NULL, PRIMARY KEY (session_id, pose)
+);
+CREATE TABLE IF NOT EXISTS correction_stats (
+    session_id TEXT NOT NULL, rule_id TEXT NOT NULL, frames INTEGER NOT NULL,
+    PRIMARY KEY (session_id, rule_id)
+);
+CREATE INDEX IF NOT EXISTS sessions_started ON sessions (started);
+"""
+
+RULE_MESSAGES = {rule.id: rule.message for rule in DEFAULT_RULES}
+
+
+class AnalyticsStore:
+    """
+    Append-only SQLite store of per-frame session data with running aggregates.
+
+    ``record`` only puts a tuple on a queue, so the frame loop never touches the
+    database. A single writer thread drains the queue in batches: it evaluates the
+    posture rules on all the batch's poses at once, appends the frames with one
+    executemany, and adds the batch's totals to the per-pose and per-correction
+    aggregate rows. Reports read only those aggregates, so their cost does not
+    depend on how many frames a session has.
+    """
+
+    def __init__(self, path=ANALYTICS_FILE, rule_engine=None):
+        self.path = path
+        self.rule_engine = rule_engine or RuleEngine()
+        self.queue = queue.Queue(QUEUE_SIZE)
+        self.dropped = 0
+        self.last_seen = {}  # session id -> timestamp of its previous frame
+        self.local = threading.local()  # Read connections, one per reporting thread
+        self.writer = threading.Thread(target=self._writer_loop, name="analytics", daemon=True)
+        self.writer.start()
+
+    def _connect(self):
+        connection = sqlite3.connect(self.path, timeout=30)
+        connection.execute("PRAGMA journal_mode=WAL")  # Reports can read while the writer appends
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.executescript(SCHEMA)
+        return connection
+
+    def start_session(self, student, now=None):
+        """Begin a session for a student and return its ID."""
+        session_id = uuid.uuid4().hex
+        self._put(("start", session_id, student, time.time() if now is None else now))
+        return session_id
+
+    def end_session(self, session_id, now=None):
+        self._put(("end", session_id, time.time() if now is None else now))
+
+    def open_session(self, student, now=None):
+        """Begin a session and return the AnalyticsSession the frame loop records into."""
+        return AnalyticsSession(self, student, now)
+
+    def record(self, session_id, similarity, matched=False, landmarks=None, hold_complete=False, pose=None,
+               now=None):
+        """
+        Queue one frame. ``similarity`` is None for a frame without a pose; ``landmarks`` is
+        the (33, 4) pose the rules are checked on and ``pose`` names the reference pose.
+        """
+        now = time.time() if now is None else now
+        self._put(("frame", session_id, now, pose, None if similarity is None else float(similarity),
+                   bool(matched), bool(hold_complete), landmarks))
+
+    def _put(self, item):
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+            logger.warning("Analytics writer is behind; dropping frames.")
+
+    def _writer_loop(self):
+        connection = None
+        running = True
+        while running:
+            batch = [self.queue.get()]
+            deadline = time.monotonic() + FLUSH_INTERVAL
+            while len(batch) < BATCH_SIZE and batch[-1] is not None:
+                try:
+                    batch.append(self.queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            if batch[-1] is None:
+                running = False
+                batch.pop()
+            try:
+                if batch:
+                    connection = connection or self._connect()
+                    with connection:
+                        self._write(connection, batch)
+            except sqlite3.Error as e:
+                logger.error("Error writing session analytics: %s", e)
+            finally:
+                for _ in range(len(batch) + (not running)):
+                    self.queue.task_done()
+        if connection is not None:
+            connection.close()
+
+    def _write(self, connection, batch):
+        """Write one batch of queued events in a single transaction."""
+        frames = [item for item in batch if item[0] == "frame"]
+        violations = [()] * len(frames)
+        posed = [index for index, item in enumerate(frames) if item[7] is not None]
+        if posed:
+            # All of the batch's poses go through the rule engine in one vectorized call
+            mask = self.rule_engine.violations(np.stack([frames[index][7] for index in posed]))
+            for index, row in zip(posed, mask):
+                violations[index] = [self.rule_engine.ids[rule] for rule in np.flatnonzero(row)]
+
+        rows, pose_deltas, correction_deltas, session_deltas = [], {}, {}, {}
+        for item, broken in zip(frames, violations):
+            _, session_id, timestamp, pose, similarity, matched, hold_complete, _ = item
+            rows.append((session_id, timestamp, pose, similarity, int(matched), int(hold_complete),
+                         ",".join(broken)))
+            gap = timestamp - self.last_seen.get(session_id, timestamp)
+            elapsed = gap if 0 <= gap <= MAX_FRAME_GAP else 0.0
+            self.last_seen[session_id] = timestamp
+
+            frames_delta, duration = session_deltas.get(session_id, (0, 0.0))
+            session_deltas[session_id] = (frames_delta + 1, duration + elapsed)
+            if similarity is not None:
+                key = (session_id, pose or UNNAMED_POSE)
+                count, total, held, holds = pose_deltas.get(key, (0, 0.0, 0.0, 0))
+                pose_deltas[key] = (count + 1, total + similarity,
+                                                   held + (elapsed if matched else 0.0), holds + hold_complete)
+            for rule_id in broken:
+                key = (session_id, rule_id)
+                correction_deltas[key] = correction_deltas.get(key, 0) + 1
+
+        connection.executemany("INSERT OR IGNORE INTO sessions (id, student, started) VALUES (?, ?, ?)",
+                               [item[1:] for item in batch if item[0] == "start"])
+        connection.executemany("INSERT INTO frames VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+        connection.executemany(
+            "UPDATE sessions SET frames = frames + ?, duration = duration + ? WHERE id = ?",
+            [(count, duration, session_id) for session_id, (count, duration) in session_deltas.items()])
+        connection.executemany(
+            "INSERT INTO pose_stats VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (session_id, pose) DO UPDATE SET "
+            "frames = frames + excluded.frames, similarity_sum = similarity_sum + excluded.similarity_sum, "
+            "time_in_pose = time_in_pose + excluded.time_in_pose, holds = holds + excluded.holds",
+            [key + value for key, value in pose_deltas.items()])
+        connection.executemany(
+            "INSERT INTO correction_stats VALUES (?, ?, ?) ON CONFLICT (session_id, rule_id) DO UPDATE SET "
+            "frames = frames + excluded.frames",
+            [key + (count,) for key, count in correction_deltas.items()])
+        connection.executemany("UPDATE sessions SET ended = ? WHERE id = ?",
+                               [(item[2], item[1]) for item in batch if item[0] == "end"])
+        for item in batch:
+            if item[0] == "end":
+                self.last_seen.pop(item[1], None)
+
+    def flush(self):
+        """Wait until every queued frame has been written."""
+        self.queue.join()
+
+    def close(self):
+        """Write what is queued and stop the writer."""
+        self.queue.put(None)
+        self.writer.join()
+
+    def _reader(self):
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = self.local.connection = self._connect()
+        return connection
+
+    def report(self, session_id):
+        """
+        Summary of one session from the aggregate tables: time, frames, per-pose mean
+        similarity, time in pose and holds, and corrections from most to least frequent.
+        """
+        connection = self._reader()
+        session = connection.execute("SELECT student, started, ended, frames, duration FROM sessions WHERE id = ?",
+                                     (session_id,)).fetchone()
+        if session is None:
+            return None
+        student, started, ended, frames, duration = session
+        poses = [{"pose": pose, "frames": count, "mean_similarity": total / count, "time_in_pose": held,
+                  "holds": holds}
+                 for pose, count, total, held, holds in connection.execute(
+                     "SELECT pose, frames, similarity_sum, time_in_pose, holds FROM pose_stats "
+                     "WHERE session_id = ? ORDER BY time_in_pose DESC", (session_id,))]
+        corrections = [{"rule": rule_id, "message": RULE_MESSAGES.get(rule_id, rule_id), "frames": count,
+                        "share": count / frames if frames else 0.0}
+                       for rule_id, count in connection.execute(
+                           "SELECT rule_id, frames FROM correction_stats WHERE session_id = ? "
+                           "ORDER BY frames DESC", (session_id,))]
+        return {"session": session_id, "student": student, "started": started, "ended": ended,
+                "frames": frames, "duration": duration, "poses": poses, "corrections": corrections}
+
+    def class_report(self, since):
+        """Reports for every session started at or after ``since`` (a Unix time), oldest first."""
+        rows = self._reader().execute("SELECT id FROM sessions WHERE started >= ? ORDER BY started",
+                                      (since,)).fetchall()
+        return [self.report(session_id) for session_id, in rows]
+
+
+class AnalyticsSession:
+    """One student's session in an AnalyticsStore; used like a SessionRecorder."""
+
+    def __init__(self, store, student, now=None):
+        self.store = store
+        self.student = student
+        self.id = store.start_session(student, now)
+
+    def record(self, similarity, matched=False, landmarks=None, hold_complete=False, pose=None, now=None):
+        self.store.record(self.id, similarity, matched, landmarks, hold_complete, pose, now)
+
+    def record_update(self, update, pose=None, now=None):
+        """Record a PoseSession's SessionUpdate, or a frame without a pose when it is None."""
+        if update is None:
+            self.record(None, pose=pose, now=now)
+        else:
+            self.record(update.similarity, update.matched, update.landmarks, update.hold_complete, pose, now)
+
+    def close(self, now=None):
+        self.store.end_session(self.id, now)
+
+    def report(self):
+        """Summary of the session so far, once the queued frames are written."""
+        self.store.flush()
+        return self.store.report(self.id)
+
+
+def print_report(report):
+    started = time.strftime("%Y-%m-%d %H:%M", time.localtime(report["started"]))
+    print(f"{report['student']} — {started}, {report['duration'] / 60:.1f} min scored, {report['frames']} frames")
+    for pose in report["poses"]:
+        print(f"  {pose['pose']:30s} similarity {pose['mean_similarity']:.2f}  "
+              f"in pose {pose['time_in_pose']:5.1f} s  holds {pose['holds']}")
+    for correction in report["corrections"][:3]:
+        print(f"  {correction['share']:4.0%} of frames: {correction['message']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print end-of-class summaries for every student.")
+    parser.add_argument("--db", default=ANALYTICS_FILE, help="Analytics database")
+    parser.add_argument("--hours", type=float, default=12, help="Summarize sessions started in the last N hours")
+    parser.add_argument("--session", help="Summarize only this session ID")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        print(f"No analytics recorded yet ({args.db} does not exist).")
+        return
+    store = AnalyticsStore(args.db)
+    reports = [store.report(args.session)] if args.session else store.class_report(time.time() - args.hours * 3600)
+    reports = [report for report in reports if report is not None]
+    if not reports:
+        print("No sessions found.")
+    for report in reports:
+        print_report(report)
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
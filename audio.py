@@ -1,60 +1,95 @@
-import pygame
+import threading
+from instrumentation import get_logger
 
-# Initialize pygame mixer for sound
-pygame.mixer.init()
+logger = get_logger(__name__)
+
+
+def init_mixer():
+    """Initialize the pygame mixer once. Returns False when no audio device is available."""
+    # pygame is imported on first use so starting the apps does not wait for the audio system
+    import pygame
+
+    if not pygame.mixer.get_init():
+        try:
+            pygame.mixer.init()
+        except pygame.error as e:
+            logger.error("Error initializing audio mixer: %s", e)
+            return False
+    return True
 
 class BeepSoundManager:
     def __init__(self, sound_file="beep.wav"):
-        """Initialize the BeepSoundManager and load the beep sound."""
+        """Remember the beep sound; the mixer is started and the file loaded on first use."""
+        self.sound_file = sound_file
         self.beep_sound = None
-        try:
-            self.beep_sound = pygame.mixer.Sound(sound_file)
-            print(f"Sound file '{sound_file}' loaded successfully.")
-        except pygame.error as e:
-            print(f"Error loading sound file: {e}")
+        self.volume = None
+        self.loaded = False
+        self.lock = threading.Lock()
+
+    def preload(self):
+        """Start the mixer and load the beep sound now, e.g. from a background thread."""
+        with self.lock:
+            if self.loaded:
+                return self.beep_sound
+            self.loaded = True
+            if not init_mixer():
+                return None
+
+            import pygame
+            try:
+                self.beep_sound = pygame.mixer.Sound(self.sound_file)
+                logger.info("Sound file '%s' loaded successfully.", self.sound_file)
+                if self.volume is not None:
+                    self.beep_sound.set_volume(self.volume)
+            except pygame.error as e:
+                logger.error("Error loading sound file: %s", e)
+            return self.beep_sound
 
     def play_beep(self):
         """Play the beep sound."""
-        if self.beep_sound:
+        if self.preload():
             try:
                 self.beep_sound.play()
-                print("Beep sound played.")
+                logger.debug("Beep sound played.")
             except Exception as e:
-                print(f"Error playing beep sound: {e}")
+                logger.error("Error playing beep sound: %s", e)
         else:
-            print("No sound file loaded.")
+            logger.warning("No sound file loaded.")
 
     def set_volume(self, volume):
         """Set the volume of the beep sound.
-        
+
         Args:
             volume (float): Volume level between 0.0 (mute) and 1.0 (max volume).
         """
-        if self.beep_sound:
+        self.volume = volume
+        if self.preload():
             try:
                 self.beep_sound.set_volume(volume)
-                print(f"Volume set to {volume}.")
+                logger.debug("Volume set to %s.", volume)
             except Exception as e:
-                print(f"Error setting volume: {e}")
+                logger.error("Error setting volume: %s", e)
         else:
-            print("No sound file loaded.")
+            logger.warning("No sound file loaded.")
 
     def stop_beep(self):
         """Stop the beep sound if it's playing."""
         if self.beep_sound:
             try:
                 self.beep_sound.stop()
-                print("Beep sound stopped.")
+                logger.debug("Beep sound stopped.")
             except Exception as e:
-                print(f"Error stopping beep sound: {e}")
+                logger.error("Error stopping beep sound: %s", e)
         else:
-            print("No sound file loaded.")
+            logger.warning("No sound file loaded.")
 
 # Example usage
 if __name__ == "__main__":
+    import pygame
+
     sound_manager = BeepSoundManager("beep.wav")
     sound_manager.set_volume(0.5)
     sound_manager.play_beep()
     # Let the sound play for a while
     pygame.time.wait(2000)  # Wait for 2 seconds
-    sound_manager.stop_beep()
\ No newline at end of file
+    sound_manager.stop_beep()
@@ -0,0 +1,159 @@
+import argparse
+import os
+import cv2
+import numpy as np
+import pose_workers
+from landmarks import NUM_LANDMARKS, LANDMARK_FIELDS, landmarks_to_array
+from reference_cache import ReferenceCache
+from similarity import batch_similarity
+
+VIDEO_EXTENSIONS = (".mp4", ".avi", ".mov", ".mkv", ".webm")
+CHUNK_FRAMES = 300  # Frames per job; long videos are split so all cores stay busy
+FRAME_SIZE = (640, 480)  # Same size the live webcam loops use
+
+def find_videos(paths):
+    """Expand a list of files and directories into the video files they contain."""
+    videos = []
+    for path in paths:
+        if os.path.isdir(path):
+            videos.extend(
+                os.path.join(path, f)
+                for f in sorted(os.listdir(path))
+                if f.lower().endswith(VIDEO_EXTENSIONS)
+            )
+        else:
+            videos.append(path)
+    return videos
+
+
+def plan_chunks(video_path, chunk_frames=CHUNK_FRAMES):
+    """Split a video into (path, start, end) frame ranges."""
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        print(f"Error: Could not open video {video_path}.")
+        return []
+    frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+    return [
+        (video_path, start, min(start + chunk_frames, frame_count))
+        for start in range(0, frame_count, chunk_frames)
+    ]
+
+
+def analyze_chunk(chunk):
+    """Decode a range of frames and run pose detection on each (runs in a worker process)."""
+    video_path, start, end = chunk
+    pose_workers.worker_pose.reset()  # Chunks are unrelated; never track on from the previous chunk's person
+    count = end - start
+    timestamps = np.zeros(count, dtype=np.float64)
+    landmarks = np.zeros((count, NUM_LANDMARKS, LANDMARK_FIELDS), dtype=np.float32)
+    detected = np.zeros(count, dtype=bool)
+
+    cap = cv2.VideoCapture(video_path)
+    cap.set(cv2.CAP_PROP_POS_FRAMES, start)
+    read = 0
+    for index in range(count):
+        ret, frame = cap.read()
+        if not ret:
+            break
+        read += 1
+        timestamps[index] = cap.get(cv2.CAP_PROP_POS_MSEC)
+        frame = cv2.resize(frame, FRAME_SIZE)
+        result = pose_workers.worker_pose.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        if result.pose_landmarks:
+            landmarks[index] = landmarks_to_array(result.pose_landmarks)
+            detected[index] = True
+    cap.release()
+    return video_path, start, timestamps[:read], landmarks[:read], detected[:read]
+
+
+def output_names(video_paths):
+    """
+    Results file name (without extension) for every video. Videos with the same file name
+    in different folders get their folders as a prefix, e.g. 'a/class.mp4' -> 'a_class'.
+    """
+    stems = [os.path.splitext(os.path.basename(path))[0] for path in video_paths]
+    duplicates = {stem for stem in stems if stems.count(stem) > 1}
+    if not duplicates:
+        return stems
+    root = os.path.commonpath([os.path.dirname(os.path.abspath(path)) for path in video_paths])
+    names = []
+    for path, stem in zip(video_paths, stems):
+        if stem in duplicates:
+            stem = os.path.splitext(os.path.relpath(os.path.abspath(path), root))[0]
+            stem = stem.replace(os.sep, "_")
+        names.append(stem)
+    return names
+
+
+def write_results(output_path, start_frames, chunks, reference_landmarks):
+    """Join a video's chunks in frame order and save them as columns in an .npz file."""
+    order = np.argsort(start_frames)
+    timestamps = np.concatenate([chunks[i][0] for i in order])
+    landmarks = np.concatenate([chunks[i][1] for i in order])
+    detected = np.concatenate([chunks[i][2] for i in order])
+
+    similarity = np.zeros(len(landmarks), dtype=np.float32)
+    if reference_landmarks is not None and detected.any():
+        similarity[detected] = batch_similarity(reference_landmarks, landmarks[detected])
+
+    np.savez(
+        output_path,
+        frame_index=np.arange(len(landmarks), dtype=np.int64),
+        timestamp_ms=timestamps,
+        detected=detected,
+        landmarks=landmarks,
+        similarity=similarity,
+    )
+    print(f"Saved {len(landmarks)} frames ({int(detected.sum())} with a pose) to {output_path}")
+
+
+def analyze_videos(video_paths, output_dir, reference_landmarks=None, workers=None,
+                   chunk_frames=CHUNK_FRAMES):
+    """Analyze videos on a process pool and write one results file per video."""
+    os.makedirs(output_dir, exist_ok=True)
+    video_paths = list(dict.fromkeys(video_paths))  # The same video given twice is analyzed once
+    chunks = [c for video in video_paths for c in plan_chunks(video, chunk_frames)]
+    if not chunks:
+        print("No frames to analyze.")
+        return
+
+    results = {}
+    with pose_workers.process_pool(workers, static_image_mode=False) as executor:
+        for video_path, start, timestamps, landmarks, detected in executor.map(analyze_chunk, chunks):
+            results.setdefault(video_path, ([], []))
+            results[video_path][0].append(start)
+            results[video_path][1].append((timestamps, landmarks, detected))
+
+    names = dict(zip(video_paths, output_names(video_paths)))
+    for video_path, (start_frames, video_chunks) in results.items():
+        write_results(os.path.join(output_dir, names[video_path] + ".npz"), start_frames, video_chunks,
+                      reference_landmarks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyze recorded yoga sessions offline.")
+    parser.add_argument("inputs", nargs="+", help="Video files or directories of videos")
+    parser.add_argument("--reference", help="Reference pose image used for similarity scores")
+    parser.add_argument("--output-dir", default="results", help="Where to write the .npz results")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--chunk-frames", type=int, default=CHUNK_FRAMES, help="Frames per job")
+    args = parser.parse_args()
+
+    reference_landmarks = None
+    if args.reference:
+        cache = ReferenceCache()
+        reference_landmarks = cache.get_or_detect(args.reference)
+        cache.save()
+        cache.close()
+        if reference_landmarks is None:
+            print("Could not detect landmarks from the reference image. Exiting.")
+            return
+
+    videos = find_videos(args.inputs)
+    print(f"Analyzing {len(videos)} video(s)...")
+    analyze_videos(videos, args.output_dir, reference_landmarks, args.workers, args.chunk_frames)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import time
+import cv2
+import mediapipe as mp
+import numpy as np
+from landmarks import landmarks_to_array
+from reference_cache import IMAGE_FOLDER, list_images
+from recording import load_recording
+from features import extract_features
+from similarity import calculate_similarity
+import feedback
+
+mp_pose = mp.solutions.pose
+mp_drawing = mp.solutions.drawing_utils
+
+FRAME_SIZE = (640, 480)  # Size the live loops resize webcam frames to
+DEFAULT_ITERATIONS = 200
+WARMUP_ITERATIONS = 5
+DEFAULT_TOLERANCE = 0.2  # Allowed p95 slowdown before a stage counts as a regression
+MIN_REGRESSION_MS = 0.05  # Ignore slowdowns smaller than this; tiny stages are dominated by timer noise
+
+
+def summarize(samples):
+    """Return latency percentiles (ms) and throughput for a list of durations in seconds."""
+    ms = np.asarray(samples) * 1000.0
+    mean = float(ms.mean())
+    return {
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p95_ms": float(np.percentile(ms, 95)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "mean_ms": mean,
+        "fps": 1000.0 / mean if mean > 0 else float("inf"),
+    }
+
+
+def time_stage(func, inputs, iterations):
+    """Call func on inputs round-robin and return the summary of its per-call latency."""
+    for i in range(WARMUP_ITERATIONS):
+        func(inputs[i % len(inputs)])
+    samples = []
+    for i in range(iterations):
+        item = inputs[i % len(inputs)]
+        start = time.perf_counter()
+        func(item)
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def load_frames(folder):
+    """Load the reference pictures as stand-in webcam frames."""
+    frames = [cv2.imread(path) for path in list_images(folder)]
+    return [frame for frame in frames if frame is not None]
+
+
+def synthetic_stream(references, length, seed=0):
+    """Jitter reference landmarks with Gaussian noise to stand in for a live landmark stream."""
+    rng = np.random.default_rng(seed)
+    base = np.stack([references[i % len(references)] for i in range(length)])
+    noise = rng.normal(0, 0.01, base.shape).astype(np.float32)
+    noise[:, :, 3] = 0  # Keep visibility untouched
+    return base + noise
+
+
+def make_photo_image_stage():
+    """Return the canvas update used by update_canvas in main_ui, or None without a display."""
+    try:
+        from tkinter import Tk, Canvas
+        from renderer import CanvasRenderer
+        root = Tk()
+        root.withdraw()
+    except Exception as e:
+        print(f"Skipping photo_image stage (no display): {e}")
+        return None
+
+    renderer = CanvasRenderer(Canvas(root, width=2 * FRAME_SIZE[0], height=FRAME_SIZE[1]), FRAME_SIZE)
+    return renderer.show_frame
+
+
+def run_benchmarks(folder=IMAGE_FOLDER, recording_path=None, iterations=DEFAULT_ITERATIONS):
+    """Run every stage of the per-frame hot path and return the results."""
+    frames = load_frames(folder)
+    if not frames:
+        raise SystemExit(f"No images found in '{folder}' to benchmark with.")
+    resized = [cv2.resize(frame, FRAME_SIZE) for frame in frames]
+    rgb_frames = [cv2.cvtColor(frame, cv2.COLOR_BGR2RGB) for frame in resized]
+
+    stages = {}
+    stages["preprocess"] = time_stage(
+        lambda frame: cv2.cvtColor(cv2.resize(frame, FRAME_SIZE), cv2.COLOR_BGR2RGB),
+        frames, iterations)
+
+    pose = mp_pose.Pose()
+    stages["pose_process"] = time_stage(pose.process, rgb_frames, iterations)
+
+    # Detected landmarks are the references for the scoring stages
+    detections = [pose.process(rgb).pose_landmarks for rgb in rgb_frames]
+    pose.close()
+    detections = [d for d in detections if d is not None]
+    if not detections:
+        raise SystemExit("No poses detected in the benchmark images.")
+    references = [landmarks_to_array(d) for d in detections]
+
+    if recording_path:
+        recording = load_recording(recording_path)
+        stream = recording.landmarks[recording.detected]
+        source = recording_path
+    else:
+        stream = synthetic_stream(references, iterations)
+        source = "synthetic"
+    if len(stream) == 0:
+        raise SystemExit("The landmark stream has no frames with a detected pose.")
+
+    reference = extract_features(references[0])  # Precomputed once, as the apps do
+    stages["similarity"] = time_stage(lambda live: calculate_similarity(reference, live),
+                                      stream, iterations)
+
+    # Keep speech out of the measurement; only the posture rules are timed
+    feedback.speak_feedback = lambda messages: None
+    stages["check_posture"] = time_stage(feedback.check_posture, stream, iterations)
+
+    stages["drawing"] = time_stage(
+        lambda i: mp_drawing.draw_landmarks(resized[i % len(resized)].copy(),
+                                            detections[i % len(detections)],
+                                            mp_pose.POSE_CONNECTIONS),
+        list(range(len(resized))), iterations)
+
+    to_photo_image = make_photo_image_stage()
+    if to_photo_image is not None:
+        stages["photo_image"] = time_stage(to_photo_image, resized, iterations)
+
+    return {
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "machine": platform.machine(),
+        "python": platform.python_version(),
+        "iterations": iterations,
+        "landmark_source": source,
+        # ru_maxrss is reported in kilobytes on Linux and bytes on macOS
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+                       / (1024 * 1024 if sys.platform == "darwin" else 1024),
+        "stages": stages,
+    }
+
+
+def print_report(results):
+    print(f"{'stage':<15}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'fps':>12}")
+    for name, stats in results["stages"].items():
+        print(f"{name:<15}{stats['p50_ms']:>10.3f}{stats['p95_ms']:>10.3f}"
+              f"{stats['p99_ms']:>10.3f}{stats['fps']:>12.1f}")
+    print(f"Peak RSS: {results['peak_rss_mb']:.1f} MB")
+
+
+def compare_to_baseline(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Return the stages whose p95 latency regressed by more than the tolerance."""
+    regressions = []
+    for name, stats in results["stages"].items():
+        previous = baseline.get("stages", {}).get(name)
+        if previous is None:
+            continue
+        slowdown = stats["p95_ms"] - previous["p95_ms"]
+        if slowdown > previous["p95_ms"] * tolerance and slowdown > MIN_REGRESSION_MS:
+            regressions.append(
+                f"{name}: p95 {stats['p95_ms']:.3f} ms vs baseline {previous['p95_ms']:.3f} ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the per-frame pose detection hot path.")
+    parser.add_argument("--images", default=IMAGE_FOLDER, help="Folder of images to use as frames")
+    parser.add_argument("--recording", help="Landmark recording to replay instead of synthetic data")
+    parser.add_argument("--iterations", type=int, default=DEFAULT_ITERATIONS)
+    parser.add_argument("--save-baseline", help="Write the results to this JSON file")
+    parser.add_argument("--baseline", help="Compare the results against this JSON file")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed p95 slowdown, e.g. 0.2 for 20%%")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.images, args.recording, args.iterations)
+    print_report(results)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.save_baseline) or ".", exist_ok=True)
+        with open(args.save_baseline, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare_to_baseline(results, baseline, args.tolerance)
+        if regressions:
+            print("Performance regressions detected:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("No regressions against the baseline.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,90 +1,88 @@
+from startup import mark  # First, so startup marks are measured from process start
+import argparse
+import json
+import threading
 import cv2
-import mediapipe as mp
 from tkinter import Tk
 from tkinter.filedialog import askopenfilename
-import numpy as np
+from functools import partial
+from pipeline import FramePipeline
+from frame_sources import WindowSink, add_source_arguments, sink_from_args, source_from_args
 from audio import BeepSoundManager  # Import BeepSoundManager from audio.py
-from feedback import check_posture, speak_feedback  # Import the feedback logic
-
-# Initialize MediaPipe Pose detection
-mp_pose = mp.solutions.pose
-mp_drawing = mp.solutions.drawing_utils
-pose = mp_pose.Pose()
+from feedback import check_posture  # Import the feedback logic (it also speaks the feedback)
+from session import PoseSession  # Smoothing, match debounce and feedback timing per student
+from recording import SessionRecorder  # Landmark recording for offline replay
+from adaptive import AdaptiveController  # Keeps live inference within a latency budget
+from landmarks import draw_pose
+from analytics import AnalyticsStore, print_report  # Per-student session analytics
+from reference_cache import pose_name
+from instrumentation import get_logger, metrics  # Per-stage latency spans and levelled logging
+from still_image import StillImageAnalyzer  # Shared, memoized still-image analysis
+
+# MediaPipe is imported and its graphs built on first use, not at import time
+analyzer = StillImageAnalyzer()  # Used for the reference image, memoized per image
+controller = AdaptiveController(use_roi=True)  # Used for the live webcam feed
 
 # Constants
 SIMILARITY_THRESHOLD = 0.7  # Threshold for pose similarity
-FEEDBACK_COOLDOWN = 5  # Cooldown period for feedback in seconds
-
-# Initialize the beep manager
-beep_manager = BeepSoundManager()
-
-def calculate_similarity(landmarks_1, landmarks_2):
-    """
-    Compare two sets of pose landmarks and calculate similarity.
-    We'll use Euclidean distance as a simple similarity measure here.
-    """
-    if not landmarks_1 or not landmarks_2:
-        return 0  # If any of the landmarks are missing, return no similarity.
 
-    # Extract x, y coordinates of landmarks from both sets
-    landmarks_1 = np.array([[lm.x, lm.y] for lm in landmarks_1.landmark])
-    landmarks_2 = np.array([[lm.x, lm.y] for lm in landmarks_2.landmark])
+logger = get_logger(__name__)
+show_overlay = False  # Draw FPS and per-stage latency on the live feed (toggle with 'o')
+feedback_messages = []  # Latest corrections, shown on the feed until the pose matches
 
-    # Calculate Euclidean distance between corresponding landmarks
-    distances = np.linalg.norm(landmarks_1 - landmarks_2, axis=1)
-    similarity_score = 1 - (np.mean(distances) / 0.5)  # Normalize the similarity
-    similarity_score = max(0, similarity_score)  # Ensure similarity isn't negative
-    return similarity_score
+# Initialize the beep manager (the sound is loaded on first use)
+beep_manager = BeepSoundManager()
 
 def detect_pose_image(image_path):
     """
     Detect pose landmarks from a reference image and return them for comparison.
     """
-    try:
-        # Load and process the image
-        image = cv2.imread(image_path)
-        if image is None:
-            print("Error: Could not read the image.")
-            return None, None
-
-        # Resize for consistent comparison
-        image = cv2.resize(image, (400, 400))
-        rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-
-        # Detect pose on the image
-        result = pose.process(rgb_image)
-        if result.pose_landmarks:
-            print("Reference image landmarks detected successfully.")
-            return image, result.pose_landmarks
-        else:
-            print("No landmarks detected in the reference image.")
-            return None, None
-    except Exception as e:
-        print(f"Error processing reference image: {e}")
+    # Same resolution and landmark cache as main_ui.py, so a reference scores the same in both
+    still = analyzer.analyze(image_path)
+    if still is None:
+        print("Error: Could not read the image.")
+        return None, None
+    if still.landmarks is not None:
+        print("Reference image landmarks detected successfully.")
+        return still.image, still.landmarks
+    else:
+        print("No landmarks detected in the reference image.")
         return None, None
 
-def process_frame(frame, reference_landmarks):
+def process_frame(frame, session, recorder=None, analytics=None, pose_name=None):
     """
     Process a single frame from the webcam feed, detect landmarks, and compare with reference.
+    The PoseSession smooths the pose and decides when feedback is due;
+    if a recorder is given, the frame's landmarks are appended to the session recording;
+    if an analytics session is given, the frame's score is logged to it.
     """
+    global feedback_messages
+    update = None
     # Resize the frame
-    frame = cv2.resize(frame, (640, 480))
-    rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-
-    # Detect landmarks in the frame
-    result = pose.process(rgb_frame)
-
-    if result.pose_landmarks:
+    with metrics.span("preprocess"):
+        frame = cv2.resize(frame, (640, 480))
+        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+    # Detect landmarks in the frame (skipped frames reuse extrapolated landmarks)
+    pose_landmarks, inferred = controller.process(rgb_frame)
+    if inferred:
+        mark("first_inference")
+    if recorder is not None and inferred:
+        recorder.append(pose_landmarks)
+
+    if pose_landmarks:
         # Draw landmarks on the frame
-        mp_drawing.draw_landmarks(frame, result.pose_landmarks, mp_pose.POSE_CONNECTIONS)
+        with metrics.span("drawing"):
+            draw_pose(frame, pose_landmarks)
 
-        # Calculate similarity with the reference image
-        similarity = calculate_similarity(reference_landmarks, result.pose_landmarks)
+        # Compare with the reference pose
+        with metrics.span("scoring"):
+            update = session.evaluate(pose_landmarks)
 
         # Overlay similarity score on the frame
         cv2.putText(
             frame,
-            f"Similarity: {similarity:.2f}",
+            f"Similarity: {update.similarity:.2f}",
             (10, 30),
             cv2.FONT_HERSHEY_SIMPLEX,
             1,
@@ -92,69 +90,120 @@ def process_frame(frame, reference_landmarks):
             2,
         )
 
-        # Trigger feedback if similarity is below the threshold
-        if similarity < SIMILARITY_THRESHOLD:
+        # Trigger feedback when the pose is off, at most once per feedback delay
+        if update.feedback_due:
             beep_manager.play_beep()
-            feedback_messages = check_posture(result.pose_landmarks.landmark)
-            for index, message in enumerate(feedback_messages):
-                cv2.putText(
-                    frame,
-                    message,
-                    (10, 60 + index * 30),  # Display feedback at an offset
-                    cv2.FONT_HERSHEY_SIMPLEX,
-                    0.6,
-                    (0, 0, 255),
-                    2,
-                )
-            if feedback_messages:
-                speak_feedback(feedback_messages)
-        else:
-            print("Pose matched. No feedback needed.")
-
+            with metrics.span("check_posture"):
+                feedback_messages = check_posture(update.landmarks)  # Smoothed, so jitter does not add corrections
+        elif update.matched:
+            feedback_messages = []
+            logger.debug("Pose matched. No feedback needed.")
+
+        # Keep showing the last corrections until the pose matches
+        for index, message in enumerate(feedback_messages):
+            cv2.putText(
+                frame,
+                message,
+                (10, 60 + index * 30),  # Display feedback at an offset
+                cv2.FONT_HERSHEY_SIMPLEX,
+                0.6,
+                (0, 0, 255),
+                2,
+            )
+
+    if analytics is not None:
+        analytics.record_update(update, pose_name)
+
+    if show_overlay:
+        metrics.overlay(frame)
     return frame
 
-def compare_webcam_to_reference(reference_image, reference_landmarks):
+def compare_webcam_to_reference(reference_image, reference_landmarks, record_path=None, student=None,
+                                pose_name=None, cap=None, sink=None):
     """
     Start a webcam feed, compare detected landmarks with the reference image landmarks in real time,
     and show webcam feed and reference image on different windows.
+    Landmarks are recorded to record_path when it is given, and scores to the analytics
+    store under the student's name when one is given. ``cap`` may be any frame source
+    (the webcam by default) and ``sink`` a NullSink to run without windows.
     """
-    cap = cv2.VideoCapture(0)  # Open webcam feed
+    global show_overlay
+    cap = cap if cap is not None else cv2.VideoCapture(0)  # Open webcam feed
+    sink = sink or WindowSink()
     if not cap.isOpened():
         print("Error: Could not open webcam.")
         return
 
-    try:
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                print("Error reading webcam frame.")
-                continue
-
-            # Process the frame
-            processed_frame = process_frame(frame, reference_landmarks)
+    recorder = SessionRecorder(record_path) if record_path else None
+    store = AnalyticsStore() if student else None
+    analytics = store.open_session(student) if store else None
 
-            # Show the live webcam feed
-            cv2.imshow("Live Webcam Feed", processed_frame)
+    # Capture and inference run on their own threads; this loop only renders
+    # The session describes the reference once and keeps the smoothing, debounce and feedback timers
+    session = PoseSession("compare", reference_image, reference_landmarks, similarity_threshold=SIMILARITY_THRESHOLD)
+    process = partial(process_frame, session=session, recorder=recorder, analytics=analytics, pose_name=pose_name)
+    pipeline = FramePipeline(cap, process)
+    pipeline.start()
 
-            # Show the reference image in another window
-            cv2.imshow("Reference Image", reference_image)
+    # Show the reference image in another window
+    sink.show("Reference Image", reference_image)
+    sink.poll_key(1)
+    mark("first_window")
 
-            # Break the loop on 'q' key press
-            if cv2.waitKey(1) & 0xFF == ord("q"):
+    try:
+        while pipeline.running:  # Until 'q', or the end of a finite source
+            # Show the latest processed webcam frame
+            processed_frame = pipeline.get(timeout=0.1)
+            with metrics.span("display"):
+                if processed_frame is not None:
+                    sink.show("Live Webcam Feed", processed_frame)
+                key = sink.poll_key(1)
+            if processed_frame is not None:
+                metrics.frame_done()
+
+            # Break the loop on 'q' key press, toggle the performance overlay with 'o'
+            if key == ord("q"):
                 print("Stopping webcam comparison...")
                 break
+            elif key == ord("o"):
+                show_overlay = not show_overlay
 
     except KeyboardInterrupt:
         print("\nKeyboard Interrupt detected. Exiting.")
     finally:
-        cap.release()
-        cv2.destroyAllWindows()
+        pipeline.stop()
+        if recorder is not None:
+            recorder.close()
+            print(f"Saved {recorder.count} frames to {record_path}")
+        if analytics is not None:
+            analytics.close()
+            print_report(analytics.report())
+            store.close()
+        sink.close()
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare your pose with a reference image.")
+    parser.add_argument("--record", help="Record the session's landmarks to this file")
+    parser.add_argument("--student", help="Log the session's scores to the analytics store under this name")
+    parser.add_argument("--overlay", action="store_true", help="Show FPS and per-stage latency on the feed")
+    parser.add_argument("--metrics", help="Append a latency summary to this JSON lines file every 10 s")
+    parser.add_argument("--reference", help="Reference image (asked for when not given)")
+    add_source_arguments(parser)
+    args = parser.parse_args()
+    show_overlay = args.overlay
+    metrics.start_export(args.metrics)
+
+    # Load MediaPipe and the beep while the user picks the reference image
+    threading.Thread(target=lambda: (analyzer.warm_up(), controller.warm_up(), mark("inference_ready"),
+                                     beep_manager.preload()),
+                     daemon=True).start()
+
     # Allow user to select the reference image
-    Tk().withdraw()  # Hide the tkinter root window
-    print("Select a reference image for comparison...")
-    reference_image_path = askopenfilename(filetypes=[("Image files", "*.jpg *.jpeg *.png")])
+    reference_image_path = args.reference
+    if not reference_image_path and not args.headless:
+        Tk().withdraw()  # Hide the tkinter root window
+        print("Select a reference image for comparison...")
+        reference_image_path = askopenfilename(filetypes=[("Image files", "*.jpg *.jpeg *.png")])
 
     if not reference_image_path:
         print("No file selected. Exiting.")
@@ -163,6 +212,11 @@ if __name__ == "__main__":
         reference_image, reference_landmarks = detect_pose_image(reference_image_path)
         if reference_landmarks is not None:
             print("Starting webcam feed for pose comparison...")
-            compare_webcam_to_reference(reference_image, reference_landmarks)
+            sink = sink_from_args(args)
+            compare_webcam_to_reference(reference_image, reference_landmarks, args.record, args.student,
+                                        pose_name(reference_image_path), source_from_args(args), sink)
+            if args.headless:
+                print(f"Run: {json.dumps(sink.summary())}")
+                print(f"Stages: {json.dumps(metrics.summary())}")
         else:
             print("Could not detect landmarks from the reference image. Exiting.")
\ No newline at end of file
@@ -0,0 +1,89 @@
+from collections import namedtuple
+import numpy as np
+from landmarks import PoseLandmark as P, landmarks_to_array
+
+# Limbs whose direction describes the pose: (from, to)
+LIMBS = [
+    (P.LEFT_SHOULDER, P.LEFT_ELBOW), (P.LEFT_ELBOW, P.LEFT_WRIST),
+    (P.RIGHT_SHOULDER, P.RIGHT_ELBOW), (P.RIGHT_ELBOW, P.RIGHT_WRIST),
+    (P.LEFT_HIP, P.LEFT_KNEE), (P.LEFT_KNEE, P.LEFT_ANKLE),
+    (P.RIGHT_HIP, P.RIGHT_KNEE), (P.RIGHT_KNEE, P.RIGHT_ANKLE),
+    (P.LEFT_SHOULDER, P.LEFT_HIP), (P.RIGHT_SHOULDER, P.RIGHT_HIP),
+    (P.LEFT_SHOULDER, P.RIGHT_SHOULDER), (P.LEFT_HIP, P.RIGHT_HIP),
+]
+
+# Joints whose bend describes the pose: (end, vertex, end)
+JOINTS = [
+    (P.LEFT_SHOULDER, P.LEFT_ELBOW, P.LEFT_WRIST), (P.RIGHT_SHOULDER, P.RIGHT_ELBOW, P.RIGHT_WRIST),
+    (P.LEFT_ELBOW, P.LEFT_SHOULDER, P.LEFT_HIP), (P.RIGHT_ELBOW, P.RIGHT_SHOULDER, P.RIGHT_HIP),
+    (P.LEFT_SHOULDER, P.LEFT_HIP, P.LEFT_KNEE), (P.RIGHT_SHOULDER, P.RIGHT_HIP, P.RIGHT_KNEE),
+    (P.LEFT_HIP, P.LEFT_KNEE, P.LEFT_ANKLE), (P.RIGHT_HIP, P.RIGHT_KNEE, P.RIGHT_ANKLE),
+]
+
+NUM_FEATURES = len(LIMBS) + len(JOINTS)  # Each feature is a 2D unit vector
+MIN_LENGTH = 1e-6  # Shorter segments have no direction and get a weight of 0
+
+_LIMB_START = np.array([limb[0] for limb in LIMBS], dtype=np.intp)
+_LIMB_END = np.array([limb[1] for limb in LIMBS], dtype=np.intp)
+_JOINT_POINTS = np.array(JOINTS, dtype=np.intp)
+
+# Weighted unit vectors flattened to (..., 2 * NUM_FEATURES) and their weights (..., NUM_FEATURES)
+PoseFeatures = namedtuple("PoseFeatures", ["weighted", "weights"])
+
+
+def _unit(vectors):
+    """Normalize (..., 2) vectors; returns the unit vectors and whether each had a length."""
+    length = np.hypot(vectors[..., 0], vectors[..., 1])
+    valid = length > MIN_LENGTH
+    with np.errstate(invalid="ignore", divide="ignore"):
+        unit = vectors / length[..., None]
+    return unit, valid
+
+
+def extract_features(landmarks):
+    """
+    Describe a pose by limb directions and joint angles, independent of position and size.
+
+    Every feature is a 2D unit vector: the image-plane direction of a limb, or
+    (cos, sin) of a joint's bend. Each is weighted by the lowest visibility of its
+    landmarks, so hidden or guessed joints barely count. Works on a single (33, 4)
+    pose or a (T, 33, 4) batch; frames without a pose (NaN) get zero weights.
+    """
+    landmarks = landmarks_to_array(landmarks)
+    points = landmarks[..., :2]
+    visibility = np.clip(landmarks[..., 3], 0, 1)
+
+    limbs, limb_valid = _unit(points[..., _LIMB_END, :] - points[..., _LIMB_START, :])
+    limb_weights = np.minimum(visibility[..., _LIMB_START], visibility[..., _LIMB_END]) * limb_valid
+
+    vertex = points[..., _JOINT_POINTS[:, 1], :]
+    first, first_valid = _unit(points[..., _JOINT_POINTS[:, 0], :] - vertex)
+    second, second_valid = _unit(points[..., _JOINT_POINTS[:, 2], :] - vertex)
+    cosine = (first * second).sum(axis=-1)
+    sine = np.abs(first[..., 0] * second[..., 1] - first[..., 1] * second[..., 0])
+    joints = np.stack([cosine, sine], axis=-1)
+    joint_weights = visibility[..., _JOINT_POINTS].min(axis=-1) * first_valid * second_valid
+
+    vectors = np.nan_to_num(np.concatenate([limbs, joints], axis=-2))
+    weights = np.nan_to_num(np.concatenate([limb_weights, joint_weights], axis=-1)).astype(np.float32)
+    weighted = (vectors * weights[..., None]).reshape(weights.shape[:-1] + (2 * NUM_FEATURES,))
+    return PoseFeatures(weighted.astype(np.float32), weights)
+
+
+def as_features(pose):
+    """Return PoseFeatures for landmarks, passing precomputed features through unchanged."""
+    return pose if isinstance(pose, PoseFeatures) else extract_features(pose)
+
+
+def feature_similarity(reference, live):
+    """
+    Visibility-weighted mean cosine between two poses' features, clipped to [0, 1].
+
+    Both arguments are PoseFeatures and broadcast, so a (R,) library can be scored
+    against one live pose, or a (T,) recording against one reference, in one call.
+    """
+    numerator = (reference.weighted * live.weighted).sum(axis=-1)
+    denominator = (reference.weights * live.weights).sum(axis=-1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        scores = np.where(denominator > 0, numerator / denominator, 0.0)
+    return np.clip(scores, 0.0, 1.0)
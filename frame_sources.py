@@ -0,0 +1,300 @@
+import os
+import time
+import cv2
+import numpy as np
+from instrumentation import get_logger
+from reference_cache import IMAGE_EXTENSIONS, list_images
+
+logger = get_logger(__name__)
+
+SOURCE_ENV = "POSE_SOURCE"  # Default frame source for the apps, e.g. "synthetic:pictures/standing.jpg"
+SYNTHETIC = "synthetic"
+FRAME_SIZE = (640, 480)  # Size of synthetic frames
+DEFAULT_FPS = 30.0
+SWAY_PIXELS = 12  # How far the synthetic person sways left and right
+SWAY_PERIOD = 4.0  # Seconds per sway
+MEMORY_SAMPLE_INTERVAL = 100  # Frames between memory samples taken by the NullSink
+
+
+class FrameSource:
+    """
+    Base for frame sources with the part of the cv2.VideoCapture API the apps use:
+    ``read()``, ``isOpened()``, ``release()`` and ``get()``.
+
+    Sources can be paced to a frame rate (``realtime``), so a pipeline sees frames
+    arrive as it would from a camera, and report ``ended`` once a finite source is
+    exhausted so pipelines can tell end-of-stream from a camera hiccup.
+    """
+
+    def __init__(self, fps=DEFAULT_FPS, realtime=True, frames=None):
+        self.fps = fps
+        self.realtime = realtime
+        self.frames = frames  # Most frames to produce, or None for no limit
+        self.count = 0  # Frames produced so far
+        self.timestamp = 0.0  # Seconds since the first frame, on the source's own clock
+        self.ended = False
+        self.released = False
+        self.next_time = None  # Wall-clock time the next frame is due
+
+    def isOpened(self):
+        return not self.released
+
+    def release(self):
+        self.released = True
+
+    def get(self, prop):
+        if prop == cv2.CAP_PROP_FPS:
+            return self.fps
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            return self.count
+        if prop == cv2.CAP_PROP_POS_MSEC:
+            return self.timestamp * 1000
+        return 0.0
+
+    def interval(self):
+        """Seconds until the next frame."""
+        return 1.0 / self.fps if self.fps else 0.0
+
+    def read(self):
+        if self.released or self.ended or (self.frames is not None and self.count >= self.frames):
+            self.ended = True
+            return False, None
+        interval = self.interval() if self.count else 0.0
+        self.timestamp += interval
+        frame = self.next_frame()
+        if frame is None:
+            self.ended = True
+            return False, None
+
+        if self.realtime:
+            now = time.monotonic()
+            self.next_time = now if self.next_time is None else self.next_time + interval
+            time.sleep(max(0.0, self.next_time - now))
+        self.count += 1
+        return True, frame
+
+    def next_frame(self):
+        """Return the next frame, or None at the end of the source."""
+        raise NotImplementedError
+
+
+class VideoFileSource(FrameSource):
+    """Frames of a video file, played at the file's own frame rate unless ``realtime`` is False."""
+
+    def __init__(self, path, realtime=True, loop=False, frames=None):
+        self.capture = cv2.VideoCapture(path)
+        super().__init__(self.capture.get(cv2.CAP_PROP_FPS) or DEFAULT_FPS, realtime, frames)
+        self.path = path
+        self.loop = loop
+
+    def isOpened(self):
+        return super().isOpened() and self.capture.isOpened()
+
+    def release(self):
+        super().release()
+        self.capture.release()
+
+    def next_frame(self):
+        ret, frame = self.capture.read()
+        if not ret and self.loop and self.count:
+            self.capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ret, frame = self.capture.read()
+        return frame if ret else None
+
+
+class ImageFolderSource(FrameSource):
+    """Images from a folder (or a list of paths) shown as frames, in name order."""
+
+    def __init__(self, paths, fps=DEFAULT_FPS, realtime=True, loop=True, frames=None):
+        super().__init__(fps, realtime, frames)
+        self.paths = list_images(paths) if isinstance(paths, str) else list(paths)
+        self.loop = loop
+        self.index = 0
+        self.path = None  # Image the last frame came from
+        self.images = {}  # path -> decoded image, so looping does not decode again
+
+    def isOpened(self):
+        return super().isOpened() and bool(self.paths)
+
+    def next_frame(self):
+        # Try each image at most once per call, so a folder of unreadable images ends the source
+        for _ in range(len(self.paths)):
+            if self.index >= len(self.paths):
+                if not self.loop:
+                    return None
+                self.index = 0
+            self.path = self.paths[self.index]
+            self.index += 1
+            image = self.images.get(self.path)
+            if image is None:
+                image = cv2.imread(self.path)
+                if image is None:
+                    logger.error("Could not read %s.", self.path)
+                    continue
+                self.images[self.path] = image
+            return image.copy()  # Callers draw on their frames
+        return None
+
+
+class SyntheticSource(FrameSource):
+    """
+    Deterministic camera simulator.
+
+    Frames are a still image (or a drawn stick figure) swaying slowly from side to
+    side, with optional sensor noise. Frame intervals are 1 / fps plus Gaussian
+    ``jitter`` (seconds), and everything random comes from ``seed``, so two runs with
+    the same settings produce identical frames at identical simulated times.
+    """
+
+    def __init__(self, image=None, fps=DEFAULT_FPS, jitter=0.0, seed=0, noise=0.0, realtime=True, frames=None,
+                 size=FRAME_SIZE):
+        super().__init__(fps, realtime, frames)
+        self.jitter = jitter
+        self.noise = noise
+        self.rng = np.random.default_rng(seed)
+        if isinstance(image, str):
+            path = image
+            image = cv2.imread(path)
+            if image is None:
+                raise ValueError(f"Could not read {path}.")
+        self.base = cv2.resize(image, size) if image is not None else self._stick_figure(size)
+
+    @staticmethod
+    def _stick_figure(size):
+        width, height = size
+        image = np.full((height, width, 3), 180, dtype=np.uint8)
+        cx = width // 2
+        head, hip = (cx, height // 5), (cx, height * 3 // 5)
+        cv2.circle(image, head, height // 14, (60, 60, 60), -1)
+        for start, end in [(head, hip), ((cx, height // 3), (cx - width // 8, height // 2)),
+                           ((cx, height // 3), (cx + width // 8, height // 2)),
+                           (hip, (cx - width // 12, height * 9 // 10)), (hip, (cx + width // 12, height * 9 // 10))]:
+            cv2.line(image, start, end, (60, 60, 60), max(3, width // 80))
+        return image
+
+    def interval(self):
+        return max(0.0, 1.0 / self.fps + self.rng.normal(0.0, self.jitter)) if self.jitter else 1.0 / self.fps
+
+    def next_frame(self):
+        shift = SWAY_PIXELS * np.sin(2 * np.pi * self.timestamp / SWAY_PERIOD)
+        height, width = self.base.shape[:2]
+        frame = cv2.warpAffine(self.base, np.float32([[1, 0, shift], [0, 1, 0]]), (width, height),
+                               borderMode=cv2.BORDER_REPLICATE)
+        if self.noise:
+            noise = self.rng.normal(0.0, self.noise, frame.shape)
+            frame = np.clip(frame + noise, 0, 255).astype(np.uint8)
+        return frame
+
+
+def open_source(spec, fps=None, jitter=0.0, seed=0, frames=None, realtime=True):
+    """
+    Open a frame source from a spec string:
+
+    - "0", "1", ...: a webcam (a plain cv2.VideoCapture)
+    - "synthetic" or "synthetic:IMAGE": the camera simulator
+    - a folder or an image file: the images as frames
+    - a video file: its frames at the file's frame rate
+    - anything else, e.g. rtsp:// or http:// URLs: opened by cv2.VideoCapture
+    """
+    spec = str(spec)
+    if spec.isdigit():
+        return cv2.VideoCapture(int(spec))
+    if spec == SYNTHETIC or spec.startswith(SYNTHETIC + ":"):
+        image = spec.partition(":")[2] or None
+        return SyntheticSource(image, fps or DEFAULT_FPS, jitter, seed, realtime=realtime, frames=frames)
+    if os.path.isdir(spec):
+        return ImageFolderSource(spec, fps or DEFAULT_FPS, realtime, frames=frames)
+    if spec.lower().endswith(IMAGE_EXTENSIONS):
+        return ImageFolderSource([spec], fps or DEFAULT_FPS, realtime, frames=frames)
+    if os.path.isfile(spec):
+        return VideoFileSource(spec, realtime, frames=frames)
+    return cv2.VideoCapture(spec)
+
+
+def add_source_arguments(parser):
+    """Add the --source, --fps, --jitter, --seed, --frames and --headless options to an app's parser."""
+    parser.add_argument("--source", default=os.environ.get(SOURCE_ENV, "0"),
+                        help="Webcam index, video file, image folder, stream URL or synthetic[:IMAGE]")
+    parser.add_argument("--fps", type=float, help="Frame rate of a synthetic or image source")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Std. dev. of synthetic frame intervals (s)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic source")
+    parser.add_argument("--frames", type=int, help="Stop after this many frames")
+    parser.add_argument("--headless", action="store_true", help="Do not open windows; print a run summary")
+
+
+def source_from_args(args):
+    return open_source(args.source, args.fps, args.jitter, args.seed, args.frames)
+
+
+def sink_from_args(args):
+    return NullSink(args.frames) if args.headless else WindowSink()
+
+
+class WindowSink:
+    """Shows frames with cv2.imshow and reads keys with cv2.waitKey."""
+
+    def show(self, name, frame):
+        cv2.imshow(name, frame)
+
+    def poll_key(self, delay=1):
+        return cv2.waitKey(delay) & 0xFF
+
+    def close(self):
+        cv2.destroyAllWindows()
+
+
+def memory_mb():
+    """Resident memory of this process in MB (the peak on systems without /proc)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except (OSError, ValueError, IndexError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2 ** 20 if os.uname().sysname == "Darwin" else peak / 2 ** 10
+
+
+class NullSink:
+    """
+    Headless stand-in for WindowSink: counts frames instead of showing them and
+    samples memory as it goes, so soak runs can spot leaks. Reports the scripted
+    ``keys`` one per poll, then 'q' once ``quit_after`` frames were shown, and no
+    key otherwise.
+    """
+
+    def __init__(self, quit_after=None, keys=""):
+        self.quit_after = quit_after
+        self.keys = list(keys)
+        self.frames = 0
+        self.start_time = None
+        self.memory = []  # (frames, MB) samples
+
+    def show(self, name, frame):
+        if self.start_time is None:
+            self.start_time = time.perf_counter()
+        # No sample at frame 0: the models may still be warming up, which is not growth
+        if self.frames and self.frames % MEMORY_SAMPLE_INTERVAL == 0:
+            self.memory.append((self.frames, memory_mb()))
+        self.frames += 1
+
+    def poll_key(self, delay=1):
+        if self.keys:
+            return ord(self.keys.pop(0))
+        if self.quit_after is not None and self.frames >= self.quit_after:
+            return ord("q")
+        return 255  # cv2.waitKey(...) & 0xFF when no key was pressed
+
+    def close(self):
+        pass
+
+    def summary(self):
+        """Frames shown, their rate, and memory growth since the first sample (none for very short runs)."""
+        elapsed = time.perf_counter() - self.start_time if self.start_time is not None else 0.0
+        summary = {"frames": self.frames, "seconds": round(elapsed, 2),
+                   "fps": round(self.frames / elapsed, 2) if elapsed > 0 else 0.0}
+        if self.memory:
+            start = self.memory[0][1]
+            end = memory_mb()
+            summary.update(memory_start_mb=round(start, 1), memory_end_mb=round(end, 1),
+                           memory_growth_mb=round(end - start, 1))
+        return summary
@@ -1,53 +1,72 @@
-import cv2
-import mediapipe as mp
+from startup import mark  # First, so startup marks are measured from process start
+import argparse
+import os
 from tkinter import Tk
 from tkinter.filedialog import askopenfilename
+from frame_sources import ImageFolderSource, NullSink, WindowSink
+from still_image import StillImageAnalyzer
 
-# Initialize MediaPipe Pose detection
-mp_pose = mp.solutions.pose
-mp_drawing = mp.solutions.drawing_utils
-pose = mp_pose.Pose()
+# Still-image analysis, memoized per image and resolution (shares the reference landmark cache)
+analyzer = StillImageAnalyzer()
 
 # Counter to track how many times the image has been detected
 detection_counter = 0
 
 
-def detect_pose_image(image_path):
+def detect_pose_image(image_path, sink=None):
     """
     Detect pose landmarks on a selected image and count detections.
+    ``image_path`` may also be a folder, whose images are shown one after another ('n'),
+    and ``sink`` a NullSink to run without a window.
+
+    The window is only redrawn when a key changes what it shows; rechecking an
+    unchanged image is answered from the analyzer's memo instead of MediaPipe.
     """
     global detection_counter
 
-    # Read the image
-    image = cv2.imread(image_path)
-    if image is None:
+    # Read the image(s); the source decodes each image once
+    source = ImageFolderSource([image_path] if os.path.isfile(image_path) else image_path,
+                               realtime=False, loop=False)
+    sink = sink or WindowSink()
+    ret, original = source.read()
+    if not ret:
         print("Error: Could not read the image.")
         return
+    path = source.path
 
+    recheck = True
     while True:
-        # Convert the image to RGB
-        rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-
-        # Process the image for pose detection
-        result = pose.process(rgb_image)
+        if recheck:
+            detections = analyzer.detections
+            still = analyzer.analyze(path, image=original)
+            mark("first_inference")
+            cached = " (cached)" if analyzer.detections == detections else ""
 
-        # If landmarks are detected
-        if result.pose_landmarks:
-            detection_counter += 1
-            mp_drawing.draw_landmarks(image, result.pose_landmarks, mp_pose.POSE_CONNECTIONS)
-            print(f"Pose Detected! Detection count: {detection_counter}")
-        else:
-            print("No pose detected.")
+            # If landmarks are detected
+            if still.landmarks is not None:
+                detection_counter += 1
+                print(f"Pose Detected!{cached} Detection count: {detection_counter}")
+            else:
+                print(f"No pose detected.{cached}")
 
-        # Display the image with landmarks
-        cv2.imshow("Pose Detection - Image", image)
+            # Display the image with the landmark layer composed on a copy
+            sink.show("Pose Detection - Image", still.annotated())
+            mark("first_window")
+            print("Press 'd' to recheck the image, 'n' for the next image, 'r' to reset counter, or 'q' to quit.")
+            recheck = False
 
-        # Wait for a key press to exit or allow repeated detection
-        print("Press 'd' to recheck the image, 'r' to reset counter, or 'q' to quit.")
-        key = cv2.waitKey(0) & 0xFF
+        # Block until a key is pressed; other keys leave the window as it is
+        key = sink.poll_key(0)
         if key == ord('d'):  # Re-detect pose in the same image
             print("Rechecking image for pose detection...")
-            continue
+            recheck = True
+        elif key == ord('n'):  # Move on to the next image of a folder
+            ret, next_image = source.read()
+            if not ret:
+                print("No more images.")
+                break
+            original, path = next_image, source.path
+            recheck = True
         elif key == ord('r'):  # Reset detection counter
             detection_counter = 0
             print("Detection counter reset.")
@@ -56,17 +75,28 @@ def detect_pose_image(image_path):
             break
 
     # Close the display window
-    cv2.destroyAllWindows()
+    sink.close()
 
 
 if __name__ == "__main__":
-    Tk().withdraw()  # Hide the main tkinter window
-    print("Select an image file...")
-    file_path = askopenfilename(filetypes=[("Image files", "*.jpg *.jpeg *.png")])
+    parser = argparse.ArgumentParser(description="Detect the pose in an image or a folder of images.")
+    parser.add_argument("path", nargs="?", help="Image or folder (asked for when not given)")
+    parser.add_argument("--headless", action="store_true", help="Do not open a window; recheck --frames times")
+    parser.add_argument("--frames", type=int, default=1, help="Detections to run when headless")
+    parser.add_argument("--keys", help="Keys to press when headless, then 'q' (default: 'd' until --frames)")
+    args = parser.parse_args()
+
+    file_path = args.path
+    if not file_path and not args.headless:
+        Tk().withdraw()  # Hide the main tkinter window
+        print("Select an image file...")
+        file_path = askopenfilename(filetypes=[("Image files", "*.jpg *.jpeg *.png")])
 
     if not file_path:
         print("No file selected. Exiting.")
     else:
         print("Starting detection...")
-        detect_pose_image(file_path)
-        print(f"Total detections: {detection_counter}")
\ No newline at end of file
+        keys = args.keys if args.keys is not None else "d" * (args.frames - 1) + "q"
+        detect_pose_image(file_path, NullSink(0, keys) if args.headless else None)
+        print(f"Total detections: {detection_counter}")
+    analyzer.close()
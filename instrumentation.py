@@ -0,0 +1,182 @@
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+import cv2
+import numpy as np
+
+HISTOGRAM_SIZE = 512  # Most recent samples kept per span
+EXPORT_INTERVAL = 10.0  # Seconds between lines written to the metrics file
+LOG_INTERVAL = 5.0  # The same log message is emitted at most once per this many seconds
+
+LOG_LEVEL_ENV = "POSE_LOG_LEVEL"  # e.g. DEBUG to see per-frame messages
+METRICS_FILE_ENV = "POSE_METRICS_FILE"  # JSON lines file to export metrics to
+
+# Spans shown by the overlay, in pipeline order
+OVERLAY_SPANS = ["capture", "preprocess", "pose_process", "scoring", "check_posture", "drawing", "display"]
+
+
+class RollingHistogram:
+    """Fixed-size ring buffer of latency samples (seconds) with percentile summaries."""
+
+    def __init__(self, size=HISTOGRAM_SIZE):
+        self.samples = np.zeros(size, dtype=np.float64)
+        self.count = 0  # Total samples ever added
+        self.lock = threading.Lock()  # Several worker threads record into the same span
+
+    def add(self, value):
+        with self.lock:
+            self.samples[self.count % len(self.samples)] = value
+            self.count += 1
+
+    def values(self):
+        return self.samples[:min(self.count, len(self.samples))]
+
+    def summary(self):
+        """p50/p95/p99/mean of the retained samples in milliseconds, plus the total count."""
+        values = self.values()
+        if len(values) == 0:
+            return {"count": 0}
+        p50, p95, p99 = (np.percentile(values, (50, 95, 99)) * 1000).tolist()
+        return {"count": self.count, "p50_ms": round(p50, 3), "p95_ms": round(p95, 3),
+                "p99_ms": round(p99, 3), "mean_ms": round(float(values.mean()) * 1000, 3)}
+
+
+class Metrics:
+    """
+    Named latency spans and a frame-rate counter shared by every stage of the frame loop.
+
+    Recording a span costs two monotonic clock reads and one array write, so spans can
+    stay enabled in production. ``overlay`` draws FPS and per-stage latency on a frame
+    and ``start_export`` appends a summary to a JSON lines file periodically.
+    """
+
+    def __init__(self, histogram_size=HISTOGRAM_SIZE):
+        self.histogram_size = histogram_size
+        self.spans = {}
+        self.frame_times = RollingHistogram(histogram_size)  # Timestamps of completed frames
+        self.lock = threading.Lock()
+        self.exporter = None
+
+    def record(self, name, seconds):
+        histogram = self.spans.get(name)
+        if histogram is None:
+            with self.lock:
+                histogram = self.spans.setdefault(name, RollingHistogram(self.histogram_size))
+        histogram.add(seconds)
+
+    @contextmanager
+    def span(self, name):
+        """Time the enclosed block under ``name``."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def frame_done(self):
+        """Count one finished frame for the FPS estimate."""
+        self.frame_times.add(time.perf_counter())
+
+    def fps(self):
+        times = self.frame_times.values()
+        if len(times) < 2:
+            return 0.0
+        return (len(times) - 1) / (times.max() - times.min())
+
+    def summary(self):
+        with self.lock:
+            spans = dict(self.spans)
+        return {"fps": round(float(self.fps()), 2), "spans": {name: h.summary() for name, h in spans.items()}}
+
+    def overlay(self, frame, origin=(10, None)):
+        """Draw FPS and the p50/p95 latency of each stage in the frame's bottom-left corner."""
+        lines = [f"FPS {self.fps():.1f}"]
+        for name in OVERLAY_SPANS:
+            histogram = self.spans.get(name)
+            if histogram is not None and histogram.count:
+                p50, p95 = np.percentile(histogram.values(), (50, 95)) * 1000
+                lines.append(f"{name} {p50:.1f}/{p95:.1f} ms")
+        x, y = origin[0], origin[1] if origin[1] is not None else frame.shape[0] - 18 * len(lines)
+        for index, line in enumerate(lines):
+            cv2.putText(frame, line, (x, y + 18 * index), cv2.FONT_HERSHEY_SIMPLEX, 0.45, (0, 255, 255), 1)
+        return frame
+
+    def start_export(self, path=None, interval=EXPORT_INTERVAL):
+        """Append a summary line to a JSON lines file every ``interval`` seconds (path defaults to
+        $POSE_METRICS_FILE). Does nothing when no path is configured."""
+        path = path or os.environ.get(METRICS_FILE_ENV)
+        if not path or self.exporter is not None:
+            return
+        self.exporter = threading.Thread(target=self._export_loop, args=(path, interval), name="metrics",
+                                         daemon=True)
+        self.exporter.start()
+
+    def _export_loop(self, path, interval):
+        while True:
+            time.sleep(interval)
+            line = dict(self.summary(), time=time.time())
+            try:
+                with open(path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(line) + "\n")
+            except OSError as e:
+                get_logger(__name__).error("Error writing metrics: %s", e)
+                return
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Let each distinct log message through at most once per interval, counting the rest.
+
+    Messages are told apart by logger, template and string arguments, so the same error
+    from different cameras or people is limited separately, while numbers that change
+    every frame (similarities, counts) do not make each message distinct.
+    """
+
+    def __init__(self, interval=LOG_INTERVAL):
+        super().__init__()
+        self.interval = interval
+        self.last_emitted = {}  # (logger, message template, string arguments) -> time
+        self.suppressed = {}
+        self.lock = threading.Lock()
+
+    def filter(self, record):
+        args = record.args if isinstance(record.args, tuple) else ()
+        key = (record.name, record.msg, tuple(arg for arg in args if isinstance(arg, str)))
+        now = time.monotonic()
+        with self.lock:
+            if now - self.last_emitted.get(key, float("-inf")) < self.interval:
+                self.suppressed[key] = self.suppressed.get(key, 0) + 1
+                return False
+            self.last_emitted[key] = now
+            suppressed = self.suppressed.pop(key, 0)
+        if suppressed:
+            record.msg = f"{record.msg} ({suppressed} similar messages suppressed)"
+        return True
+
+
+_configured = False
+_configure_lock = threading.Lock()
+
+
+def get_logger(name):
+    """Return a logger; the first call sets up levelled, rate-limited output to stderr."""
+    global _configured
+    with _configure_lock:
+        if not _configured:
+            handler = logging.StreamHandler()
+            handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s",
+                                                   "%H:%M:%S"))
+            handler.addFilter(RateLimitFilter())
+            root = logging.getLogger("pose")
+            root.addHandler(handler)
+            root.setLevel(os.environ.get(LOG_LEVEL_ENV, "INFO").upper())
+            root.propagate = False
+            _configured = True
+    return logging.getLogger(f"pose.{name}")
+
+
+# Shared by the whole process, like the speech worker
+metrics = Metrics()
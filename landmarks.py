@@ -0,0 +1,81 @@
+from enum import IntEnum
+import numpy as np
+
+# MediaPipe Pose always returns 33 landmarks, each with x, y, z and visibility
+NUM_LANDMARKS = 33
+LANDMARK_FIELDS = 4
+
+
+class PoseLandmark(IntEnum):
+    """Row of each body point in a landmark array; mirrors mediapipe's mp.solutions.pose.PoseLandmark."""
+    NOSE = 0
+    LEFT_EYE_INNER = 1
+    LEFT_EYE = 2
+    LEFT_EYE_OUTER = 3
+    RIGHT_EYE_INNER = 4
+    RIGHT_EYE = 5
+    RIGHT_EYE_OUTER = 6
+    LEFT_EAR = 7
+    RIGHT_EAR = 8
+    MOUTH_LEFT = 9
+    MOUTH_RIGHT = 10
+    LEFT_SHOULDER = 11
+    RIGHT_SHOULDER = 12
+    LEFT_ELBOW = 13
+    RIGHT_ELBOW = 14
+    LEFT_WRIST = 15
+    RIGHT_WRIST = 16
+    LEFT_PINKY = 17
+    RIGHT_PINKY = 18
+    LEFT_INDEX = 19
+    RIGHT_INDEX = 20
+    LEFT_THUMB = 21
+    RIGHT_THUMB = 22
+    LEFT_HIP = 23
+    RIGHT_HIP = 24
+    LEFT_KNEE = 25
+    RIGHT_KNEE = 26
+    LEFT_ANKLE = 27
+    RIGHT_ANKLE = 28
+    LEFT_HEEL = 29
+    RIGHT_HEEL = 30
+    LEFT_FOOT_INDEX = 31
+    RIGHT_FOOT_INDEX = 32
+
+
+def landmarks_to_array(landmarks):
+    """
+    Convert MediaPipe pose landmarks into a (33, 4) float32 array of x, y, z, visibility.
+
+    Accepts a NormalizedLandmarkList (``result.pose_landmarks``), its ``.landmark``
+    sequence, or an array that is already in this layout.
+    """
+    if landmarks is None:
+        return None
+    if isinstance(landmarks, np.ndarray):
+        return landmarks.astype(np.float32, copy=False)
+    if hasattr(landmarks, "landmark"):
+        landmarks = landmarks.landmark
+
+    array = np.zeros((len(landmarks), LANDMARK_FIELDS), dtype=np.float32)
+    for index, lm in enumerate(landmarks):
+        array[index] = (lm.x, lm.y, getattr(lm, "z", 0.0), getattr(lm, "visibility", 1.0))
+    return array
+
+
+def draw_pose(image, pose_landmarks):
+    """Draw landmarks and their connections on a BGR image with MediaPipe's drawing utilities."""
+    import mediapipe as mp  # Imported on first use so the apps start without waiting for it
+
+    mp.solutions.drawing_utils.draw_landmarks(image, pose_landmarks, mp.solutions.pose.POSE_CONNECTIONS)
+
+
+def array_to_landmarks(array):
+    """Convert a (33, 4) landmark array back into a NormalizedLandmarkList for drawing."""
+    # Imported here so the array helpers above work without mediapipe installed
+    from mediapipe.framework.formats import landmark_pb2
+
+    landmark_list = landmark_pb2.NormalizedLandmarkList()
+    for x, y, z, visibility in np.asarray(array, dtype=np.float32).tolist():
+        landmark_list.landmark.add(x=x, y=y, z=z, visibility=visibility)
+    return landmark_list
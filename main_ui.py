@@ -1,133 +1,179 @@
+from startup import mark  # First, so startup marks are measured from process start
+import os
 import cv2
-import mediapipe as mp
 from tkinter import Tk, Button, Label, Frame, Canvas, Scale, HORIZONTAL, messagebox
 from tkinter.filedialog import askopenfilename
 from threading import Thread
-import numpy as np
-from PIL import Image, ImageTk
+from collections import namedtuple
 from audio import BeepSoundManager
 from feedback import check_posture
-import time
-import os 
+from reference_cache import ReferenceCache, load_reference_image, list_images, pose_name
+from still_image import StillImageAnalyzer
+from pipeline import FramePipeline
+from frame_sources import SOURCE_ENV, open_source
+from similarity import PoseLibrary
+from pose_index import PoseIndex
+from analytics import STUDENT_ENV, AnalyticsStore
+from adaptive import AdaptiveController
+from session import PoseSession
+from renderer import CanvasRenderer
+from landmarks import draw_pose
+from instrumentation import metrics
 import random
 
-# Initialize MediaPipe Pose detection
-mp_pose = mp.solutions.pose
-mp_drawing = mp.solutions.drawing_utils
-pose = mp_pose.Pose()
+# Heavy resources (MediaPipe, the audio mixer, text-to-speech) are created on first use
+# or warmed up in the background once the window is showing
 
-# Initialize the beep manager
+# Adjusts frame skipping, resolution and model complexity to keep the feed responsive
+controller = AdaptiveController(use_roi=True)
+
+# Initialize the beep manager (the sound is loaded on first use)
 beep_manager = BeepSoundManager()
 
-# Global variables
+# On-disk cache of reference landmarks so switching poses skips MediaPipe inference
+landmark_cache = ReferenceCache()
+analyzer = StillImageAnalyzer(landmark_cache)  # Memoized reference image analysis on top of the cache
+
+# Every pose in the pictures folder, used to recognize which pose the user is doing
+pose_library = PoseLibrary()
+
+# Indexed pose library built by pose_index.py; when present it replaces the folder scan above
+pose_index = PoseIndex()
+
+# Reference pose, similarity threshold, feedback cooldown and hold timer, shared with the inference thread
+session = PoseSession("main", similarity_threshold=0.7, feedback_delay=2)
+
+# Per-frame session analytics, written to disk off the frame thread
+analytics = AnalyticsStore()
+analytics_session = None  # AnalyticsSession while the webcam is running
+reference_name = None  # Name of the current reference pose, for the analytics
+
+# Global variables (only touched on the Tk thread)
 is_webcam_running = False
-reference_landmarks = None
-reference_image = None
 webcam_frame = None
-last_feedback_time = 0  # Track the last time feedback was triggered
-feedback_delay = 2  # Delay for feedback in seconds
-similarity_threshold = 0.7  # Default similarity threshold
-pose_match_start_time = None  # Track when the pose starts matching
+webcam_pipeline = None  # Capture/inference pipeline while the webcam is running
+feedback_reset_id = None  # Pending after() callback that clears the feedback label
+root = None  # Tk widgets, created by main()
+renderer = None
+feedback_label = None
+threshold_label = None
+RENDER_INTERVAL_MS = 15  # How often the Tk thread polls the pipeline for a new frame
+show_overlay = False  # Draw FPS and per-stage latency on the webcam feed (toggle with F2)
+
+# Result of processing one webcam frame, handed from the inference stage to the Tk render stage
+FrameResult = namedtuple("FrameResult", ["frame", "feedback", "matched", "hold_complete"])
 
 # Function to detect pose from image
 def detect_pose_image(image_path):
-    image = cv2.imread(image_path)
-    if image is None:
+    # Resized to match the webcam feed; landmarks come from the memo or the on-disk cache,
+    # so MediaPipe only runs for new or changed images
+    still = analyzer.analyze(image_path)
+    if still is None:
         print("Error: Could not read the image.")
         return None, None
 
-    # Resize the reference image to match the webcam feed size
-    image = cv2.resize(image, (640, 480))  # Make sure it's the same size as webcam
-    rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-
-    result = pose.process(rgb_image)
-    if result.pose_landmarks:
+    if still.landmarks is not None:
         print("Reference image landmarks detected successfully.")
-        return image, result.pose_landmarks
+        return still.image, still.landmarks
     else:
         print("No landmarks detected in the reference image.")
         return None, None
 
-# Function to calculate similarity between two sets of pose landmarks
-def calculate_similarity(landmarks_1, landmarks_2):
-    if not landmarks_1 or not landmarks_2:
-        return 0  # If any of the landmarks are missing, return no similarity.
-
-    landmarks_1 = np.array([[lm.x, lm.y] for lm in landmarks_1.landmark])
-    landmarks_2 = np.array([[lm.x, lm.y] for lm in landmarks_2.landmark])
-
-    distances = np.linalg.norm(landmarks_1 - landmarks_2, axis=1)
-    similarity_score = 1 - (np.mean(distances) / 0.5)  # Normalize the similarity
-    similarity_score = max(0, similarity_score)
-    return similarity_score
+# Function to compare a webcam frame with the reference pose (runs on the inference thread)
+def compare_webcam_to_reference(frame):
+    feedback_messages = None
+    matched = False
+    hold_complete = False
+
+    # Resize webcam feed to match reference image size
+    with metrics.span("preprocess"):
+        frame = cv2.resize(frame, (640, 480))  # Same size as reference image
+        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+    pose_landmarks, inferred = controller.process(rgb_frame)
+    if inferred:
+        mark("first_inference")
+
+    if pose_landmarks:
+        with metrics.span("drawing"):
+            draw_pose(frame, pose_landmarks)
+
+        # The session always scores against the current reference, even right after a swap
+        with metrics.span("scoring"):
+            update = session.evaluate(pose_landmarks)
+            analytics_session.record_update(update, reference_name)
+
+            # Find which library pose the user is closest to
+            matcher = pose_index if len(pose_index) else pose_library
+            pose_name, pose_score = matcher.best_match(pose_landmarks)
+
+        cv2.putText(frame, f"Similarity: {update.similarity:.2f}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 0, 0), 2)
+
+        if pose_name is not None:
+            cv2.putText(frame, f"Detected: {pose_name} ({pose_score:.2f})", (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 0, 0), 2)
+
+        # Trigger feedback when the pose is off, at most once per feedback delay
+        if update.feedback_due:
+            beep_manager.play_beep()
+            with metrics.span("check_posture"):
+                feedback_messages = check_posture(update.landmarks)  # Smoothed, so jitter does not add corrections
+        matched = update.matched
+        hold_complete = update.hold_complete  # Pose held for the full hold time
+    else:
+        analytics_session.record_update(None, reference_name)
 
-# Function to compare webcam pose with reference
-def compare_webcam_to_reference(reference_landmarks):
-    global is_webcam_running, reference_image, webcam_frame, last_feedback_time, similarity_threshold, pose_match_start_time
-    is_webcam_running = True
+    if show_overlay:
+        metrics.overlay(frame)
+    return FrameResult(frame, feedback_messages, matched, hold_complete)
 
-    cap = cv2.VideoCapture(0)
-    if not cap.isOpened():
-        print("Error: Could not open webcam.")
+# Render the latest pipeline result on the Tk thread; only one poll is ever pending
+def render_pipeline():
+    global webcam_frame
+    if webcam_pipeline is None:
+        return
+    if not webcam_pipeline.running:
+        stop_webcam()  # A video or synthetic source ($POSE_SOURCE) has ended
         return
 
-    while is_webcam_running:
-        ret, frame = cap.read()
-        if not ret:
-            print("Error reading webcam frame.")
-            continue
-
-        # Resize webcam feed to match reference image size
-        webcam_frame = cv2.resize(frame, (640, 480))  # Same size as reference image
-        rgb_frame = cv2.cvtColor(webcam_frame, cv2.COLOR_BGR2RGB)
-
-        result = pose.process(rgb_frame)
-
-        if result.pose_landmarks:
-            mp_drawing.draw_landmarks(webcam_frame, result.pose_landmarks, mp_pose.POSE_CONNECTIONS)
-
-            similarity = calculate_similarity(reference_landmarks, result.pose_landmarks)
-
-            cv2.putText(webcam_frame, f"Similarity: {similarity:.2f}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 0, 0), 2)
-
-            # Check if the pose is correct (below threshold) and trigger feedback only after the delay
-            if similarity < similarity_threshold:
-                current_time = time.time()
-                if current_time - last_feedback_time >= feedback_delay:
-                    beep_manager.play_beep()
-                    feedback_messages = check_posture(result.pose_landmarks.landmark)
-                    display_feedback(feedback_messages)
-                    last_feedback_time = current_time
-                pose_match_start_time = None  # Reset the pose match timer
-            else:
-                display_congrats_message()
-                if pose_match_start_time is None:
-                    pose_match_start_time = time.time()  # Start the timer when pose matches
-                elif time.time() - pose_match_start_time >= 10:  # Check if pose matched for 10 seconds
-                    pose_match_start_time = None  # Reset the timer
-                    root.after(0, prompt_upload_new_image)  # Prompt to upload new image
-
-        # Update canvas every frame
-        root.after(0, update_canvas)
-
-        if cv2.waitKey(1) & 0xFF == ord("q"):
-            print("Stopping webcam comparison...")
-            break
-
-    cap.release()
-    cv2.destroyAllWindows()
+    result = webcam_pipeline.get(timeout=0)
+    if result is not None:
+        webcam_frame = result.frame
+        if result.feedback is not None:
+            display_feedback(result.feedback)
+        elif result.matched:
+            display_congrats_message()
+        if result.hold_complete:
+            prompt_upload_new_image()  # Prompt to upload new image
+        with metrics.span("display"):
+            update_canvas()
+        metrics.frame_done()
+
+    root.after(RENDER_INTERVAL_MS, render_pipeline)
 
 # Function to prompt the user to upload a new image
 def prompt_upload_new_image():
-    global reference_landmarks, reference_image
+    global reference_name
+    if len(pose_index):
+        # Indexed poses are known to contain a pose, so no detection is needed
+        entry = pose_index.random_entry()
+        reference_image = load_reference_image(entry.path)
+        if reference_image is not None:
+            print(f"Auto-loading new reference pose: {entry.name} ({entry.path})")
+            reference_name = entry.name
+            session.set_reference(reference_image, entry.landmarks)
+            return
+        print(f"Error: Could not read {entry.path}; the pose index may be out of date.")
+
     image_folder = "pictures"  # Folder containing images
-    image_files = [f for f in os.listdir(image_folder) if f.lower().endswith(('.png', '.jpg', '.jpeg'))]
+    image_files = list_images(image_folder)
 
     if image_files:
-        random_image_path = os.path.join(image_folder, random.choice(image_files))
+        random_image_path = random.choice(image_files)
         print(f"Auto-loading new reference image: {random_image_path}")
         reference_image, reference_landmarks = detect_pose_image(random_image_path)
-        if reference_landmarks:
+        if reference_landmarks is not None:
+            reference_name = pose_name(random_image_path)
+            session.set_reference(reference_image, reference_landmarks)
             print("New reference image loaded successfully!")
         else:
             print("No landmarks detected in the new image.")
@@ -136,56 +182,70 @@ def prompt_upload_new_image():
 
 # Function to update the canvas with webcam feed and reference image
 def update_canvas():
-    global webcam_frame
-    if webcam_frame is not None:
-        frame_rgb = cv2.cvtColor(webcam_frame, cv2.COLOR_BGR2RGB)
-        frame_image = Image.fromarray(frame_rgb)
-        frame_image_tk = ImageTk.PhotoImage(frame_image)
-        canvas.create_image(0, 0, anchor="nw", image=frame_image_tk)
-        canvas.image = frame_image_tk
-
-    if reference_image is not None:
-        ref_image = cv2.cvtColor(reference_image, cv2.COLOR_BGR2RGB)
-        ref_image_pil = Image.fromarray(ref_image)
-        ref_image_tk = ImageTk.PhotoImage(ref_image_pil)
-        canvas.create_image(640, 0, anchor="nw", image=ref_image_tk)
-        canvas.ref_image = ref_image_tk
-
-    canvas.update()
+    # The renderer updates its persistent canvas items in place
+    renderer.show_frame(webcam_frame)
+    renderer.show_reference(session.reference)
 
 # Function to display feedback
 def display_feedback(messages):
     feedback_label.config(text="Feedback: " + "\n".join(messages), fg="red")
-    root.after(2000, reset_feedback)
+    schedule_feedback_reset()
 
 # Function to display the congrats message
 def display_congrats_message():
     feedback_label.config(text="Congrats! Your pose matches! You are doing great 🎉💪", fg="green")
-    root.after(2000, reset_feedback)
+    schedule_feedback_reset()
+
+# Clear the feedback 2 seconds after the latest message, keeping a single pending callback
+def schedule_feedback_reset():
+    global feedback_reset_id
+    if feedback_reset_id is not None:
+        root.after_cancel(feedback_reset_id)
+    feedback_reset_id = root.after(2000, reset_feedback)
 
 # Reset the feedback text after 2 seconds
 def reset_feedback():
+    global feedback_reset_id
+    feedback_reset_id = None
     feedback_label.config(text="")
 
-# Start webcam in a new thread
+# Start the capture and inference pipeline
 def start_webcam():
-    global reference_landmarks
-    if reference_landmarks:
-        Thread(target=compare_webcam_to_reference, args=(reference_landmarks,)).start()
+    global webcam_pipeline, is_webcam_running, analytics_session
+    if session.reference_landmarks is None or is_webcam_running:
+        return
+
+    cap = open_source(os.environ.get(SOURCE_ENV, "0"))  # The webcam unless $POSE_SOURCE says otherwise
+    if not cap.isOpened():
+        print("Error: Could not open webcam.")
+        return
+
+    analytics_session = analytics.open_session(os.environ.get(STUDENT_ENV, "student"))
+    webcam_pipeline = FramePipeline(cap, compare_webcam_to_reference)
+    webcam_pipeline.start()
+    is_webcam_running = True
+    render_pipeline()
 
 def stop_webcam():
-    global is_webcam_running
+    global is_webcam_running, webcam_pipeline
     is_webcam_running = False
+    if webcam_pipeline is not None:
+        webcam_pipeline.stop()
+        webcam_pipeline = None
+        analytics_session.close()
     print("Stopping webcam...")
 
 # Function to select image
 def on_select_image():
-    global reference_landmarks, reference_image
+    global reference_name
     reference_image_path = askopenfilename(filetypes=[("Image files", "*.jpg *.jpeg *.png")])
     if reference_image_path:
         print("Processing reference image for landmarks...")
         reference_image, reference_landmarks = detect_pose_image(reference_image_path)
-        if reference_landmarks:
+        if reference_landmarks is not None:
+            reference_name = pose_name(reference_image_path)
+            session.set_reference(reference_image, reference_landmarks)
+            renderer.show_reference(session.reference)
             print("Reference image processed successfully!")
         else:
             print("No landmarks detected.")
@@ -194,50 +254,82 @@ def on_select_image():
 
 # Function to update similarity threshold
 def update_threshold(value):
-    global similarity_threshold
-    similarity_threshold = float(value)
-    threshold_label.config(text=f"Similarity Threshold: {similarity_threshold:.2f}")
+    session.similarity_threshold = float(value)
+    threshold_label.config(text=f"Similarity Threshold: {session.similarity_threshold:.2f}")
+
+# Show or hide the performance overlay
+def toggle_overlay(event=None):
+    global show_overlay
+    show_overlay = not show_overlay
+
+# Load the reference library, the pose model and the beep sound without blocking the UI
+def warm_up():
+    if pose_index.load():
+        print(f"Loaded pose index with {len(pose_index)} poses.")
+    else:
+        landmark_cache.build("pictures")
+        pose_library.add_from_cache(landmark_cache, list_images("pictures"))
+    controller.warm_up()
+    mark("inference_ready")
+    beep_manager.preload()
+
+# Build the Tkinter window and run the UI
+def main():
+    global root, renderer, feedback_label, threshold_label
+
+    # Create the Tkinter window
+    root = Tk()
+    root.title("Pose Detection")
+    root.geometry("1280x800")  # Larger size for better view
+
+    # Background color for window
+    root.configure(bg='#f0f0f0')
+
+    # Frame for buttons
+    button_frame = Frame(root, bg='#f0f0f0')
+    button_frame.pack(pady=10)
 
-# Create the Tkinter window
-root = Tk()
-root.title("Pose Detection")
-root.geometry("1280x800")  # Larger size for better view
+    # Buttons with colors
+    select_image_button = Button(button_frame, text="Select Reference Image", command=on_select_image, bg="#4CAF50", fg="white", font=("Helvetica", 12))
+    select_image_button.grid(row=0, column=0, padx=20)
 
-# Background color for window
-root.configure(bg='#f0f0f0')
+    webcam_button = Button(button_frame, text="Start Webcam", command=start_webcam, bg="#2196F3", fg="white", font=("Helvetica", 12))
+    webcam_button.grid(row=0, column=1, padx=20)
 
-# Frame for buttons
-button_frame = Frame(root, bg='#f0f0f0')
-button_frame.pack(pady=10)
+    stop_button = Button(button_frame, text="Stop Webcam", command=stop_webcam, bg="#f44336", fg="white", font=("Helvetica", 12))
+    stop_button.grid(row=0, column=2, padx=20)
 
-# Buttons with colors
-select_image_button = Button(button_frame, text="Select Reference Image", command=on_select_image, bg="#4CAF50", fg="white", font=("Helvetica", 12))
-select_image_button.grid(row=0, column=0, padx=20)
+    # Slider for similarity threshold
+    threshold_label = Label(button_frame, text=f"Similarity Threshold: {session.similarity_threshold:.2f}", bg='#f0f0f0', font=("Helvetica", 12))
+    threshold_label.grid(row=1, column=0, columnspan=3, pady=10)
 
-webcam_button = Button(button_frame, text="Start Webcam", command=start_webcam, bg="#2196F3", fg="white", font=("Helvetica", 12))
-webcam_button.grid(row=0, column=1, padx=20)
+    threshold_slider = Scale(button_frame, from_=0.1, to=1.0, resolution=0.05, orient=HORIZONTAL, command=update_threshold)
+    threshold_slider.set(session.similarity_threshold)
+    threshold_slider.grid(row=2, column=0, columnspan=3, pady=10)
 
-stop_button = Button(button_frame, text="Stop Webcam", command=stop_webcam, bg="#f44336", fg="white", font=("Helvetica", 12))
-stop_button.grid(row=0, column=2, padx=20)
+    # Create a Canvas for displaying webcam and reference image side by side
+    canvas = Canvas(root, width=1280, height=480, bg="white")
+    canvas.pack()
+    renderer = CanvasRenderer(canvas)
 
-# Slider for similarity threshold
-threshold_label = Label(button_frame, text=f"Similarity Threshold: {similarity_threshold:.2f}", bg='#f0f0f0', font=("Helvetica", 12))
-threshold_label.grid(row=1, column=0, columnspan=3, pady=10)
+    # Frame for feedback
+    feedback_frame = Frame(root, bg='#f0f0f0')
+    feedback_frame.pack(pady=10)
 
-threshold_slider = Scale(button_frame, from_=0.1, to=1.0, resolution=0.05, orient=HORIZONTAL, command=update_threshold)
-threshold_slider.set(similarity_threshold)
-threshold_slider.grid(row=2, column=0, columnspan=3, pady=10)
+    # Label for feedback
+    feedback_label = Label(feedback_frame, text="Feedback will appear here", bg='#f0f0f0', fg="black", font=("Helvetica", 14))
+    feedback_label.pack()
 
-# Create a Canvas for displaying webcam and reference image side by side
-canvas = Canvas(root, width=1280, height=480, bg="white")
-canvas.pack()
+    root.bind("<F2>", toggle_overlay)
+    metrics.start_export()  # Only when $POSE_METRICS_FILE is set
 
-# Frame for feedback
-feedback_frame = Frame(root, bg='#f0f0f0')
-feedback_frame.pack(pady=10)
+    # Warm everything heavy in the background once the window is up
+    root.after(0, lambda: mark("first_window"))
+    Thread(target=warm_up, daemon=True).start()
 
-# Label for feedback
-feedback_label = Label(feedback_frame, text="Feedback will appear here", bg='#f0f0f0', fg="black", font=("Helvetica", 14))
-feedback_label.pack()
+    root.mainloop()
+    stop_webcam()
+    analytics.close()  # Write the frames still queued
 
-root.mainloop()
\ No newline at end of file
+if __name__ == "__main__":
+    main()
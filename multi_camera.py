@@ -0,0 +1,249 @@
+import argparse
+import threading
+import time
+import cv2
+import mediapipe as mp
+import numpy as np
+from frame_sources import open_source
+from instrumentation import get_logger, metrics
+from landmarks import landmarks_to_array, array_to_landmarks
+from pipeline import MAX_READ_FAILURES, READ_RETRY_DELAY, LatestQueue
+from reference_cache import ReferenceCache, load_reference_image
+from roi import RoiTracker
+from session import PoseSession
+
+mp_pose = mp.solutions.pose
+mp_drawing = mp.solutions.drawing_utils
+
+FRAME_SIZE = (640, 480)  # Every stream is resized to this before inference
+TILE_SIZE = (480, 360)  # Size of each stream in the --display mosaic
+REPORT_INTERVAL = 5  # Seconds between throughput reports in headless mode
+
+logger = get_logger(__name__)
+
+
+class CameraStream:
+    """One video source with its own latest-frame slot, pose session and ROI tracker."""
+
+    def __init__(self, name, spec, session):
+        self.name = name
+        self.spec = spec
+        self.capture = open_source(spec)  # Video files are paced to their own frame rate, like live cameras
+        self.frames = LatestQueue(1)  # Only the newest unprocessed frame is kept
+        self.session = session
+        self.roi_tracker = RoiTracker()
+        self.busy = False  # True while a worker is processing a frame from this stream
+        self.finished = False
+        self.latest_frame = None  # Most recent annotated frame
+        self.processed = 0
+
+
+class PoseWorkerPool:
+    """
+    Share a fixed number of Pose inference workers between many camera streams.
+
+    Each stream keeps only its latest frame. Idle workers take frames from the streams
+    in round-robin order, with at most one frame per stream in flight, so every camera
+    gets a fair share of the pool however many there are. Workers are threads that each
+    own a MediaPipe graph; MediaPipe releases the GIL while it runs, so throughput
+    scales with the number of workers rather than the number of cameras.
+    """
+
+    def __init__(self, streams, workers=2):
+        self.streams = streams
+        self.workers = workers
+        self.condition = threading.Condition()
+        self.next_index = 0
+        self.running = False
+        self.threads = []
+
+    def start(self):
+        self.running = True
+        for stream in self.streams:
+            self.threads.append(threading.Thread(target=self._read_loop, args=(stream,), daemon=True))
+        for index in range(self.workers):
+            self.threads.append(threading.Thread(target=self._worker_loop, name=f"pose-{index}",
+                                                 daemon=True))
+        for thread in self.threads:
+            thread.start()
+
+    def stop(self):
+        self.running = False
+        with self.condition:
+            self.condition.notify_all()
+        for thread in self.threads:
+            thread.join(timeout=2)
+        for stream in self.streams:
+            stream.capture.release()
+
+    @property
+    def finished(self):
+        return all(stream.finished and not stream.busy and not stream.frames.items
+                   for stream in self.streams)
+
+    def _read_loop(self, stream):
+        """Keep the stream's latest-frame slot filled (one thread per source)."""
+        failures = 0  # Consecutive failed reads
+        while self.running:
+            ret, frame = stream.capture.read()
+            if not ret:
+                # A finite source has ended; a camera or stream gets a few retries for a hiccup
+                failures += 1
+                if getattr(stream.capture, "ended", False) or failures >= MAX_READ_FAILURES:
+                    stream.finished = True
+                    logger.info("[%s] No more frames.", stream.name)
+                    break
+                time.sleep(READ_RETRY_DELAY)
+                continue
+            failures = 0
+            stream.frames.put(frame)
+            with self.condition:
+                self.condition.notify()
+
+    def _next_job(self):
+        """Pick the next stream with a waiting frame in round-robin order."""
+        count = len(self.streams)
+        for offset in range(count):
+            index = (self.next_index + offset) % count
+            stream = self.streams[index]
+            if stream.busy:
+                continue
+            frame = stream.frames.get(timeout=0)
+            if frame is not None:
+                stream.busy = True
+                self.next_index = (index + 1) % count
+                return stream, frame
+        return None
+
+    def _worker_loop(self):
+        # Frames from different cameras interleave, so each frame is treated as a still image
+        pose = mp_pose.Pose(static_image_mode=True)
+        try:
+            while self.running:
+                with self.condition:
+                    job = self._next_job()
+                    while job is None and self.running:
+                        self.condition.wait(timeout=0.5)
+                        job = self._next_job()
+                if job is None:
+                    break
+                stream, frame = job
+                try:
+                    stream.latest_frame = process_frame(pose, stream, frame)
+                    stream.processed += 1
+                except Exception as e:
+                    logger.error("[%s] Error processing frame: %s", stream.name, e)
+                finally:
+                    with self.condition:
+                        stream.busy = False
+                        self.condition.notify()
+        finally:
+            pose.close()
+
+
+def process_frame(pose, stream, frame):
+    """Detect the pose in one stream's frame, score it with the stream's session and annotate it."""
+    frame = cv2.resize(frame, FRAME_SIZE)
+    rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    crop, roi = stream.roi_tracker.crop(rgb_frame)
+    with metrics.span("pose_process"):
+        result = pose.process(np.ascontiguousarray(crop))
+
+    landmarks = landmarks_to_array(result.pose_landmarks)
+    if landmarks is not None:
+        landmarks = stream.roi_tracker.to_frame(landmarks, roi, rgb_frame.shape)
+    stream.roi_tracker.update(landmarks, rgb_frame.shape)
+
+    cv2.putText(frame, stream.name, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+    if landmarks is None:
+        return frame
+
+    mp_drawing.draw_landmarks(frame, array_to_landmarks(landmarks), mp_pose.POSE_CONNECTIONS)
+    if stream.session.reference_landmarks is not None:
+        update = stream.session.evaluate(landmarks)
+        color = (0, 200, 0) if update.matched else (0, 0, 255)
+        cv2.putText(frame, f"Similarity: {update.similarity:.2f}", (10, 60),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.8, color, 2)
+        if update.feedback_due:
+            logger.info("[%s] Pose does not match the reference (similarity %.2f).", stream.name, update.similarity)
+        if update.hold_complete:
+            logger.info("[%s] Pose held for %s seconds.", stream.name, stream.session.hold_time)
+    return frame
+
+
+def build_mosaic(streams):
+    """Tile the latest frame of every stream into one image for display."""
+    columns = int(np.ceil(np.sqrt(len(streams))))
+    rows = int(np.ceil(len(streams) / columns))
+    width, height = TILE_SIZE
+    mosaic = np.zeros((rows * height, columns * width, 3), dtype=np.uint8)
+    for index, stream in enumerate(streams):
+        if stream.latest_frame is None:
+            continue
+        row, column = divmod(index, columns)
+        mosaic[row * height:(row + 1) * height, column * width:(column + 1) * width] = \
+            cv2.resize(stream.latest_frame, TILE_SIZE)
+    return mosaic
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score several cameras with a shared pool of pose workers.")
+    parser.add_argument("sources", nargs="+",
+                        help="Webcam indices, video files, image folders, stream URLs or synthetic[:IMAGE]")
+    parser.add_argument("--workers", type=int, default=2, help="Number of pose inference workers")
+    parser.add_argument("--reference", help="Reference pose image shared by every stream")
+    parser.add_argument("--display", action="store_true", help="Show all streams in one window")
+    args = parser.parse_args()
+
+    reference_image, reference_landmarks = None, None
+    if args.reference:
+        cache = ReferenceCache()
+        reference_image = load_reference_image(args.reference)
+        reference_landmarks = cache.get_or_detect(args.reference, reference_image)
+        cache.save()
+        cache.close()
+        if reference_landmarks is None:
+            print("Could not detect landmarks from the reference image. Exiting.")
+            return
+
+    streams = []
+    for index, spec in enumerate(args.sources):
+        session = PoseSession(f"camera {index}", reference_image, reference_landmarks)
+        stream = CameraStream(session.name, spec, session)
+        if not stream.capture.isOpened():
+            print(f"Error: Could not open source {spec}.")
+            continue
+        streams.append(stream)
+    if not streams:
+        return
+
+    pool = PoseWorkerPool(streams, args.workers)
+    pool.start()
+    print(f"Serving {len(streams)} stream(s) with {args.workers} worker(s). Press Ctrl+C to stop.")
+
+    last_report = time.time()
+    last_counts = [0] * len(streams)
+    try:
+        while not pool.finished:
+            if args.display:
+                cv2.imshow("Pose Detection - All Cameras", build_mosaic(streams))
+                if cv2.waitKey(30) & 0xFF == ord("q"):
+                    break
+            else:
+                time.sleep(0.1)
+
+            if time.time() - last_report >= REPORT_INTERVAL:
+                elapsed = time.time() - last_report
+                rates = [(s.processed - c) / elapsed for s, c in zip(streams, last_counts)]
+                print(" | ".join(f"{s.name}: {r:.1f} fps" for s, r in zip(streams, rates)))
+                last_counts = [s.processed for s in streams]
+                last_report = time.time()
+    except KeyboardInterrupt:
+        print("\nKeyboard Interrupt detected. Exiting.")
+    finally:
+        pool.stop()
+        cv2.destroyAllWindows()
+
+
+if __name__ == "__main__":
+    main()
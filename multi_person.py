@@ -0,0 +1,312 @@
+import argparse
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import cv2
+import mediapipe as mp
+import numpy as np
+from analytics import AnalyticsStore, print_report
+from instrumentation import get_logger, metrics
+from landmarks import landmarks_to_array, array_to_landmarks
+from frame_sources import open_source
+from reference_cache import ReferenceCache, load_reference_image
+from roi import RoiTracker
+from session import PoseSession
+
+mp_pose = mp.solutions.pose
+mp_drawing = mp.solutions.drawing_utils
+
+FRAME_SIZE = (960, 540)  # Room cameras are wider than the single-student feed
+DETECT_INTERVAL = 10  # Look for new people every this many frames
+DETECT_WIDTH = 640  # Frames are downscaled to this width for person detection
+MIN_VISIBILITY = 0.5  # Landmarks below this visibility do not count towards a person's box
+MASK_PADDING = 0.2  # Margin blanked around each person found, as a fraction of their box
+MATCH_IOU = 0.3  # A detection continues a track when their regions overlap at least this much
+DUPLICATE_IOU = 0.6  # Two tracks overlapping this much follow the same person; the newer one is dropped
+MAX_MISSED = 15  # Frames a person may go without a pose before their track is dropped
+MAX_PEOPLE = 8  # Most people tracked at once
+
+logger = get_logger(__name__)
+
+
+def box_iou(a, b):
+    """Intersection over union of two (x0, y0, x1, y1) boxes."""
+    width = min(a[2], b[2]) - max(a[0], b[0])
+    height = min(a[3], b[3]) - max(a[1], b[1])
+    if width <= 0 or height <= 0:
+        return 0.0
+    intersection = width * height
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - intersection
+    return intersection / union
+
+
+class PersonDetector:
+    """
+    Find people by running a still-image Pose graph on the frame repeatedly.
+
+    MediaPipe finds one person per pass, so each person found is blanked out and the
+    frame searched again until no pose is left. People who are already tracked are
+    blanked before the first pass, so a detection round only pays for newcomers.
+    (OpenCV's HOG pedestrian detector was tried first but misses most non-upright poses.)
+    """
+
+    def __init__(self, detect_width=DETECT_WIDTH, min_visibility=MIN_VISIBILITY):
+        self.detect_width = detect_width
+        self.min_visibility = min_visibility
+        self.pose = None
+
+    def detect(self, rgb_frame, known_boxes=(), limit=MAX_PEOPLE):
+        """Return boxes (x0, y0, x1, y1) in the frame's pixels of people outside the known boxes."""
+        if self.pose is None:
+            self.pose = mp_pose.Pose(static_image_mode=True)
+        scale = min(1.0, self.detect_width / rgb_frame.shape[1])
+        small = cv2.resize(rgb_frame, None, fx=scale, fy=scale) if scale < 1 else rgb_frame.copy()
+        height, width = small.shape[:2]
+        for x0, y0, x1, y1 in known_boxes:
+            small[int(y0 * scale):int(y1 * scale), int(x0 * scale):int(x1 * scale)] = 0
+
+        boxes = []
+        while len(boxes) < limit:
+            landmarks = landmarks_to_array(self.pose.process(small).pose_landmarks)
+            if landmarks is None:
+                break
+            visible = landmarks[landmarks[:, 3] >= self.min_visibility]
+            if len(visible) < 2:
+                break
+            x0, y0 = np.clip(visible[:, :2].min(axis=0), 0, 1) * (width, height)
+            x1, y1 = np.clip(visible[:, :2].max(axis=0), 0, 1) * (width, height)
+            box = (float(x0 / scale), float(y0 / scale), float(x1 / scale), float(y1 / scale))
+            if x1 - x0 < 2 or y1 - y0 < 2 or any(box_iou(box, found) > 0 for found in boxes):
+                break  # A pose guessed from the remains of someone already found
+            boxes.append(box)
+            # Blank the person with some margin so their remains are not found again
+            pad_x, pad_y = (x1 - x0) * MASK_PADDING, (y1 - y0) * MASK_PADDING
+            small[max(0, int(y0 - pad_y)):int(y1 + pad_y) + 1, max(0, int(x0 - pad_x)):int(x1 + pad_x) + 1] = 0
+        return boxes
+
+    def close(self):
+        if self.pose is not None:
+            self.pose.close()
+            self.pose = None
+
+
+class TrackedPerson:
+    """One person in the room with their own crop region, Pose graph and PoseSession."""
+
+    def __init__(self, person_id, box, frame_shape, reference_image, reference_landmarks, analytics=None):
+        self.id = person_id
+        self.roi_tracker = RoiTracker()
+        self.roi_tracker.set_box(box, frame_shape)
+        self.session = PoseSession(f"person {person_id}", reference_image, reference_landmarks)
+        self.pose = None  # Created on the worker thread the first time this person is processed
+        self.landmarks = None  # Latest full-frame (33, 4) landmarks, or None
+        self.update = None  # Latest SessionUpdate, or None
+        self.missed = 0  # Consecutive frames without a pose
+        # This person's session in the analytics store, if one is kept
+        self.analytics = analytics.open_session(self.session.name) if analytics is not None else None
+
+    def estimate(self, rgb_frame, now):
+        """Run pose estimation on this person's crop and score it (called on a worker thread)."""
+        if self.pose is None:
+            # Not a still image: each person's graph keeps tracking them inside their stable crop
+            self.pose = mp_pose.Pose()
+        crop, roi = self.roi_tracker.crop(rgb_frame)
+        result = self.pose.process(np.ascontiguousarray(crop))
+        landmarks = landmarks_to_array(result.pose_landmarks)
+        if landmarks is None:
+            self.missed += 1
+            self.landmarks = None
+            self.update = None  # A stale update would repeat its feedback and hold events
+            if self.analytics is not None:
+                self.analytics.record(None, now=now)
+            return
+        self.missed = 0
+        self.landmarks = self.roi_tracker.to_frame(landmarks, roi, rgb_frame.shape)
+        self.roi_tracker.update(self.landmarks, rgb_frame.shape)
+        if self.roi_tracker.roi is None:
+            self.roi_tracker.roi = roi  # Keep the last crop; the full frame would pick up someone else
+        if self.session.reference_landmarks is not None:
+            self.update = self.session.evaluate(self.landmarks, now)
+            if self.analytics is not None:
+                self.analytics.record_update(self.update, now=now)
+
+    def close(self):
+        if self.pose is not None:
+            self.pose.close()
+            self.pose = None
+        if self.analytics is not None:
+            self.analytics.close()
+
+
+class MultiPersonTracker:
+    """
+    Score everyone in one camera's view, each against the reference with their own timers.
+
+    People are detected only every ``detect_interval`` frames; in between, each person's
+    crop follows their own landmarks, and detections are matched to existing tracks by
+    IoU so IDs stay stable. Each tracked person has a Pose graph running on their crop
+    only, and all crops of a frame are processed in parallel on a thread pool (MediaPipe
+    releases the GIL), so adding people costs one crop inference each, not a full-frame pass.
+    """
+
+    def __init__(self, reference_image=None, reference_landmarks=None, detect_interval=DETECT_INTERVAL,
+                 workers=4, max_people=MAX_PEOPLE, analytics=None):
+        self.reference_image = reference_image
+        self.reference_landmarks = reference_landmarks
+        self.detect_interval = detect_interval
+        self.max_people = max_people
+        self.analytics = analytics  # AnalyticsStore every person's frames are logged to, or None
+        self.detector = PersonDetector()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="person")
+        self.people = []
+        self.frame_index = 0
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+
+    def set_reference(self, reference_image, reference_landmarks):
+        """Switch everyone to a new reference pose."""
+        with self.lock:
+            self.reference_image, self.reference_landmarks = reference_image, reference_landmarks
+            for person in self.people:
+                person.session.set_reference(reference_image, reference_landmarks)
+
+    def _match_detections(self, boxes, frame_shape):
+        """Re-anchor tracks that lost their pose and start tracks for new people."""
+        pairs = sorted(((box_iou(box, person.roi_tracker.roi), index, person)
+                        for index, box in enumerate(boxes) for person in self.people), key=lambda p: -p[0])
+        used_boxes, matched = set(), set()
+        for iou, index, person in pairs:
+            if iou < MATCH_IOU:
+                break
+            if index in used_boxes or person.id in matched:
+                continue
+            used_boxes.add(index)
+            matched.add(person.id)
+            if person.missed:
+                person.roi_tracker.set_box(boxes[index], frame_shape)
+
+        for index, box in enumerate(boxes):
+            if index not in used_boxes and len(self.people) < self.max_people:
+                self.people.append(TrackedPerson(next(self.ids), box, frame_shape,
+                                                 self.reference_image, self.reference_landmarks, self.analytics))
+
+    def _prune(self):
+        """Drop tracks that lost their person or that follow someone another track already follows."""
+        kept = []
+        for person in self.people:  # Oldest first, so the older ID survives a duplicate
+            duplicate = any(box_iou(person.roi_tracker.roi, other.roi_tracker.roi) >= DUPLICATE_IOU
+                            for other in kept)
+            if person.missed > MAX_MISSED or duplicate:
+                person.close()
+            else:
+                kept.append(person)
+        self.people = kept
+
+    def process(self, frame, now=None):
+        """Track and score everyone in a BGR frame. Returns the tracked people."""
+        now = time.time() if now is None else now
+        with self.lock:
+            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            if self.frame_index % self.detect_interval == 0 or not self.people:
+                with metrics.span("person_detection"):
+                    # People being tracked right now are masked out; lost ones may be found again
+                    known = [person.roi_tracker.roi for person in self.people if not person.missed]
+                    boxes = self.detector.detect(rgb_frame, known, self.max_people - len(known))
+                    self._match_detections(boxes, frame.shape)
+            self.frame_index += 1
+
+            with metrics.span("pose_process"):
+                list(self.executor.map(lambda person: person.estimate(rgb_frame, now), self.people))
+            self._prune()
+            return list(self.people)
+
+    def close(self):
+        self.executor.shutdown()
+        self.detector.close()
+        for person in self.people:
+            person.close()
+        self.people = []
+
+
+def draw_people(frame, people):
+    """Draw every person's skeleton, ID and similarity on the frame."""
+    for person in people:
+        if person.landmarks is None:
+            continue
+        mp_drawing.draw_landmarks(frame, array_to_landmarks(person.landmarks), mp_pose.POSE_CONNECTIONS)
+        x0, y0 = person.roi_tracker.roi[:2]
+        label = f"#{person.id}"
+        color = (255, 255, 0)
+        if person.update is not None:
+            label += f" {person.update.similarity:.2f}"
+            color = (0, 200, 0) if person.update.matched else (0, 0, 255)
+        cv2.putText(frame, label, (x0 + 5, y0 + 25), cv2.FONT_HERSHEY_SIMPLEX, 0.8, color, 2)
+    return frame
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score every person in one camera's view.")
+    parser.add_argument("source", nargs="?", default="0", help="Webcam index, video file or stream URL")
+    parser.add_argument("--reference", help="Reference pose image")
+    parser.add_argument("--detect-interval", type=int, default=DETECT_INTERVAL,
+                        help="Frames between person detections")
+    parser.add_argument("--workers", type=int, default=4, help="Crops processed in parallel")
+    parser.add_argument("--max-people", type=int, default=MAX_PEOPLE)
+    parser.add_argument("--analytics", action="store_true",
+                        help="Log every person's scores and print a summary per person at the end")
+    args = parser.parse_args()
+
+    reference_image, reference_landmarks = None, None
+    if args.reference:
+        cache = ReferenceCache()
+        reference_image = load_reference_image(args.reference)
+        reference_landmarks = cache.get_or_detect(args.reference, reference_image)
+        cache.save()
+        cache.close()
+        if reference_landmarks is None:
+            print("Could not detect landmarks from the reference image. Exiting.")
+            return
+
+    cap = open_source(args.source)
+    if not cap.isOpened():
+        print(f"Error: Could not open source {args.source}.")
+        return
+
+    store = AnalyticsStore() if args.analytics else None
+    started = time.time()
+    tracker = MultiPersonTracker(reference_image, reference_landmarks, args.detect_interval,
+                                 args.workers, args.max_people, store)
+    print("Press 'q' to exit.")
+    try:
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frame = cv2.resize(frame, FRAME_SIZE)
+            for person in tracker.process(frame):
+                update = person.update
+                if update is not None and update.feedback_due:
+                    logger.info("[%s] Pose does not match the reference (similarity %.2f).",
+                                person.session.name, update.similarity)
+                if update is not None and update.hold_complete:
+                    logger.info("[%s] Pose held for %s seconds.", person.session.name, person.session.hold_time)
+            cv2.imshow("Pose Detection - Room", draw_people(frame, tracker.people))
+            metrics.frame_done()
+            if cv2.waitKey(1) & 0xFF == ord("q"):
+                break
+    except KeyboardInterrupt:
+        print("\nKeyboard Interrupt detected. Exiting.")
+    finally:
+        cap.release()
+        tracker.close()
+        cv2.destroyAllWindows()
+        if store is not None:
+            store.flush()
+            for report in store.class_report(started):
+                print_report(report)
+            store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+import hashlib
+import os
+import sys
+import threading
+from audio import init_mixer
+from instrumentation import get_logger
+from speech import SPEECH_RATE
+
+PHRASE_CACHE_DIR = "phrase_cache"  # Folder holding one synthesized clip per feedback message
+
+logger = get_logger(__name__)
+
+
+class PhraseCache:
+    """
+    Pre-synthesized audio clips for the fixed set of feedback messages.
+
+    Each message is rendered once with pyttsx3 into a WAV file named after a hash of the
+    text and speech rate, so changing either renders a fresh clip. Clips are loaded into
+    the pygame mixer on first use and played from memory afterwards, which starts in
+    milliseconds instead of running the speech synthesizer for every utterance.
+    """
+
+    def __init__(self, directory=PHRASE_CACHE_DIR, rate=SPEECH_RATE):
+        self.directory = directory
+        self.rate = rate
+        self.sounds = {}  # message -> loaded pygame Sound
+        self.failed = set()  # Messages whose clip could not be loaded
+        self.lock = threading.Lock()
+
+    def clip_path(self, message):
+        key = hashlib.sha1(f"{self.rate}:{message}".encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.directory, f"{key}.wav")
+
+    def has_clip(self, message):
+        path = self.clip_path(message)
+        return os.path.isfile(path) and os.path.getsize(path) > 0
+
+    def render(self, messages, engine=None):
+        """
+        Synthesize clips for the messages that are not on disk yet and return how many were written.
+        Pass the engine of the thread rendering the clips, since pyttsx3 engines are not thread-safe.
+        """
+        missing = [message for message in dict.fromkeys(messages) if not self.has_clip(message)]
+        if not missing:
+            return 0
+
+        os.makedirs(self.directory, exist_ok=True)
+        if engine is None:
+            import pyttsx3
+            engine = pyttsx3.init()
+        engine.setProperty("rate", self.rate)
+        for message in missing:
+            engine.save_to_file(message, self.clip_path(message))
+        engine.runAndWait()
+
+        with self.lock:
+            self.failed.difference_update(missing)
+        return sum(self.has_clip(message) for message in missing)
+
+    def load(self, message):
+        """Return the mixer Sound for a message, or None if it has no usable clip."""
+        with self.lock:
+            sound = self.sounds.get(message)
+            if sound is not None or message in self.failed:
+                return sound
+            if not self.has_clip(message) or not init_mixer():
+                return None
+            import pygame  # Already imported by init_mixer
+            try:
+                sound = pygame.mixer.Sound(self.clip_path(message))
+            except pygame.error as e:
+                logger.error("Error loading feedback clip for '%s': %s", message, e)
+                self.failed.add(message)
+                return None
+            self.sounds[message] = sound
+            return sound
+
+    def play(self, message):
+        """Start playing a message's clip. Returns its length in seconds, or None if there is no clip."""
+        sound = self.load(message)
+        if sound is None:
+            return None
+        import pygame
+        try:
+            sound.play()
+        except pygame.error as e:
+            logger.error("Error playing feedback clip: %s", e)
+            return None
+        return sound.get_length()
+
+
+if __name__ == "__main__":
+    # Render every feedback message ahead of time, e.g. right after installing
+    from feedback import FEEDBACK_MESSAGES
+
+    cache = PhraseCache(sys.argv[1] if len(sys.argv) > 1 else PHRASE_CACHE_DIR)
+    rendered = cache.render(FEEDBACK_MESSAGES)
+    print(f"Rendered {rendered} new clip(s); "
+          f"{sum(cache.has_clip(m) for m in FEEDBACK_MESSAGES)}/{len(FEEDBACK_MESSAGES)} phrases cached "
+          f"in '{cache.directory}'.")
@@ -0,0 +1,169 @@
+import threading
+import time
+from instrumentation import get_logger, metrics
+
+logger = get_logger(__name__)
+
+# Drop policies for a full queue
+DROP_OLDEST = "oldest"  # Replace the queued item with the new one (latest frame wins)
+DROP_NEWEST = "newest"  # Keep the queued item and discard the new one
+BLOCK = "block"  # Wait until the consumer makes room (no frames are dropped)
+DROP_POLICIES = (DROP_OLDEST, DROP_NEWEST, BLOCK)
+
+READ_RETRY_DELAY = 0.01  # Seconds to wait before reading again after a failed read
+MAX_READ_FAILURES = 100  # Consecutive failed reads (about 1 s) before the capture counts as lost
+
+
+class LatestQueue:
+    """
+    Small bounded queue used to hand frames from one pipeline stage to the next.
+
+    With the default DROP_OLDEST policy and maxsize=1 the consumer always gets the
+    most recent frame, so a slow stage never builds up a backlog.
+    """
+
+    def __init__(self, maxsize=1, drop_policy=DROP_OLDEST):
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError(f"Unknown drop policy: {drop_policy}")
+        self.maxsize = max(1, maxsize)
+        self.drop_policy = drop_policy
+        self.items = []
+        self.dropped = 0
+        self.closed = False
+        self.condition = threading.Condition()
+
+    def put(self, item):
+        """Add an item, applying the drop policy when full. Returns False if an item was dropped."""
+        with self.condition:
+            if self.drop_policy == BLOCK:
+                while len(self.items) >= self.maxsize and not self.closed:
+                    self.condition.wait()
+            if self.closed:
+                return False
+
+            accepted = True
+            if len(self.items) >= self.maxsize:
+                self.dropped += 1
+                accepted = False
+                if self.drop_policy == DROP_NEWEST:
+                    return False
+                self.items.pop(0)
+            self.items.append(item)
+            self.condition.notify_all()
+            return accepted
+
+    def get(self, timeout=None):
+        """Remove and return the oldest item, or None on timeout or when closed."""
+        with self.condition:
+            if not self.condition.wait_for(lambda: self.items or self.closed, timeout):
+                return None
+            if not self.items:
+                return None
+            item = self.items.pop(0)
+            self.condition.notify_all()
+            return item
+
+    def close(self):
+        """Wake up all waiting producers and consumers."""
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+
+class FramePipeline:
+    """
+    Runs capture and pose inference on separate threads joined by bounded queues.
+
+    ``capture`` is anything with a ``read()`` method returning ``(ok, frame)``, such as
+    ``cv2.VideoCapture`` or a frame source from frame_sources.py. When a finite source
+    sets ``ended``, or reads keep failing (an unplugged webcam, the end of a stream),
+    the pipeline finishes the queued frames and stops by itself (``running`` turns False).
+    ``process`` is called on the inference thread for each frame and its return value is
+    handed to the render stage through ``get()``. While frame N is being processed, frame
+    N+1 is already being captured.
+    """
+
+    def __init__(self, capture, process, queue_size=1, drop_policy=DROP_OLDEST, frame_skip=1,
+                 max_read_failures=MAX_READ_FAILURES):
+        self.capture = capture
+        self.process = process
+        self.frame_skip = max(1, frame_skip)
+        self.max_read_failures = max(1, max_read_failures)
+        self.frames = LatestQueue(queue_size, drop_policy)
+        self.results = LatestQueue(queue_size, drop_policy)
+        self.running = False
+        self.capture_ended = False
+        self.threads = []
+
+    def start(self):
+        """Start the capture and inference threads."""
+        self.running = True
+        self.threads = [
+            threading.Thread(target=self._capture_loop, name="capture", daemon=True),
+            threading.Thread(target=self._inference_loop, name="inference", daemon=True),
+        ]
+        for thread in self.threads:
+            thread.start()
+
+    def stop(self, release=True):
+        """Stop both stages and optionally release the capture device."""
+        self.running = False
+        self.frames.close()
+        self.results.close()
+        for thread in self.threads:
+            if thread is not threading.current_thread():
+                thread.join(timeout=2)
+        self.threads = []
+        if release and hasattr(self.capture, "release"):
+            self.capture.release()
+
+    def get(self, timeout=None):
+        """Return the latest processed result for the render stage, or None if none is ready."""
+        return self.results.get(timeout)
+
+    @property
+    def dropped_frames(self):
+        """Number of frames discarded because a later stage was busy."""
+        return self.frames.dropped + self.results.dropped
+
+    def _capture_loop(self):
+        frame_count = 0
+        failures = 0  # Consecutive failed reads
+        while self.running:
+            with metrics.span("capture"):
+                ret, frame = self.capture.read()
+            if not ret:
+                if getattr(self.capture, "ended", False):
+                    logger.info("End of stream.")
+                    self.capture_ended = True
+                    return
+                failures += 1
+                if failures >= self.max_read_failures:
+                    logger.error("No frames after %d reads; stopping the capture.", failures)
+                    self.capture_ended = True
+                    return
+                logger.warning("Error reading webcam frame.")
+                time.sleep(READ_RETRY_DELAY)
+                continue
+
+            failures = 0
+            frame_count += 1
+            if frame_count % self.frame_skip != 0:
+                continue  # Skip frames to reduce inference load
+            self.frames.put(frame)
+
+    def _inference_loop(self):
+        while self.running:
+            frame = self.frames.get(timeout=0.1 if self.capture_ended else 0.5)
+            if frame is None:
+                if self.capture_ended:
+                    # Every frame of a finished source is processed; let the render stage drain and stop
+                    self.running = False
+                    self.results.close()
+                continue
+            try:
+                result = self.process(frame)
+            except Exception as e:
+                logger.error("Error processing frame: %s", e)
+                continue
+            self.results.put(result)
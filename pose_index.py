@@ -0,0 +1,230 @@
+import argparse
+import json
+import os
+import random
+from collections import namedtuple
+import numpy as np
+from features import NUM_FEATURES, PoseFeatures, as_features, extract_features, feature_similarity
+from landmarks import NUM_LANDMARKS, LANDMARK_FIELDS, PoseLandmark
+from pose_workers import detect_image, init_worker, process_pool
+from reference_cache import IMAGE_EXTENSIONS, IMAGE_FOLDER, REFERENCE_SIZE, pose_name
+
+INDEX_FILE = "pose_index.npz"
+METADATA_FILE = "poses.json"  # Optional per-folder sidecar: {"file.jpg": {"name": ..., "difficulty": ...}}
+MIN_QUALITY = 0.5  # Images whose body landmarks are on average less visible than this are rejected
+CHUNK_SIZE = 16  # Images sent to a worker at a time
+
+# Quality only looks at the body; face points are not used for scoring
+BODY = np.arange(PoseLandmark.LEFT_SHOULDER, NUM_LANDMARKS)
+
+# One indexed reference pose
+PoseEntry = namedtuple("PoseEntry", ["path", "name", "difficulty", "quality", "landmarks"])
+
+def pose_quality(landmarks):
+    """Mean visibility of the body landmarks, from 0 (hidden) to 1 (clearly visible)."""
+    return float(np.clip(landmarks[BODY, 3], 0, 1).mean())
+
+
+def find_images(folder):
+    """Walk a library folder and return every image path with its sidecar metadata."""
+    images = []
+    for directory, subdirectories, files in os.walk(folder):
+        subdirectories.sort()
+        metadata = {}
+        sidecar = os.path.join(directory, METADATA_FILE)
+        if os.path.isfile(sidecar):
+            try:
+                with open(sidecar, encoding="utf-8") as f:
+                    metadata = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Error reading {sidecar}: {e}")
+        for file_name in sorted(files):
+            if file_name.lower().endswith(IMAGE_EXTENSIONS):
+                images.append((os.path.join(directory, file_name), metadata.get(file_name, {})))
+    return images
+
+
+class PoseIndex:
+    """
+    Compact index of a reference pose library: metadata, landmarks and features in one .npz.
+
+    Every entry is known to contain a detectable pose, so picking a reference never
+    needs inference. Random picks are O(1), and nearest-pose lookup is a single
+    matrix-vector product over the precomputed features.
+    """
+
+    def __init__(self, index_file=INDEX_FILE):
+        self.index_file = index_file
+        self.count = 0
+        self.paths = []
+        self.names = []
+        self.difficulty = np.zeros(0, dtype=np.int16)
+        self.quality = np.zeros(0, dtype=np.float32)
+        self.stats = np.zeros((0, 2), dtype=np.int64)  # (mtime_ns, size) of every image
+        self.landmarks = np.zeros((0, NUM_LANDMARKS, LANDMARK_FIELDS), dtype=np.float32)
+        self.weighted = np.zeros((0, 2 * NUM_FEATURES), dtype=np.float32)
+        self.weights = np.zeros((0, NUM_FEATURES), dtype=np.float32)
+        self.by_difficulty = {}  # difficulty -> entry indices
+
+    def __len__(self):
+        return self.count
+
+    def load(self):
+        """Load the index file. Returns False if it is missing or unreadable."""
+        if not os.path.exists(self.index_file):
+            return False
+        try:
+            with np.load(self.index_file) as data:
+                arrays = {name: data[name] for name in data.files}
+        except Exception as e:
+            print(f"Error loading pose index: {e}")
+            return False
+        if tuple(arrays["resolution"]) != REFERENCE_SIZE:
+            print("Pose index was built for a different resolution. Rebuild it with pose_index.py.")
+            return False
+        features = None
+        if arrays["weights"].shape[1:] == (NUM_FEATURES,):
+            features = (arrays["weighted"], arrays["weights"])  # Otherwise built by an older feature set
+        self._set(arrays["paths"].astype(str).tolist(), arrays["names"].astype(str).tolist(),
+                  arrays["difficulty"], arrays["quality"], arrays["stats"], arrays["landmarks"], features)
+        return True
+
+    def _set(self, paths, names, difficulty, quality, stats, landmarks, features=None):
+        if features is None and len(paths):
+            features = extract_features(landmarks)
+        self.paths = paths
+        self.names = names
+        self.difficulty = np.asarray(difficulty, dtype=np.int16)
+        self.quality = np.asarray(quality, dtype=np.float32)
+        self.stats = np.asarray(stats, dtype=np.int64).reshape(-1, 2)
+        self.landmarks = np.asarray(landmarks, dtype=np.float32).reshape(-1, NUM_LANDMARKS, LANDMARK_FIELDS)
+        if features is not None:
+            self.weighted, self.weights = features
+        self.by_difficulty = {}
+        for index, level in enumerate(self.difficulty.tolist()):
+            self.by_difficulty.setdefault(level, []).append(index)
+        self.count = len(paths)  # Set last so readers on other threads see a complete index
+
+    def save(self):
+        """Write the index atomically."""
+        temp_file = self.index_file + ".tmp"
+        with open(temp_file, "wb") as f:
+            np.savez(f, paths=np.array(self.paths, dtype=str), names=np.array(self.names, dtype=str),
+                     difficulty=self.difficulty, quality=self.quality, stats=self.stats,
+                     landmarks=self.landmarks, weighted=self.weighted[:self.count],
+                     weights=self.weights[:self.count], resolution=np.array(REFERENCE_SIZE, dtype=np.int32))
+        os.replace(temp_file, self.index_file)
+
+    def entry(self, index):
+        return PoseEntry(self.paths[index], self.names[index], int(self.difficulty[index]),
+                         float(self.quality[index]), self.landmarks[index])
+
+    def random_entry(self, difficulty=None, exclude=None):
+        """Pick a random pose in O(1), optionally of one difficulty and never the excluded path."""
+        candidates = self.by_difficulty.get(difficulty, []) if difficulty is not None else range(self.count)
+        if not candidates:
+            return None
+        index = random.choice(candidates)
+        if len(candidates) > 1 and self.paths[index] == exclude:
+            index = random.choice([i for i in candidates if i != index])
+        return self.entry(index)
+
+    def scores(self, landmarks):
+        """Similarity of a live pose to every indexed pose as an (N,) array."""
+        library = PoseFeatures(self.weighted[:self.count], self.weights[:self.count])
+        return feature_similarity(library, as_features(landmarks))
+
+    def nearest(self, landmarks, k=5):
+        """Return the k indexed poses most similar to a live pose as [(PoseEntry, score), ...]."""
+        if self.count == 0 or landmarks is None:
+            return []
+        scores = self.scores(landmarks)
+        k = min(k, self.count)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.entry(i), float(scores[i])) for i in top]
+
+    def best_match(self, landmarks):
+        """Return the name and score of the closest indexed pose, or (None, 0); same as PoseLibrary."""
+        matches = self.nearest(landmarks, 1)
+        if not matches:
+            return None, 0
+        entry, score = matches[0]
+        return entry.name, score
+
+    def build(self, folder=IMAGE_FOLDER, workers=None, min_quality=MIN_QUALITY):
+        """
+        Index every image under a folder on a process pool.
+
+        Images whose file did not change since the last build keep their entry; the
+        rest are detected in parallel. Images without a pose, or with a pose that is
+        mostly hidden, are rejected and listed.
+        """
+        known = {path: index for index, path in enumerate(self.paths[:self.count])}
+        images = find_images(folder)
+        stats = {}
+        for path, _ in images:
+            st = os.stat(path)
+            stats[path] = (st.st_mtime_ns, st.st_size)
+        reuse = {path: known[path] for path, _ in images
+                 if path in known and tuple(self.stats[known[path]]) == stats[path]}
+        pending = [path for path, _ in images if path not in reuse]
+
+        detected = {}
+        if pending:
+            print(f"Detecting poses in {len(pending)} image(s)...")
+            with process_pool(workers) as executor:
+                for path, landmarks in executor.map(detect_image, pending, chunksize=CHUNK_SIZE):
+                    detected[path] = landmarks
+
+        paths, names, difficulty, quality, entry_stats, landmarks, rejected = [], [], [], [], [], [], []
+        for path, metadata in images:
+            pose = self.landmarks[reuse[path]] if path in reuse else detected.get(path)
+            score = pose_quality(pose) if pose is not None else 0.0
+            if pose is None or score < min_quality:
+                rejected.append((path, "no pose detected" if pose is None else f"quality {score:.2f}"))
+                continue
+            paths.append(path)
+            names.append(str(metadata.get("name", pose_name(path))))
+            difficulty.append(int(metadata.get("difficulty", 0)))
+            quality.append(score)
+            entry_stats.append(stats[path])
+            landmarks.append(pose)
+
+        self._set(paths, names, difficulty, quality, entry_stats,
+                  np.array(landmarks, dtype=np.float32).reshape(-1, NUM_LANDMARKS, LANDMARK_FIELDS))
+        for path, reason in rejected:
+            print(f"Rejected {path}: {reason}")
+        print(f"Pose index ready: {self.count} pose(s), {len(reuse)} unchanged, "
+              f"{len(pending)} detected, {len(rejected)} rejected.")
+        return rejected
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index a reference pose library for instant pose selection.")
+    parser.add_argument("folder", nargs="?", default=IMAGE_FOLDER, help="Library folder (searched recursively)")
+    parser.add_argument("--index", default=INDEX_FILE, help="Index file to create or update")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument("--min-quality", type=float, default=MIN_QUALITY,
+                        help="Reject poses whose body landmarks are less visible than this on average")
+    parser.add_argument("--nearest", metavar="IMAGE", help="List the indexed poses closest to this image's pose")
+    args = parser.parse_args()
+
+    index = PoseIndex(args.index)
+    index.load()
+    if args.nearest:
+        init_worker()
+        _, landmarks = detect_image(args.nearest)
+        if landmarks is None:
+            print("No pose detected in the query image.")
+            return
+        for entry, score in index.nearest(landmarks):
+            print(f"{score:.3f}  {entry.name} (difficulty {entry.difficulty})  {entry.path}")
+        return
+
+    index.build(args.folder, args.workers, args.min_quality)
+    index.save()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import cv2
+from landmarks import landmarks_to_array
+from reference_cache import REFERENCE_SIZE, load_reference_image
+
+# One MediaPipe Pose graph per worker process, created by the pool initializer
+worker_pose = None
+
+
+def init_worker(static_image_mode=True):
+    """Create this worker process's Pose graph: a still-image graph, or a tracking one for video."""
+    global worker_pose
+    import mediapipe as mp
+    worker_pose = mp.solutions.pose.Pose(static_image_mode=static_image_mode)
+
+
+def detect_image(image_path, size=REFERENCE_SIZE):
+    """Detect the pose in one image resized to ``size``; returns (path, landmarks or None)."""
+    image = load_reference_image(image_path, size)
+    if image is None:
+        return image_path, None
+    result = worker_pose.process(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+    return image_path, landmarks_to_array(result.pose_landmarks)
+
+
+def process_pool(workers=None, static_image_mode=True):
+    """
+    A process pool whose workers each own a Pose graph (``worker_pose``).
+
+    Workers are spawned, not forked: forking a process that already owns a MediaPipe
+    graph is unsafe.
+    """
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                               initializer=init_worker, initargs=(static_image_mode,))
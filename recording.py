@@ -0,0 +1,138 @@
+import os
+import sys
+import time
+import numpy as np
+from landmarks import NUM_LANDMARKS, LANDMARK_FIELDS, landmarks_to_array
+
+# File layout: a fixed 64-byte header followed by fixed-size frame records
+MAGIC = b"YOGAREC1"
+HEADER_SIZE = 64
+HEADER_DTYPE = np.dtype([
+    ("magic", "S8"),
+    ("capacity", "<i8"),
+    ("count", "<i8"),  # Frames stored so far (never more than capacity)
+    ("head", "<i8"),  # Index of the oldest frame once a ring recording wraps
+    ("ring", "<i8"),
+])
+RECORD_DTYPE = np.dtype([
+    ("timestamp", "<f8"),
+    ("landmarks", "<f4", (NUM_LANDMARKS, LANDMARK_FIELDS)),  # x, y, z, visibility
+])
+DEFAULT_CAPACITY = 30 * 60 * 10  # Ten minutes at 30 FPS
+
+
+class SessionRecorder:
+    """
+    Append per-frame landmarks to a preallocated, memory-mapped recording file.
+
+    When the file is full it doubles in size, or with ``ring=True`` keeps only the
+    most recent ``capacity`` frames. Frames without a detected pose are stored as NaN
+    so replays keep the original timing.
+    """
+
+    def __init__(self, path, capacity=DEFAULT_CAPACITY, ring=False):
+        self.path = path
+        self.ring = ring
+        self.header = None
+        self.records = None
+        self._allocate(capacity)
+        self.header["magic"] = MAGIC
+        self.header["count"] = 0
+        self.header["head"] = 0
+        self.header["ring"] = int(ring)
+
+    def _allocate(self, capacity):
+        """Create or grow the file and (re)map the header and records."""
+        mode = "r+b" if os.path.exists(self.path) and self.header is not None else "w+b"
+        with open(self.path, mode) as f:
+            f.truncate(HEADER_SIZE + capacity * RECORD_DTYPE.itemsize)
+        self.header = np.memmap(self.path, dtype=HEADER_DTYPE, mode="r+", shape=(1,))
+        self.records = np.memmap(self.path, dtype=RECORD_DTYPE, mode="r+",
+                                 offset=HEADER_SIZE, shape=(capacity,))
+        self.header["capacity"] = capacity
+
+    @property
+    def count(self):
+        return int(self.header["count"][0])
+
+    def append(self, landmarks, timestamp=None):
+        """Store one frame; ``landmarks`` may be None when no pose was detected."""
+        capacity = len(self.records)
+        count = self.count
+        if count < capacity:
+            index = count
+            self.header["count"] = count + 1
+        elif self.ring:
+            # Overwrite the oldest frame and advance the ring head
+            index = int(self.header["head"][0])
+            self.header["head"] = (index + 1) % capacity
+        else:
+            self.records.flush()
+            self._allocate(capacity * 2)
+            index = count
+            self.header["count"] = count + 1
+
+        record = self.records[index]
+        record["timestamp"] = time.time() if timestamp is None else timestamp
+        if landmarks is None:
+            record["landmarks"] = np.nan
+        else:
+            record["landmarks"] = landmarks_to_array(landmarks)
+
+    def close(self):
+        """Flush the recording to disk."""
+        if self.records is not None:
+            self.records.flush()
+            self.header.flush()
+            self.records = None
+
+
+class SessionRecording:
+    """Read-only view of a recording file backed directly by the memory-mapped data."""
+
+    def __init__(self, path):
+        header = np.fromfile(path, dtype=HEADER_DTYPE, count=1)[0]
+        if header["magic"] != MAGIC:
+            raise ValueError(f"{path} is not a landmark recording.")
+        self.path = path
+        self.count = int(header["count"])
+        self.head = int(header["head"])
+        self.records = np.memmap(path, dtype=RECORD_DTYPE, mode="r", offset=HEADER_SIZE,
+                                 shape=(self.count,)) if self.count else np.zeros(0, RECORD_DTYPE)
+        if self.head:
+            # A wrapped ring recording has to be reordered once, which copies the data
+            self.records = np.concatenate([self.records[self.head:], self.records[:self.head]])
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def timestamps(self):
+        """(T,) float64 timestamps in seconds."""
+        return self.records["timestamp"]
+
+    @property
+    def landmarks(self):
+        """(T, 33, 4) float32 landmarks; frames without a pose are NaN."""
+        return self.records["landmarks"]
+
+    @property
+    def detected(self):
+        """(T,) boolean mask of frames where a pose was detected."""
+        return ~np.isnan(self.landmarks[:, 0, 0])
+
+
+def load_recording(path):
+    """Open a recording for replay without copying it into memory."""
+    return SessionRecording(path)
+
+
+if __name__ == "__main__":
+    # Print a summary of a recording: python recording.py session.rec
+    recording = load_recording(sys.argv[1])
+    if len(recording):
+        duration = recording.timestamps[-1] - recording.timestamps[0]
+        print(f"{len(recording)} frames over {duration:.1f} s, "
+              f"{int(recording.detected.sum())} with a detected pose.")
+    else:
+        print("Recording is empty.")
@@ -0,0 +1,219 @@
+import os
+import sys
+import tempfile
+import threading
+import cv2
+import numpy as np
+from landmarks import NUM_LANDMARKS, LANDMARK_FIELDS, landmarks_to_array
+
+# Default location of the on-disk landmark cache and the reference image folder
+CACHE_FILE = "landmark_cache.npz"
+IMAGE_FOLDER = "pictures"
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg")
+
+# Reference images are resized to this size before detection (same as the webcam feed)
+REFERENCE_SIZE = (640, 480)
+
+
+def list_images(folder):
+    """Return the paths of all reference images in a folder."""
+    if not os.path.isdir(folder):
+        return []
+    return [
+        os.path.join(folder, f)
+        for f in sorted(os.listdir(folder))
+        if f.lower().endswith(IMAGE_EXTENSIONS)
+    ]
+
+
+def pose_name(image_path):
+    """Pose name from an image file name, e.g. 'warrior_2.jpg' -> 'warrior 2'."""
+    return os.path.splitext(os.path.basename(image_path))[0].replace("_", " ").replace("-", " ")
+
+
+def load_reference_image(image_path, size=REFERENCE_SIZE):
+    """Read an image from disk and resize it to the reference size."""
+    image = cv2.imread(image_path)
+    if image is None:
+        return None
+    return cv2.resize(image, size)
+
+
+class ReferenceCache:
+    """
+    Cache of reference pose landmarks stored as (33, 4) float32 arrays in a single .npz file.
+
+    Entries are keyed by absolute image path and validated against the file's
+    modification time and size, so edited images are re-detected automatically.
+    """
+
+    def __init__(self, cache_file=CACHE_FILE, size=REFERENCE_SIZE):
+        self.cache_file = cache_file
+        self.size = tuple(size)
+        self.entries = {}  # path -> (mtime_ns, size_bytes, landmarks)
+        self.dirty = False
+        self.changes = 0  # Counts changes, so a save knows whether entries changed while it was writing
+        self.pose = None
+        self.lock = threading.Lock()
+        self.save_lock = threading.Lock()
+        self.detect_lock = threading.Lock()
+        self.load()
+
+    @staticmethod
+    def _key(image_path):
+        return os.path.abspath(image_path)
+
+    @staticmethod
+    def _stat(image_path):
+        try:
+            st = os.stat(image_path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def _changed(self):
+        self.dirty = True
+        self.changes += 1
+
+    def load(self):
+        """Load cached entries from disk, ignoring a missing or unreadable cache file."""
+        if not os.path.exists(self.cache_file):
+            return
+        try:
+            with np.load(self.cache_file) as data:
+                if tuple(data["resolution"]) != self.size:
+                    print("Landmark cache was built for a different resolution. Rebuilding.")
+                    self._changed()
+                    return
+                for path, mtime, size, landmarks in zip(
+                    data["paths"], data["mtimes"], data["sizes"], data["landmarks"]
+                ):
+                    self.entries[str(path)] = (int(mtime), int(size), landmarks)
+        except Exception as e:
+            print(f"Error loading landmark cache: {e}")
+            self.entries = {}
+            self._changed()
+
+    def save(self):
+        """Write the cache to disk if it changed since it was loaded."""
+        with self.save_lock:  # One write at a time, so an older snapshot never replaces a newer one
+            with self.lock:
+                if not self.dirty:
+                    return
+                changes = self.changes
+                paths = list(self.entries)
+                landmarks = np.zeros((len(paths), NUM_LANDMARKS, LANDMARK_FIELDS), dtype=np.float32)
+                for index, path in enumerate(paths):
+                    landmarks[index] = self.entries[path][2]
+                arrays = {
+                    "resolution": np.array(self.size, dtype=np.int32),
+                    "paths": np.array(paths, dtype=str),
+                    "mtimes": np.array([self.entries[p][0] for p in paths], dtype=np.int64),
+                    "sizes": np.array([self.entries[p][1] for p in paths], dtype=np.int64),
+                    "landmarks": landmarks,
+                }
+
+            # Write to a temporary file next to the cache first so a crash never leaves a half-written cache
+            directory = os.path.dirname(os.path.abspath(self.cache_file))
+            temp_file = None
+            try:
+                with tempfile.NamedTemporaryFile(dir=directory, prefix=os.path.basename(self.cache_file) + ".",
+                                                 suffix=".tmp", delete=False) as f:
+                    temp_file = f.name
+                    np.savez(f, **arrays)
+                os.replace(temp_file, self.cache_file)
+            except OSError as e:
+                print(f"Error saving landmark cache: {e}")
+                if temp_file is not None and os.path.exists(temp_file):
+                    os.remove(temp_file)
+                return
+
+            with self.lock:
+                if self.changes == changes:  # Entries changed while writing still need a save
+                    self.dirty = False
+
+    def get(self, image_path):
+        """Return cached landmarks for an image, or None if missing or stale."""
+        key = self._key(image_path)
+        stat = self._stat(image_path)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if stat is None or entry[:2] != stat:
+                # The image changed or was removed, so the cached landmarks are stale
+                del self.entries[key]
+                self._changed()
+                return None
+            return entry[2]
+
+    def put(self, image_path, landmarks):
+        """Store landmarks for an image."""
+        stat = self._stat(image_path)
+        if stat is None or landmarks is None:
+            return
+        with self.lock:
+            self.entries[self._key(image_path)] = (*stat, landmarks_to_array(landmarks))
+            self._changed()
+
+    def detect(self, image):
+        """Run MediaPipe on an already resized BGR reference image."""
+        with self.detect_lock:
+            if self.pose is None:
+                # Separate still-image graph so cache building never shares the live feed's tracker;
+                # mediapipe is only imported when a cache miss needs it
+                import mediapipe as mp
+                self.pose = mp.solutions.pose.Pose(static_image_mode=True)
+            result = self.pose.process(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+        return landmarks_to_array(result.pose_landmarks)
+
+    def get_or_detect(self, image_path, image=None):
+        """Return landmarks for an image, running detection only on a cache miss."""
+        landmarks = self.get(image_path)
+        if landmarks is not None:
+            return landmarks
+
+        if image is None:
+            image = load_reference_image(image_path, self.size)
+            if image is None:
+                return None
+        landmarks = self.detect(image)
+        if landmarks is not None:
+            self.put(image_path, landmarks)
+        return landmarks
+
+    def build(self, folder=IMAGE_FOLDER):
+        """Detect and cache landmarks for every image in a folder, dropping removed files."""
+        image_paths = list_images(folder)
+        folder_key = self._key(folder) + os.sep
+        wanted = {self._key(p) for p in image_paths}
+        with self.lock:
+            for key in list(self.entries):
+                if key.startswith(folder_key) and key not in wanted:
+                    del self.entries[key]
+                    self._changed()
+
+        detected = 0
+        for image_path in image_paths:
+            if self.get(image_path) is not None:
+                continue
+            if self.get_or_detect(image_path) is not None:
+                detected += 1
+            else:
+                print(f"No landmarks detected in {image_path}.")
+        self.save()
+        print(f"Landmark cache ready: {len(image_paths)} images, {detected} newly detected.")
+
+    def close(self):
+        """Release the MediaPipe graph used for detection."""
+        with self.detect_lock:
+            if self.pose is not None:
+                self.pose.close()
+                self.pose = None
+
+
+if __name__ == "__main__":
+    # Rebuild the cache for a folder: python reference_cache.py [folder]
+    cache = ReferenceCache()
+    cache.build(sys.argv[1] if len(sys.argv) > 1 else IMAGE_FOLDER)
+    cache.close()
@@ -0,0 +1,57 @@
+import cv2
+import numpy as np
+from PIL import Image, ImageTk
+
+FRAME_SIZE = (640, 480)  # Size of the webcam feed and the reference image on the canvas
+
+
+class CanvasRenderer:
+    """
+    Draw the webcam feed and the reference image on a Tk canvas without per-frame allocations.
+
+    Both images are persistent canvas items backed by PhotoImages created once. Each
+    webcam frame is converted into a preallocated RGBA buffer that a PIL image wraps
+    without copying, then pasted into the PhotoImage in place. The reference image is
+    only converted again when the session's reference changes.
+    """
+
+    def __init__(self, canvas, size=FRAME_SIZE, reference_position=(FRAME_SIZE[0], 0)):
+        width, height = size
+        self.size = size
+        self.canvas = canvas
+
+        # RGBA has the same memory layout as PIL's internal storage, so frombuffer shares it
+        self.frame_buffer = np.zeros((height, width, 4), dtype=np.uint8)
+        self.frame_image = Image.frombuffer("RGBA", size, self.frame_buffer, "raw", "RGBA", 0, 1)
+        self.frame_photo = ImageTk.PhotoImage("RGBA", size)
+        self.frame_item = canvas.create_image(0, 0, anchor="nw", image=self.frame_photo)
+
+        self.reference_buffer = np.zeros((height, width, 4), dtype=np.uint8)
+        self.reference_image = Image.frombuffer("RGBA", size, self.reference_buffer, "raw", "RGBA", 0, 1)
+        self.reference_photo = ImageTk.PhotoImage("RGBA", size)
+        self.reference_item = canvas.create_image(*reference_position, anchor="nw",
+                                                  image=self.reference_photo)
+        self.reference_version = None
+
+    def _convert(self, image_bgr, buffer):
+        if image_bgr.shape[1::-1] != self.size:
+            image_bgr = cv2.resize(image_bgr, self.size)
+        cv2.cvtColor(image_bgr, cv2.COLOR_BGR2RGBA, dst=buffer)
+
+    def show_frame(self, frame_bgr):
+        """Replace the webcam image with a new BGR frame."""
+        if frame_bgr is None:
+            return
+        self._convert(frame_bgr, self.frame_buffer)
+        self.frame_photo.paste(self.frame_image)
+
+    def show_reference(self, reference):
+        """Show a session Reference, converting its image only when the reference changed."""
+        if reference.version == self.reference_version:
+            return
+        self.reference_version = reference.version
+        if reference.image is None:
+            self.reference_buffer[:] = 0
+        else:
+            self._convert(reference.image, self.reference_buffer)
+        self.reference_photo.paste(self.reference_image)
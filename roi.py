@@ -0,0 +1,87 @@
+import numpy as np
+
+PADDING = 0.3  # Padding added around the landmark bounding box, as a fraction of its size
+MIN_VISIBILITY = 0.5  # Landmarks below this visibility do not shape the region
+MIN_ROI_SIZE = 0.25  # Smallest region, as a fraction of the frame's shorter side
+SHRINK_RATIO = 0.5  # Re-fit when the person covers under half as much of the region as after a fit
+
+
+class RoiTracker:
+    """
+    Track the practitioner's region of interest so inference runs on a crop of the frame.
+
+    The region is the padded bounding box of the previous frame's landmarks. It is kept
+    fixed while the person stays comfortably inside it, so MediaPipe's own tracking keeps
+    working in a stable crop, and falls back to the full frame when tracking is lost.
+    """
+
+    def __init__(self, padding=PADDING, min_visibility=MIN_VISIBILITY):
+        self.padding = padding
+        self.min_visibility = min_visibility
+        self.roi = None  # (x0, y0, x1, y1) in full-frame pixels, or None for the full frame
+
+    def reset(self):
+        """Forget the region so the next frame is processed in full."""
+        self.roi = None
+
+    def crop(self, frame):
+        """Return the part of the frame to run inference on and the region it came from."""
+        height, width = frame.shape[:2]
+        roi = self.roi or (0, 0, width, height)
+        x0, y0, x1, y1 = roi
+        return frame[y0:y1, x0:x1], roi
+
+    @staticmethod
+    def to_frame(landmarks, roi, frame_shape):
+        """Map (33, 4) landmarks normalized to a crop back to full-frame normalized coordinates."""
+        height, width = frame_shape[:2]
+        x0, y0, x1, y1 = roi
+        mapped = landmarks.copy()
+        mapped[:, 0] = (landmarks[:, 0] * (x1 - x0) + x0) / width
+        mapped[:, 1] = (landmarks[:, 1] * (y1 - y0) + y0) / height
+        mapped[:, 2] = landmarks[:, 2] * (x1 - x0) / width  # z uses the same scale as x
+        return mapped
+
+    def _bounds(self, landmarks, frame_shape):
+        """Bounding box of the visible landmarks in full-frame pixels, or None."""
+        height, width = frame_shape[:2]
+        visible = landmarks[landmarks[:, 3] >= self.min_visibility]
+        if len(visible) < 2:
+            return None
+        return (visible[:, 0].min() * width, visible[:, 1].min() * height,
+                visible[:, 0].max() * width, visible[:, 1].max() * height)
+
+    def _fit(self, bounds, frame_shape):
+        """Pad a bounding box into a region of at least the minimum size, clipped to the frame."""
+        height, width = frame_shape[:2]
+        x_min, y_min, x_max, y_max = bounds
+        min_size = MIN_ROI_SIZE * min(width, height)
+        pad_x = max((x_max - x_min) * (1 + 2 * self.padding), min_size) / 2
+        pad_y = max((y_max - y_min) * (1 + 2 * self.padding), min_size) / 2
+        center_x, center_y = (x_min + x_max) / 2, (y_min + y_max) / 2
+        x0 = int(np.clip(center_x - pad_x, 0, width - 1))
+        y0 = int(np.clip(center_y - pad_y, 0, height - 1))
+        x1 = int(np.clip(center_x + pad_x, x0 + 1, width))
+        y1 = int(np.clip(center_y + pad_y, y0 + 1, height))
+        return x0, y0, x1, y1
+
+    def set_box(self, box, frame_shape):
+        """Fit the region around a person's bounding box in full-frame pixels, e.g. from a detector."""
+        self.roi = self._fit(box, frame_shape)
+
+    def update(self, landmarks, frame_shape):
+        """Update the region from full-frame landmarks (or None when tracking was lost)."""
+        bounds = None if landmarks is None else self._bounds(landmarks, frame_shape)
+        if bounds is None:
+            self.reset()
+            return
+        if self.roi is not None:
+            # Keep the current region while the person is inside it and still fills enough of it
+            x0, y0, x1, y1 = self.roi
+            bx0, by0, bx1, by1 = bounds
+            inside = bx0 >= x0 and by0 >= y0 and bx1 <= x1 and by1 <= y1
+            filled = (bx1 - bx0) * (by1 - by0) / ((x1 - x0) * (y1 - y0))
+            fresh_fill = 1 / (1 + 2 * self.padding) ** 2  # Share covered right after a re-fit
+            if inside and filled >= SHRINK_RATIO * fresh_fill:
+                return
+        self.roi = self._fit(bounds, frame_shape)
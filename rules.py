@@ -0,0 +1,162 @@
+import sys
+from collections import namedtuple
+import numpy as np
+from landmarks import PoseLandmark, landmarks_to_array
+
+# Operations a rule can measure between its landmarks
+DIFFERENCE = "difference"  # Signed offset of the first point from the second along an axis
+ABS_DIFFERENCE = "abs_difference"  # Size of that offset, in either direction
+DISTANCE = "distance"  # Straight-line distance between two points in the image plane
+ANGLE = "angle"  # Angle in degrees at the middle of three points
+
+X, Y, Z = 0, 1, 2  # Axes; image y grows downwards, so a larger y is lower in the frame
+
+MIN_VISIBILITY = 0.5  # Rules are skipped when any of their landmarks is less visible than this
+
+# Define thresholds for posture checks
+SHOULDER_THRESHOLD = 0.05  # Threshold for shoulder alignment
+HIP_THRESHOLD = 0.05       # Threshold for hip alignment
+BACK_THRESHOLD = 0.1       # Threshold for back straightness
+HEAD_THRESHOLD = 0.2       # Threshold for head alignment
+KNEE_THRESHOLD = 0.1       # Threshold for knee alignment
+FEET_THRESHOLD = 0.15      # Threshold for feet alignment
+
+# Every message the default posture rules can produce
+LEFT_SHOULDER_LOW = "Your left shoulder is lower than your right. Straighten up."
+RIGHT_SHOULDER_LOW = "Your right shoulder is lower than your left. Straighten up."
+LEFT_HIP_HIGH = "Your left hip is higher than your right. Adjust your stance."
+RIGHT_HIP_HIGH = "Your right hip is higher than your left. Adjust your stance."
+BACK_NOT_STRAIGHT = "Your back is not straight. Keep your torso aligned with your hips."
+SLOUCHING = "You are slouching. Pull your head back to align with your shoulders."
+KNEES_UNEVEN = "Your knees are uneven. Stand with your legs balanced."
+FEET_MISALIGNED = "Your feet are misaligned. Place them parallel to each other."
+
+# One posture check: the rule is violated when the measured value is below `minimum` or above `maximum`.
+# `points` are PoseLandmark rows (two points, or three for ANGLE); `axis` is only used by the differences.
+Rule = namedtuple("Rule", ["id", "op", "points", "axis", "minimum", "maximum", "message"])
+
+DEFAULT_RULES = [
+    Rule("left_shoulder_low", DIFFERENCE, (PoseLandmark.LEFT_SHOULDER, PoseLandmark.RIGHT_SHOULDER),
+         Y, None, SHOULDER_THRESHOLD, LEFT_SHOULDER_LOW),
+    Rule("right_shoulder_low", DIFFERENCE, (PoseLandmark.LEFT_SHOULDER, PoseLandmark.RIGHT_SHOULDER),
+         Y, -SHOULDER_THRESHOLD, None, RIGHT_SHOULDER_LOW),
+    Rule("left_hip_high", DIFFERENCE, (PoseLandmark.LEFT_HIP, PoseLandmark.RIGHT_HIP),
+         Y, -HIP_THRESHOLD, None, LEFT_HIP_HIGH),
+    Rule("right_hip_high", DIFFERENCE, (PoseLandmark.LEFT_HIP, PoseLandmark.RIGHT_HIP),
+         Y, None, HIP_THRESHOLD, RIGHT_HIP_HIGH),
+    Rule("back_not_straight", ABS_DIFFERENCE, (PoseLandmark.LEFT_SHOULDER, PoseLandmark.LEFT_HIP),
+         X, None, BACK_THRESHOLD, BACK_NOT_STRAIGHT),
+    Rule("slouching", DIFFERENCE, (PoseLandmark.NOSE, PoseLandmark.LEFT_SHOULDER),
+         X, -HEAD_THRESHOLD, None, SLOUCHING),
+    Rule("knees_uneven", ABS_DIFFERENCE, (PoseLandmark.LEFT_KNEE, PoseLandmark.RIGHT_KNEE),
+         Y, None, KNEE_THRESHOLD, KNEES_UNEVEN),
+    Rule("feet_misaligned", ABS_DIFFERENCE, (PoseLandmark.LEFT_FOOT_INDEX, PoseLandmark.RIGHT_FOOT_INDEX),
+         X, None, FEET_THRESHOLD, FEET_MISALIGNED),
+]
+
+
+def customize_rules(rules, limits=None, disabled=()):
+    """
+    Adapt a rule table for one pose.
+
+    ``limits`` maps rule IDs to new (minimum, maximum) pairs and ``disabled`` lists rule
+    IDs to leave out, e.g. ``customize_rules(DEFAULT_RULES, disabled=["knees_uneven"])``
+    for a one-legged balance.
+    """
+    limits = limits or {}
+    return [rule._replace(minimum=limits[rule.id][0], maximum=limits[rule.id][1]) if rule.id in limits else rule
+            for rule in rules if rule.id not in disabled]
+
+
+class RuleEngine:
+    """
+    Evaluate a table of posture rules over landmark arrays in one NumPy pass.
+
+    The table is compiled once into index and limit arrays, so checking a frame is a
+    handful of array operations whatever the number of rules. The same code handles a
+    single (33, 4) frame and a (T, 33, 4) recorded session.
+    """
+
+    def __init__(self, rules=DEFAULT_RULES, min_visibility=MIN_VISIBILITY):
+        self.rules = list(rules)
+        self.ids = [rule.id for rule in self.rules]
+        self.messages = {rule.id: rule.message for rule in self.rules}
+        self.min_visibility = min_visibility
+
+        # Two-point rules repeat their last point so every rule has three indices
+        self.points = np.array([tuple(rule.points) + (rule.points[-1],) * (3 - len(rule.points))
+                                for rule in self.rules], dtype=np.intp).reshape(-1, 3)
+        self.axes = np.array([rule.axis or 0 for rule in self.rules], dtype=np.intp)
+        ops = np.array([rule.op for rule in self.rules], dtype=object)
+        self.is_difference = (ops == DIFFERENCE) | (ops == ABS_DIFFERENCE)
+        self.is_absolute = ops == ABS_DIFFERENCE
+        self.is_distance = ops == DISTANCE
+        self.minimum = np.array([-np.inf if rule.minimum is None else rule.minimum for rule in self.rules])
+        self.maximum = np.array([np.inf if rule.maximum is None else rule.maximum for rule in self.rules])
+        self.columns = np.arange(len(self.rules))
+
+    def measure(self, landmarks):
+        """Return each rule's measured value, shaped (..., R) for (..., 33, 4) landmarks."""
+        landmarks = np.asarray(landmarks, dtype=np.float32)
+        first = landmarks[..., self.points[:, 0], :3]
+        middle = landmarks[..., self.points[:, 1], :3]
+        last = landmarks[..., self.points[:, 2], :3]
+
+        offset = first - middle
+        difference = offset[..., self.columns, self.axes]
+        difference = np.where(self.is_absolute, np.abs(difference), difference)
+        distance = np.hypot(offset[..., X], offset[..., Y])
+
+        # Angle at the middle point, measured in the image plane
+        other = last[..., :2] - middle[..., :2]
+        norms = distance * np.hypot(other[..., X], other[..., Y])
+        with np.errstate(invalid="ignore", divide="ignore"):
+            cosine = np.einsum("...i,...i->...", offset[..., :2], other) / norms
+        angle = np.degrees(np.arccos(np.clip(cosine, -1.0, 1.0)))
+
+        return np.where(self.is_difference, difference, np.where(self.is_distance, distance, angle))
+
+    def violations(self, landmarks):
+        """Boolean mask shaped (..., R) of the rules each frame breaks, in ``self.ids`` order."""
+        landmarks = np.asarray(landmarks, dtype=np.float32)
+        values = self.measure(landmarks)
+        visible = landmarks[..., self.points, 3].min(axis=-1) >= self.min_visibility
+        # Frames without a pose hold NaN, which never compares as a violation
+        return visible & ((values < self.minimum) | (values > self.maximum))
+
+    def evaluate(self, landmarks):
+        """
+        Return the IDs of the rules a pose breaks.
+
+        A single pose (array, NormalizedLandmarkList or landmark sequence) gives a list
+        of IDs; a (T, 33, 4) batch gives one list per frame.
+        """
+        array = landmarks_to_array(landmarks)
+        if array is None:
+            return []
+        mask = self.violations(array)
+        if mask.ndim == 1:
+            return [self.ids[index] for index in np.flatnonzero(mask)]
+        return [[self.ids[index] for index in np.flatnonzero(row)] for row in mask]
+
+    def summarize(self, landmarks):
+        """Count how many frames of a (T, 33, 4) batch break each rule."""
+        counts = self.violations(landmarks).sum(axis=0)
+        return dict(zip(self.ids, counts.tolist()))
+
+
+if __name__ == "__main__":
+    # Summarize the posture issues in a recorded session, e.g. python rules.py session.rec
+    from recording import load_recording
+
+    if len(sys.argv) < 2:
+        print("Usage: python rules.py <recording.rec>")
+        sys.exit(1)
+
+    recording = load_recording(sys.argv[1])
+    engine = RuleEngine()
+    counts = engine.summarize(recording.landmarks)
+    frames = max(int(recording.detected.sum()), 1)
+    print(f"{len(recording)} frames, {int(recording.detected.sum())} with a pose.")
+    for rule_id, count in sorted(counts.items(), key=lambda item: -item[1]):
+        print(f"{rule_id:20s} {count:6d} frames ({100 * count / frames:.1f}%)")
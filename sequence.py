@@ -0,0 +1,332 @@
+import argparse
+import os
+import threading
+import time
+from collections import namedtuple
+import cv2
+import numpy as np
+from features import PoseFeatures, extract_features, feature_similarity
+from landmarks import landmarks_to_array
+from reference_cache import IMAGE_EXTENSIONS, ReferenceCache, list_images, pose_name
+
+SAMPLE_RATE = 10  # Reference positions per second taken from a video or recording
+STEP_SECONDS = 2.0  # Length of one step of a video or recording flow
+HOLD_SECONDS = 5.0  # How long each image of an image sequence is meant to be held
+BAND = 30  # Reference positions around the current one considered each frame
+MAX_ADVANCE = 3  # Reference positions one live frame may move forward
+TIE_TOLERANCE = 0.001  # Accumulated costs this close count as a tie, e.g. along a held stretch
+
+# Where a live frame sits in the reference flow
+# ``lag`` is how many seconds later than the reference the student reached the current position
+SequenceUpdate = namedtuple("SequenceUpdate", ["step", "step_name", "position", "progress", "similarity",
+                                               "step_similarity", "lag", "finished"])
+
+
+class ReferenceSequence:
+    """
+    An ordered flow of reference poses with precomputed features.
+
+    Each position has a time (seconds from the start of the flow) and belongs to a
+    step. An image sequence has one position per image; a video or recording is
+    resampled to SAMPLE_RATE positions per second and cut into STEP_SECONDS steps.
+    """
+
+    def __init__(self, landmarks, times, steps, step_names):
+        self.landmarks = np.asarray(landmarks, dtype=np.float32)
+        self.times = np.asarray(times, dtype=np.float64)
+        self.steps = np.asarray(steps, dtype=np.intp)  # Step of every position
+        self.step_names = list(step_names)
+        self.features = extract_features(self.landmarks)
+        # How long each position lasts; the last one as long as the one before it
+        durations = np.diff(self.times)
+        self.durations = np.append(durations, durations[-1] if len(durations) else HOLD_SECONDS)
+
+    def __len__(self):
+        return len(self.times)
+
+    @classmethod
+    def from_images(cls, image_paths, hold_seconds=HOLD_SECONDS, cache=None):
+        """One step per image, in the given order. Images without a pose are skipped."""
+        cache = cache or ReferenceCache()
+        landmarks, names = [], []
+        for path in image_paths:
+            pose = cache.get_or_detect(path)
+            if pose is None:
+                print(f"No pose detected in {path}; skipping it.")
+                continue
+            landmarks.append(pose)
+            names.append(pose_name(path))
+        cache.save()
+        if not landmarks:
+            raise ValueError("None of the images contains a detectable pose.")
+        count = len(landmarks)
+        sequence = cls(landmarks, np.arange(count) * hold_seconds, np.arange(count), names)
+        sequence.durations[:] = hold_seconds
+        return sequence
+
+    @classmethod
+    def from_timeline(cls, timestamps, landmarks, sample_rate=SAMPLE_RATE, step_seconds=STEP_SECONDS):
+        """Resample timestamped landmarks (NaN where no pose was found) into a flow."""
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        landmarks = np.asarray(landmarks, dtype=np.float32)
+        detected = ~np.isnan(landmarks[:, 0, 0])
+        if not detected.any():
+            raise ValueError("The reference flow contains no detected poses.")
+        timestamps, landmarks = timestamps[detected] - timestamps[detected][0], landmarks[detected]
+
+        # Nearest detected frame for every sample time
+        times = np.arange(0, timestamps[-1] + 1e-9, 1.0 / sample_rate)
+        nearest = np.clip(np.searchsorted(timestamps, times), 0, len(timestamps) - 1)
+        earlier = np.maximum(nearest - 1, 0)
+        closer = np.abs(timestamps[earlier] - times) < np.abs(timestamps[nearest] - times)
+        nearest = np.where(closer, earlier, nearest)
+
+        steps = (times // step_seconds).astype(np.intp)
+        names = [f"{start // 60:.0f}:{start % 60:04.1f}" for start in np.arange(steps[-1] + 1) * step_seconds]
+        return cls(landmarks[nearest], times, steps, names)
+
+    @classmethod
+    def from_recording(cls, path, **kwargs):
+        """A flow from a landmark recording, e.g. a teacher recorded with ``compare.py --record``."""
+        from recording import load_recording
+        recording = load_recording(path)
+        return cls.from_timeline(recording.timestamps, recording.landmarks, **kwargs)
+
+    @classmethod
+    def from_video(cls, path, **kwargs):
+        """A flow from a video of the teacher; detection runs once, here, on every frame."""
+        import batch_video  # With pose_workers, loads MediaPipe only when a video is actually used
+        import pose_workers
+
+        chunks = batch_video.plan_chunks(path, chunk_frames=1 << 62)
+        if not chunks:
+            raise ValueError(f"Could not open video {path}.")
+        pose_workers.init_worker(static_image_mode=False)
+        _, _, timestamps_ms, landmarks, detected = batch_video.analyze_chunk(chunks[0])
+        landmarks[~detected] = np.nan
+        return cls.from_timeline(timestamps_ms / 1000.0, landmarks, **kwargs)
+
+
+def load_sequence(paths, **kwargs):
+    """
+    Load a reference flow from a video, a landmark recording (.rec), a batch_video results
+    file (.npz), a folder of images (in name order) or an ordered list of images.
+    """
+    if len(paths) == 1 and os.path.isdir(paths[0]):
+        paths = list_images(paths[0])
+    if len(paths) == 1 and not paths[0].lower().endswith(IMAGE_EXTENSIONS):
+        path = paths[0]
+        if path.endswith(".rec"):
+            return ReferenceSequence.from_recording(path, **kwargs)
+        if path.endswith(".npz"):
+            with np.load(path) as results:
+                landmarks = np.where(results["detected"][:, None, None], results["landmarks"], np.nan)
+                return ReferenceSequence.from_timeline(results["timestamp_ms"] / 1000.0, landmarks, **kwargs)
+        return ReferenceSequence.from_video(path, **kwargs)
+    return ReferenceSequence.from_images(paths, **kwargs)
+
+
+class SequenceTracker:
+    """
+    Follows a live pose stream through a reference flow with streaming dynamic time warping.
+
+    Only the accumulated-cost column for the BAND positions around the current one is
+    updated per frame, with one vectorized similarity call and a step pattern that lets
+    the student stay put or move up to MAX_ADVANCE positions forward. Work and memory
+    per frame are therefore constant, however long the flow or the session.
+
+    Positions that tie (a held stretch of the reference looks the same all along) are
+    resolved towards where the reference clock says the student should be, so holds
+    are followed at the reference's pace instead of sticking at their first position.
+    """
+
+    def __init__(self, sequence, band=BAND, max_advance=MAX_ADVANCE):
+        self.sequence = sequence
+        self.band = band
+        self.max_advance = max_advance
+        self.cost = np.full(len(sequence), np.inf)  # Accumulated alignment cost per position
+        last_start = sequence.times[np.argmax(sequence.steps == sequence.steps[-1])]
+        self.last_step_duration = sequence.times[-1] + sequence.durations[-1] - last_start
+        self.step_totals = np.zeros(len(sequence.step_names))
+        self.step_counts = np.zeros(len(sequence.step_names), dtype=np.int64)
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Start the flow again from its first position."""
+        with self.lock:
+            self.cost[:] = np.inf
+            self.cost[0] = 0.0
+            self.window = (0, 1)  # Positions whose accumulated cost is finite
+            self.position = 0
+            self.start_time = None
+            self.entered_at = 0.0  # Seconds into the session when the current position was reached
+            self.step_entered_at = 0.0  # Seconds into the session when the current step was reached
+            self.last_time = None  # Time of the previous aligned frame
+            self.clock = 0.0  # Where in the reference (seconds) the student is estimated to be
+            self.step_totals[:] = 0
+            self.step_counts[:] = 0
+            self.last_update = None
+
+    def update(self, pose_landmarks, now=None):
+        """Align one live frame and return a SequenceUpdate (the previous one if no pose was found)."""
+        now = time.time() if now is None else now
+        landmarks = landmarks_to_array(pose_landmarks)
+        with self.lock:
+            if self.start_time is None:
+                self.start_time = now
+            if landmarks is None:
+                return self.last_update
+            live = extract_features(landmarks)
+            if not live.weights.any():
+                return self.last_update
+
+            sequence = self.sequence
+            low = max(0, self.position - self.band)
+            high = min(len(sequence), self.position + self.band + 1)
+            reference = PoseFeatures(sequence.features.weighted[low:high], sequence.features.weights[low:high])
+            similarity = feature_similarity(reference, live)
+
+            # Best predecessor of every position: the same position or up to max_advance behind it
+            padded = np.full(high - low + self.max_advance, np.inf)
+            start = max(0, low - self.max_advance)
+            padded[self.max_advance - (low - start):] = self.cost[start:high]
+            best = padded[self.max_advance:].copy()
+            for back in range(1, self.max_advance + 1):
+                np.minimum(best, padded[self.max_advance - back:len(padded) - back], out=best)
+            column = best + (1.0 - similarity)
+            if not np.isfinite(column).any():
+                return self.last_update
+            column -= column.min()  # Only relative costs matter; keeps the values bounded
+
+            old_low, old_high = self.window
+            self.cost[old_low:old_high] = np.inf
+            self.cost[low:high] = column
+            self.window = (low, high)
+
+            # Among tied positions take the one nearest to the reference clock moved on by this frame
+            tied = low + np.flatnonzero(column <= TIE_TOLERANCE)
+            clock = self.clock + (now - self.last_time if self.last_time is not None else 0.0)
+            on_clock = int(np.searchsorted(sequence.times, clock, side="right")) - 1
+            position = int(tied[np.argmin(np.abs(tied - on_clock))])
+            if position != on_clock:
+                clock = sequence.times[position]  # The pose itself placed the student elsewhere
+            self.clock = clock
+            self.last_time = now
+            elapsed = now - self.start_time
+            if position != self.position:
+                if sequence.steps[position] != sequence.steps[self.position]:
+                    self.step_entered_at = elapsed
+                self.position = position
+                self.entered_at = elapsed
+
+            score = float(similarity[position - low])
+            step = int(sequence.steps[position])
+            self.step_totals[step] += score
+            self.step_counts[step] += 1
+
+            # Finished once the last step was reached and held for as long as it lasts in the reference
+            finished = bool(step == sequence.steps[-1] and elapsed - self.step_entered_at >= self.last_step_duration)
+            self.last_update = SequenceUpdate(
+                step, sequence.step_names[step], position, (position + 1) / len(sequence), score,
+                float(self.step_totals[step] / self.step_counts[step]),
+                float(self.entered_at - sequence.times[position]), finished)
+            return self.last_update
+
+    def step_scores(self):
+        """Mean similarity of every step so far (NaN for steps not reached yet)."""
+        with self.lock:
+            with np.errstate(invalid="ignore", divide="ignore"):
+                return self.step_totals / self.step_counts
+
+
+def print_summary(tracker):
+    for name, score in zip(tracker.sequence.step_names, tracker.step_scores()):
+        print(f"  {name:20s} {'not reached' if np.isnan(score) else f'{score:.2f}'}")
+
+
+def replay(tracker, recording_path):
+    """Follow a recorded session through the flow and print every step change."""
+    from recording import load_recording
+    recording = load_recording(recording_path)
+    step = None
+    for timestamp, landmarks in zip(recording.timestamps, recording.landmarks):
+        update = tracker.update(None if np.isnan(landmarks[0, 0]) else landmarks, timestamp)
+        if update is not None and update.step != step:
+            step = update.step
+            print(f"{timestamp - recording.timestamps[0]:6.1f} s  step {step + 1}: {update.step_name} "
+                  f"(lag {update.lag:+.1f} s)")
+    print("Step similarity:")
+    print_summary(tracker)
+
+
+def follow_webcam(tracker):
+    """Follow the webcam through the flow, showing the step, lag and similarity on the feed."""
+    from adaptive import AdaptiveController
+    from landmarks import draw_pose
+    from pipeline import FramePipeline
+
+    controller = AdaptiveController(use_roi=True)
+    threading.Thread(target=controller.warm_up, daemon=True).start()
+
+    def process_frame(frame):
+        pose_landmarks, _ = controller.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        if pose_landmarks:
+            draw_pose(frame, pose_landmarks)
+            update = tracker.update(pose_landmarks)
+            if update is not None:
+                cv2.putText(frame, f"Step {update.step + 1}/{len(tracker.sequence.step_names)}: "
+                                   f"{update.step_name}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
+                cv2.putText(frame, f"Similarity {update.similarity:.2f}  Lag {update.lag:+.1f} s",
+                            (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 0), 2)
+                if update.finished:
+                    cv2.putText(frame, "Flow complete!", (10, 90), cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 255), 2)
+        return frame
+
+    cap = cv2.VideoCapture(0)
+    if not cap.isOpened():
+        print("Error: Could not access the webcam.")
+        return
+    print("Press 'q' to exit, 'r' to restart the flow.")
+    pipeline = FramePipeline(cap, process_frame)
+    pipeline.start()
+    try:
+        while pipeline.running:
+            frame = pipeline.get(timeout=0.1)
+            if frame is not None:
+                cv2.imshow("Pose Flow", frame)
+            key = cv2.waitKey(1) & 0xFF
+            if key == ord('q'):
+                break
+            elif key == ord('r'):
+                tracker.reset()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pipeline.stop()
+        cv2.destroyAllWindows()
+        controller.close()
+    print("Step similarity:")
+    print_summary(tracker)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Follow a live or recorded session through a reference flow.")
+    parser.add_argument("reference", nargs="+",
+                        help="Video, recording (.rec), batch_video results (.npz), image folder or ordered images")
+    parser.add_argument("--replay", metavar="SESSION", help="Score a recorded session instead of the webcam")
+    parser.add_argument("--band", type=int, default=BAND, help="Reference positions searched around the current one")
+    args = parser.parse_args()
+
+    sequence = load_sequence(args.reference)
+    print(f"Reference flow: {len(sequence.step_names)} step(s), {len(sequence)} position(s), "
+          f"{sequence.times[-1] + sequence.durations[-1]:.1f} s.")
+    tracker = SequenceTracker(sequence, band=args.band)
+    if args.replay:
+        replay(tracker, args.replay)
+    else:
+        follow_webcam(tracker)
+
+
+if __name__ == "__main__":
+    main()
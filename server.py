@@ -0,0 +1,295 @@
+import argparse
+import asyncio
+import http.client
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qs, quote
+import cv2
+import mediapipe as mp
+import numpy as np
+from features import extract_features, feature_similarity
+from instrumentation import get_logger
+from landmarks import NUM_LANDMARKS, LANDMARK_FIELDS, landmarks_to_array
+from reference_cache import IMAGE_FOLDER, REFERENCE_SIZE, ReferenceCache, list_images
+from rules import RuleEngine
+
+HOST = "127.0.0.1"
+PORT = 8765
+WORKERS = 2  # Pose inference threads shared by every client
+MAX_QUEUED = 8  # Images allowed to wait for a worker; further requests get 503 Busy
+MAX_BODY = 8 * 1024 * 1024  # Largest accepted request body in bytes
+REQUEST_TIMEOUT = 30  # Seconds a client may take to send a request
+
+logger = get_logger(__name__)
+
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+               413: "Payload Too Large", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+class RequestError(Exception):
+    """A request that cannot be served; carries the HTTP status to answer with."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class PoseService:
+    """
+    Score poses for many thin clients with one shared pool of MediaPipe workers.
+
+    Images are decoded and run through a fixed-size thread pool where each thread owns
+    a still-image Pose graph; MediaPipe releases the GIL, so the event loop keeps serving
+    other clients meanwhile. A semaphore bounds how many images may wait for a worker,
+    so a burst of clients gets a quick 503 instead of an ever-growing backlog. Landmark
+    requests skip inference and are scored directly.
+    """
+
+    def __init__(self, folder=IMAGE_FOLDER, workers=WORKERS, max_queued=MAX_QUEUED):
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix="pose")
+        self.slots = asyncio.Semaphore(workers + max_queued)
+        self.local = threading.local()
+        self.poses = []  # Every worker's graph, closed on shutdown
+        self.poses_lock = threading.Lock()
+        self.rules = RuleEngine()
+        self.references = self._load_references(folder)
+
+    @staticmethod
+    def _load_references(folder):
+        """Describe every reference image once, using the shared landmark cache."""
+        cache = ReferenceCache()
+        cache.build(folder)
+        references = {}
+        for image_path in list_images(folder):
+            landmarks = cache.get(image_path)
+            if landmarks is not None:
+                name = os.path.splitext(os.path.basename(image_path))[0]
+                references[name] = extract_features(landmarks)
+        cache.close()
+        logger.info("Loaded %d reference pose(s).", len(references))
+        return references
+
+    def _detect(self, data):
+        """Decode a JPEG/PNG and detect its pose (runs on a worker thread)."""
+        image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            raise RequestError(400, "Body is not a decodable image.")
+        pose = getattr(self.local, "pose", None)
+        if pose is None:
+            # Requests from different clients interleave, so every image is a still image
+            pose = self.local.pose = mp.solutions.pose.Pose(static_image_mode=True)
+            with self.poses_lock:
+                self.poses.append(pose)
+        image = cv2.resize(image, REFERENCE_SIZE)  # Same size as the reference images
+        result = pose.process(cv2.cvtColor(image, cv2.COLOR_BGR2RGB))
+        return landmarks_to_array(result.pose_landmarks)
+
+    async def detect(self, data):
+        if self.slots.locked():
+            raise RequestError(503, "All pose workers are busy; try again shortly.")
+        async with self.slots:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, self._detect, data)
+
+    def score(self, landmarks, reference=None):
+        """Build the response for a detected (or client-supplied) pose."""
+        if reference is not None and reference not in self.references:
+            raise RequestError(404, f"Unknown reference pose '{reference}'.")
+        response = {"detected": landmarks is not None, "landmarks": None, "reference": reference,
+                    "similarity": None, "violations": []}
+        if landmarks is None:
+            return response
+
+        response["landmarks"] = landmarks.tolist()
+        response["violations"] = self.rules.evaluate(landmarks)
+        if reference is not None:
+            live = extract_features(landmarks)
+            response["similarity"] = float(feature_similarity(self.references[reference], live))
+        return response
+
+    async def handle(self, method, path, headers, body):
+        """Route one request and return (status, JSON-serializable payload)."""
+        url = urlsplit(path)
+        query = parse_qs(url.query)
+        reference = query.get("reference", [None])[0]
+
+        if url.path == "/health":
+            return 200, {"status": "ok"}
+        if url.path == "/references":
+            return 200, {"references": sorted(self.references)}
+        if url.path != "/score":
+            raise RequestError(404, f"No such endpoint: {url.path}")
+        if method != "POST":
+            raise RequestError(405, "Use POST /score.")
+
+        content_type = headers.get("content-type", "").split(";")[0].strip()
+        if content_type == "application/json":
+            try:
+                request = json.loads(body)
+                landmarks = np.asarray(request["landmarks"], dtype=np.float32)
+            except (ValueError, KeyError, TypeError):
+                raise RequestError(400, "Expected JSON like {\"landmarks\": [[x, y, z, visibility], ...]}.")
+            if landmarks.shape != (NUM_LANDMARKS, LANDMARK_FIELDS):
+                raise RequestError(400, f"Landmarks must have shape ({NUM_LANDMARKS}, {LANDMARK_FIELDS}).")
+            reference = request.get("reference", reference)
+            if reference is not None and not isinstance(reference, str):
+                raise RequestError(400, "\"reference\" must be a reference pose name.")
+            return 200, self.score(landmarks, reference)
+
+        if reference is not None and reference not in self.references:
+            raise RequestError(404, f"Unknown reference pose '{reference}'.")  # Fail before inference
+        landmarks = await self.detect(body)
+        return 200, self.score(landmarks, reference)
+
+    async def serve_client(self, reader, writer):
+        """Serve HTTP/1.1 requests on one connection until the client closes it."""
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(read_request(reader), REQUEST_TIMEOUT)
+                except RequestError as e:
+                    await write_response(writer, e.status, {"error": str(e)}, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                method, path, headers, body = request
+                try:
+                    status, payload = await self.handle(method, path, headers, body)
+                except RequestError as e:
+                    status, payload = e.status, {"error": str(e)}
+                except Exception:
+                    logger.exception("Error handling %s %s", method, path)
+                    status, payload = 500, {"error": "Internal error while scoring the pose."}
+                keep_alive = headers.get("connection", "").lower() != "close"
+                await write_response(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        with self.poses_lock:
+            for pose in self.poses:
+                pose.close()
+            self.poses.clear()
+
+
+async def read_request(reader):
+    """Read one HTTP request; returns (method, path, headers, body) or None at end of stream."""
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    try:
+        method, path, _ = request_line.decode("latin-1").split()
+    except ValueError:
+        raise RequestError(400, "Malformed request line.")
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    try:
+        length = int(headers.get("content-length", 0) or 0)
+    except ValueError:
+        raise RequestError(400, "Malformed Content-Length header.")
+    if length < 0:
+        raise RequestError(400, "Malformed Content-Length header.")
+    if length > MAX_BODY:
+        raise RequestError(413, f"Request bodies are limited to {MAX_BODY} bytes.")
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), path, headers, body
+
+
+async def write_response(writer, status, payload, keep_alive=True):
+    body = json.dumps(payload).encode("utf-8")
+    head = (f"HTTP/1.1 {status} {STATUS_TEXT.get(status, '')}\r\n"
+            f"Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    writer.write(head.encode("latin-1") + body)
+    await writer.drain()
+
+
+async def run_server(host=HOST, port=PORT, folder=IMAGE_FOLDER, workers=WORKERS, max_queued=MAX_QUEUED):
+    service = PoseService(folder, workers, max_queued)
+    server = await asyncio.start_server(service.serve_client, host, port)
+    logger.info("Pose service listening on http://%s:%d with %d worker(s).", host, port, workers)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        service.close()
+
+
+class PoseClient:
+    """Minimal blocking client for the pose service, reusing one HTTP connection."""
+
+    def __init__(self, host=HOST, port=PORT, timeout=REQUEST_TIMEOUT):
+        self.connection = http.client.HTTPConnection(host, port, timeout=timeout)
+
+    def _request(self, method, path, body=None, content_type=None):
+        headers = {"Content-Type": content_type} if content_type else {}
+        self.connection.request(method, path, body=body, headers=headers)
+        response = self.connection.getresponse()
+        payload = json.loads(response.read() or b"{}")
+        if response.status != 200:
+            raise RuntimeError(f"{response.status}: {payload.get('error', response.reason)}")
+        return payload
+
+    def references(self):
+        return self._request("GET", "/references")["references"]
+
+    def score_image(self, image, reference=None):
+        """Score a BGR image or encoded JPEG/PNG bytes."""
+        if isinstance(image, np.ndarray):
+            image = cv2.imencode(".jpg", image)[1].tobytes()
+        path = "/score" + (f"?reference={quote(reference)}" if reference else "")
+        return self._request("POST", path, image, "image/jpeg")
+
+    def score_landmarks(self, landmarks, reference=None):
+        """Score a (33, 4) landmark array without sending the image."""
+        body = json.dumps({"landmarks": landmarks_to_array(landmarks).tolist(), "reference": reference})
+        return self._request("POST", "/score", body, "application/json")
+
+    def close(self):
+        self.connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless pose scoring service.")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--pictures", default=IMAGE_FOLDER, help="Folder of reference pose images")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="Number of pose inference threads")
+    parser.add_argument("--max-queued", type=int, default=MAX_QUEUED,
+                        help="Images that may wait for a worker before clients get 503")
+    parser.add_argument("--score", metavar="IMAGE", help="Act as a client: score an image with a running server")
+    parser.add_argument("--reference", help="Reference pose name to compare against (with --score)")
+    args = parser.parse_args()
+
+    if args.score:
+        client = PoseClient(args.host, args.port)
+        with open(args.score, "rb") as f:
+            result = client.score_image(f.read(), args.reference)
+        client.close()
+        result.pop("landmarks")
+        print(json.dumps(result, indent=2))
+        return
+
+    try:
+        asyncio.run(run_server(args.host, args.port, args.pictures, args.workers, args.max_queued))
+    except KeyboardInterrupt:
+        logger.info("Server stopped.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+import threading
+import time
+from collections import namedtuple
+from features import extract_features, feature_similarity
+from landmarks import landmarks_to_array
+from smoothing import HYSTERESIS, DEBOUNCE_TIME, MatchGate, OneEuroFilter
+
+SIMILARITY_THRESHOLD = 0.7  # Default similarity needed to count as a matching pose
+FEEDBACK_DELAY = 2  # Minimum seconds between two rounds of corrective feedback
+HOLD_TIME = 10  # Seconds a pose must be held before moving on to a new reference
+
+# A reference pose with its precomputed features; replaced as a whole so readers never see a half-updated reference
+Reference = namedtuple("Reference", ["image", "landmarks", "version", "features"])
+
+# Outcome of comparing one frame with the session's reference pose
+# ``landmarks`` is the smoothed (33, 4) pose that was scored, or None
+SessionUpdate = namedtuple("SessionUpdate", ["similarity", "feedback_due", "matched", "hold_complete",
+                                             "landmarks"])
+
+
+def _make_reference(image, landmarks, version):
+    features = None if landmarks is None else extract_features(landmarks)
+    return Reference(image, landmarks, version, features)
+
+
+class PoseSession:
+    """
+    State for one student comparing their live pose with a reference pose.
+
+    Holds the reference, the feedback cooldown and the hold timer so several
+    cameras or students can each be tracked independently. The reference is
+    double-buffered: ``set_reference`` builds a new immutable Reference and
+    publishes it with a single assignment, so a frame being scored on another
+    thread keeps a consistent reference and the swap takes effect on the next frame.
+
+    Live landmarks are smoothed with a One-Euro filter before scoring, and the match
+    state goes through a hysteresis band and debounce, so single noisy frames neither
+    fire feedback nor restart the hold timer.
+    """
+
+    def __init__(self, name="session", reference_image=None, reference_landmarks=None,
+                 similarity_threshold=SIMILARITY_THRESHOLD, feedback_delay=FEEDBACK_DELAY,
+                 hold_time=HOLD_TIME, smooth=True, hysteresis=HYSTERESIS, debounce_time=DEBOUNCE_TIME):
+        self.name = name
+        self.reference = _make_reference(reference_image, reference_landmarks, 0)
+        self.similarity_threshold = similarity_threshold
+        self.feedback_delay = feedback_delay
+        self.hold_time = hold_time
+        self.last_feedback_time = 0  # Track the last time feedback was triggered
+        self.pose_match_start_time = None  # Track when the pose starts matching
+        self.landmark_filter = OneEuroFilter() if smooth else None
+        self.match_gate = MatchGate(hysteresis, debounce_time)
+        self.timer_lock = threading.Lock()  # Guards the timers, the filter and the match gate
+
+    @property
+    def reference_image(self):
+        return self.reference.image
+
+    @property
+    def reference_landmarks(self):
+        return self.reference.landmarks
+
+    def set_reference(self, reference_image, reference_landmarks):
+        """Switch to a new reference pose and restart the hold timer. Safe to call from any thread."""
+        with self.timer_lock:
+            self.reference = _make_reference(reference_image, reference_landmarks, self.reference.version + 1)
+            self.pose_match_start_time = None
+            self.match_gate.reset()
+
+    def evaluate(self, pose_landmarks, now=None):
+        """Score a live pose against the reference and update the feedback and hold timers."""
+        now = time.time() if now is None else now
+        reference = self.reference  # Read once so the whole frame uses the same reference
+        landmarks = landmarks_to_array(pose_landmarks)
+        if self.landmark_filter is not None:
+            with self.timer_lock:
+                landmarks = self.landmark_filter.filter(landmarks, now)
+
+        similarity = 0
+        if reference.features is not None and landmarks is not None:
+            similarity = float(feature_similarity(reference.features, extract_features(landmarks)))
+        feedback_due = False
+        hold_complete = False
+
+        with self.timer_lock:
+            if reference is not self.reference:
+                # The reference was swapped while scoring; this frame no longer counts
+                return SessionUpdate(similarity, False, False, False, landmarks)
+
+            matched = self.match_gate.update(similarity, self.similarity_threshold, now)
+            if not matched:
+                # Trigger feedback only after the delay, and never while the pose is on its way into a match
+                if (self.match_gate.is_off(similarity, self.similarity_threshold)
+                        and now - self.last_feedback_time >= self.feedback_delay):
+                    feedback_due = True
+                    self.last_feedback_time = now
+                self.pose_match_start_time = None  # Reset the pose match timer
+            else:
+                if self.pose_match_start_time is None:
+                    self.pose_match_start_time = now  # Start the timer when pose matches
+                elif now - self.pose_match_start_time >= self.hold_time:
+                    self.pose_match_start_time = None  # Reset the timer
+                    hold_complete = True
+
+        return SessionUpdate(similarity, feedback_due, matched, hold_complete, landmarks)
@@ -0,0 +1,83 @@
+import threading
+import numpy as np
+from features import NUM_FEATURES, PoseFeatures, as_features, extract_features, feature_similarity
+from reference_cache import pose_name
+
+
+def calculate_similarity(landmarks_1, landmarks_2):
+    """
+    Compare two poses by their joint angles and limb directions.
+
+    Either argument may be landmarks or PoseFeatures precomputed with
+    ``extract_features``, so a fixed reference is only described once. The score
+    does not depend on where the user stands or how far they are from the camera.
+    """
+    if landmarks_1 is None or landmarks_2 is None:
+        return 0  # If any of the landmarks are missing, return no similarity.
+
+    return float(feature_similarity(as_features(landmarks_1), as_features(landmarks_2)))
+
+
+class PoseLibrary:
+    """
+    Library of reference poses scored against a live pose in a single vectorized pass.
+
+    The features of every reference are computed once when it is added and kept in
+    preallocated (R, F) float32 arrays, so scoring against hundreds of poses is one
+    small matrix-vector product instead of a Python loop.
+    """
+
+    def __init__(self, capacity=64):
+        self.names = []
+        self.count = 0
+        self.weighted = np.zeros((capacity, 2 * NUM_FEATURES), dtype=np.float32)
+        self.weights = np.zeros((capacity, NUM_FEATURES), dtype=np.float32)
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return self.count
+
+    def add(self, name, landmarks):
+        """Add a reference pose and return its index in the library."""
+        features = as_features(landmarks)
+        with self.lock:
+            if self.count == len(self.weights):
+                # Grow by doubling so adding many poses stays amortized O(1)
+                capacity = 2 * len(self.weights)
+                weighted = np.zeros((capacity, 2 * NUM_FEATURES), dtype=np.float32)
+                weights = np.zeros((capacity, NUM_FEATURES), dtype=np.float32)
+                weighted[:self.count] = self.weighted[:self.count]
+                weights[:self.count] = self.weights[:self.count]
+                self.weighted, self.weights = weighted, weights
+            self.weighted[self.count] = features.weighted
+            self.weights[self.count] = features.weights
+            self.names.append(name)
+            self.count += 1
+            return self.count - 1
+
+    def add_from_cache(self, cache, image_paths):
+        """Add every image with cached landmarks, named after its file."""
+        for image_path in image_paths:
+            landmarks = cache.get(image_path)
+            if landmarks is not None:
+                self.add(pose_name(image_path), landmarks)
+
+    def scores(self, landmarks):
+        """Return the similarity of a live pose to every reference as an (R,) array."""
+        live = as_features(landmarks)
+        with self.lock:
+            library = PoseFeatures(self.weighted[:self.count], self.weights[:self.count])
+        return feature_similarity(library, live)
+
+    def best_match(self, landmarks):
+        """Return the name and score of the closest reference pose, or (None, 0) if empty."""
+        if self.count == 0 or landmarks is None:
+            return None, 0
+        scores = self.scores(landmarks)
+        index = int(np.argmax(scores))
+        return self.names[index], float(scores[index])
+
+
+def batch_similarity(reference_landmarks, frames):
+    """Score a (T, 33, 4) batch of recorded frames against one reference pose in one pass."""
+    return feature_similarity(as_features(reference_landmarks), extract_features(frames))
@@ -0,0 +1,117 @@
+import math
+import numpy as np
+from landmarks import NUM_LANDMARKS, LANDMARK_FIELDS
+
+# One-Euro filter settings for normalized landmark coordinates
+MIN_CUTOFF = 1.0  # Hz; lower removes more jitter while the person holds still
+BETA = 20.0  # How quickly the cutoff rises with speed, so real movement is not lagged
+DERIVATIVE_CUTOFF = 1.0  # Hz; smoothing of the speed estimate itself
+
+HYSTERESIS = 0.05  # A matched pose only counts as lost below threshold - HYSTERESIS
+DEBOUNCE_TIME = 0.3  # Seconds a new match state must persist before it is accepted
+
+
+def _alpha(cutoff, interval):
+    """Smoothing factor of a first-order low-pass filter with the given cutoff (Hz)."""
+    tau = 1.0 / (2 * math.pi * cutoff)
+    return 1.0 / (1.0 + tau / interval)
+
+
+class OneEuroFilter:
+    """
+    One-Euro filter over (33, 4) landmark arrays.
+
+    Each coordinate is low-pass filtered with a cutoff that rises with its speed: slow
+    jitter while holding a pose is smoothed heavily, fast movement passes through with
+    little lag. All state lives in arrays allocated once, so a frame costs a few
+    in-place NumPy operations. Visibility is passed through unfiltered.
+    """
+
+    def __init__(self, min_cutoff=MIN_CUTOFF, beta=BETA, derivative_cutoff=DERIVATIVE_CUTOFF):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.derivative_cutoff = derivative_cutoff
+        shape = (NUM_LANDMARKS, LANDMARK_FIELDS - 1)
+        self.value = np.zeros(shape, dtype=np.float32)
+        self.derivative = np.zeros(shape, dtype=np.float32)
+        self.speed = np.zeros(shape, dtype=np.float32)  # Scratch buffers reused every frame
+        self.alpha = np.zeros(shape, dtype=np.float32)
+        self.output = np.zeros((NUM_LANDMARKS, LANDMARK_FIELDS), dtype=np.float32)
+        self.last_time = None
+
+    def reset(self):
+        """Forget the history, e.g. after tracking was lost."""
+        self.last_time = None
+
+    def filter(self, landmarks, timestamp):
+        """Return a filtered copy of (33, 4) landmarks observed at ``timestamp`` (seconds)."""
+        if landmarks is None:
+            self.reset()
+            return None
+        coordinates = landmarks[:, :3]
+        if self.last_time is None or timestamp <= self.last_time:
+            self.value[:] = coordinates
+            self.derivative[:] = 0
+        else:
+            interval = timestamp - self.last_time
+            # Smoothed speed of every coordinate
+            np.subtract(coordinates, self.value, out=self.speed)
+            self.speed /= interval
+            self.derivative += _alpha(self.derivative_cutoff, interval) * (self.speed - self.derivative)
+
+            # Cutoff per coordinate grows with speed; turn it into a per-coordinate alpha
+            np.abs(self.derivative, out=self.alpha)
+            self.alpha *= self.beta
+            self.alpha += self.min_cutoff
+            self.alpha *= 2 * math.pi * interval
+            self.alpha /= self.alpha + 1  # alpha = 1 / (1 + tau / interval) with tau = 1 / (2 pi cutoff)
+
+            np.subtract(coordinates, self.value, out=self.speed)
+            self.speed *= self.alpha
+            self.value += self.speed
+        self.last_time = timestamp
+
+        self.output[:, :3] = self.value
+        self.output[:, 3] = landmarks[:, 3]
+        return self.output.copy()
+
+
+class MatchGate:
+    """
+    Turn a noisy similarity score into a stable matched / not matched state.
+
+    Entering the matched state needs a score of at least the threshold, leaving it needs
+    a score below ``threshold - hysteresis``, and either change must hold for
+    ``debounce_time`` seconds. A single noisy frame therefore neither breaks a hold
+    nor triggers corrective feedback. Each update is O(1).
+    """
+
+    def __init__(self, hysteresis=HYSTERESIS, debounce_time=DEBOUNCE_TIME):
+        self.hysteresis = hysteresis
+        self.debounce_time = debounce_time
+        self.matched = False
+        self.pending_since = None  # When the score first disagreed with the current state
+
+    def reset(self):
+        self.matched = False
+        self.pending_since = None
+
+    def update(self, similarity, threshold, now):
+        """Feed one score and return the debounced match state."""
+        if self.matched:
+            disagrees = similarity < threshold - self.hysteresis
+        else:
+            disagrees = similarity >= threshold
+
+        if not disagrees:
+            self.pending_since = None
+        elif self.pending_since is None:
+            self.pending_since = now
+        if self.pending_since is not None and now - self.pending_since >= self.debounce_time:
+            self.matched = not self.matched
+            self.pending_since = None
+        return self.matched
+
+    def is_off(self, similarity, threshold):
+        """True when the state is settled on not matched: no entry is pending and the score is clearly below."""
+        return not self.matched and self.pending_since is None and similarity < threshold - self.hysteresis
@@ -0,0 +1,138 @@
+import heapq
+import itertools
+import threading
+import time
+from instrumentation import get_logger
+
+SPEECH_RATE = 150  # Words per minute
+MAX_PENDING = 8  # Utterances waiting to be spoken; lower-priority ones are dropped beyond this
+MESSAGE_COOLDOWN = 5.0  # Seconds before the same message may be spoken again
+MAX_AGE = 3.0  # Utterances that waited longer than this are stale and skipped
+
+logger = get_logger(__name__)
+
+# Priorities: lower numbers are spoken first
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+
+class SpeechWorker:
+    """
+    Speak feedback on one long-lived thread fed by a bounded priority queue.
+
+    Duplicate messages already waiting are coalesced, a message is not repeated within
+    its cooldown, and utterances that waited too long are dropped, so callers never
+    block on speech and the number of threads stays constant.
+
+    With a phrase cache, messages that have a pre-synthesized clip are played through
+    the mixer and only unknown messages go through the speech engine. The known phrases
+    are rendered on the speech thread when it first starts.
+    """
+
+    def __init__(self, rate=SPEECH_RATE, max_pending=MAX_PENDING, cooldown=MESSAGE_COOLDOWN,
+                 max_age=MAX_AGE, phrase_cache=None, phrases=()):
+        self.rate = rate
+        self.phrase_cache = phrase_cache
+        self.phrases = list(phrases)  # Messages to pre-render into the phrase cache
+        self.max_pending = max_pending
+        self.cooldown = cooldown
+        self.max_age = max_age
+        self.pending = []  # Heap of (priority, sequence, enqueue time, message)
+        self.pending_messages = set()
+        self.last_spoken = {}  # message -> time it was last spoken
+        self.sequence = itertools.count()
+        self.condition = threading.Condition()
+        self.thread = None
+        self.running = False
+
+    def start(self):
+        """Start the speech thread if it is not running yet."""
+        with self.condition:
+            if self.running:
+                return
+            self.running = True
+        self.thread = threading.Thread(target=self._run, name="speech", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+        if self.thread is not None:
+            self.thread.join(timeout=2)
+
+    def say(self, message, priority=PRIORITY_NORMAL, cooldown=None):
+        """Queue a message without blocking. Returns False if it was coalesced or dropped."""
+        now = time.monotonic()
+        cooldown = self.cooldown if cooldown is None else cooldown
+        with self.condition:
+            if message in self.pending_messages:
+                return False  # Already waiting to be spoken
+            if now - self.last_spoken.get(message, float("-inf")) < cooldown:
+                return False  # Spoken too recently
+
+            if len(self.pending) >= self.max_pending:
+                # Make room by dropping the least urgent, newest utterance if the new one is more urgent
+                worst = max(self.pending)
+                if priority >= worst[0]:
+                    return False
+                self.pending.remove(worst)
+                heapq.heapify(self.pending)
+                self.pending_messages.discard(worst[3])
+
+            heapq.heappush(self.pending, (priority, next(self.sequence), now, message))
+            self.pending_messages.add(message)
+            self.condition.notify()
+        return True
+
+    def _next_message(self):
+        """Wait for the next utterance that is not stale, or None when stopping."""
+        with self.condition:
+            while self.running:
+                while self.pending:
+                    _, _, queued_at, message = heapq.heappop(self.pending)
+                    self.pending_messages.discard(message)
+                    if time.monotonic() - queued_at <= self.max_age:
+                        self.last_spoken[message] = time.monotonic()
+                        return message
+                self.condition.wait()
+        return None
+
+    def _run(self):
+        # pyttsx3 engines must be driven from the thread that created them; importing it
+        # here also keeps speech start-up off the caller's thread
+        try:
+            import pyttsx3
+            engine = pyttsx3.init()
+            engine.setProperty("rate", self.rate)
+        except Exception as e:
+            logger.error("Error initializing text-to-speech engine: %s", e)
+            engine = None
+
+        if engine is not None and self.phrase_cache is not None and self.phrases:
+            try:
+                rendered = self.phrase_cache.render(self.phrases, engine)
+                if rendered:
+                    logger.info("Rendered %d feedback phrase(s) to '%s'.", rendered, self.phrase_cache.directory)
+            except Exception as e:
+                logger.error("Error rendering feedback phrases: %s", e)
+            engine.setProperty("rate", self.rate)
+
+        while True:
+            message = self._next_message()
+            if message is None:
+                break
+            if self.phrase_cache is not None:
+                duration = self.phrase_cache.play(message)
+                if duration is not None:
+                    time.sleep(duration)  # Let the clip finish before the next utterance
+                    continue
+            if engine is None:
+                logger.warning("Text-to-speech engine not available: %s", message)
+                continue
+            try:
+                engine.say(message)
+                engine.runAndWait()
+            except Exception as e:
+                logger.error("Error speaking feedback: %s", e)
@@ -0,0 +1,69 @@
+import argparse
+import os
+import shlex
+import subprocess
+import sys
+import time
+
+# Entry points import this module first so their marks are measured from (nearly) process start
+START = time.perf_counter()
+
+PROFILE_ENV = "POSE_STARTUP_PROFILE"  # Set to 1 to print startup marks
+EXIT_ENV = "POSE_STARTUP_EXIT"  # Set to a mark name to exit as soon as that mark is reached
+MARK_PREFIX = "[startup]"
+
+marks = {}  # mark name -> seconds since START
+
+
+def mark(name):
+    """Record the first time a startup milestone is reached, e.g. "first_window" or "first_inference"."""
+    if name in marks:
+        return
+    marks[name] = time.perf_counter() - START
+    if os.environ.get(PROFILE_ENV):
+        print(f"{MARK_PREFIX} {name}: {marks[name] * 1000:.0f} ms", flush=True)
+    if os.environ.get(EXIT_ENV) == name:
+        os._exit(0)  # Skip teardown; only the startup time is being measured
+
+
+def profile(script, exit_after, runs, timeout):
+    """
+    Run an entry point several times and return {mark: [seconds, ...]}. ``script`` may carry
+    its own arguments, e.g. "compare.py --reference pictures/standing.jpg".
+    """
+    command = [sys.executable, *shlex.split(script)]
+    env = dict(os.environ, **{PROFILE_ENV: "1", EXIT_ENV: exit_after})
+    results = {}
+    for _ in range(runs):
+        start = time.perf_counter()
+        try:
+            output = subprocess.run(command, env=env, capture_output=True, text=True,
+                                    timeout=timeout).stdout
+        except subprocess.TimeoutExpired as e:
+            output = e.stdout.decode() if isinstance(e.stdout, bytes) else (e.stdout or "")
+            print(f"{script}: '{exit_after}' not reached within {timeout} s.")
+        results.setdefault("process", []).append(time.perf_counter() - start)
+        for line in output.splitlines():
+            if line.startswith(MARK_PREFIX):
+                name, _, value = line[len(MARK_PREFIX):].partition(":")
+                results.setdefault(name.strip(), []).append(float(value.split()[0]) / 1000)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report time-to-first-window and time-to-first-inference.")
+    parser.add_argument("scripts", nargs="+",
+                        help="Entry points to profile, each with its arguments in one quoted string, "
+                             "e.g. main_ui.py \"compare.py --reference pictures/standing.jpg\"")
+    parser.add_argument("--exit-after", default="inference_ready",
+                        help="Mark after which each run stops; inference_ready needs no user input")
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=60, help="Seconds to wait for each run")
+    args = parser.parse_args()
+
+    for script in args.scripts:
+        print(f"{script}:")
+        for name, values in profile(script, args.exit_after, args.runs, args.timeout).items():
+            values = sorted(values)
+            print(f"  {name:20s} median {values[len(values) // 2] * 1000:7.0f} ms  "
+                  f"(best {values[0] * 1000:.0f} ms, {len(values)} run(s))")
@@ -0,0 +1,211 @@
+import argparse
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import partial
+import cv2
+import numpy as np
+from landmarks import array_to_landmarks, draw_pose
+from pose_workers import detect_image, process_pool
+from reference_cache import IMAGE_FOLDER, REFERENCE_SIZE, ReferenceCache, list_images, load_reference_image
+
+IMAGE_MEMO_SIZE = 32  # Decoded images kept in memory; landmarks are small and always kept
+CHUNK_SIZE = 8  # Images sent to a worker at a time
+
+
+class StillImage:
+    """
+    Analysis of one image at one resolution: the resized image, its landmarks, and an
+    annotation layer drawn on first use.
+
+    The image is read-only and never drawn on; ``annotated()`` composes the layer
+    onto a fresh copy, so rechecking or redrawing never piles annotations up.
+    """
+
+    def __init__(self, path, image, landmarks):
+        self.path = path
+        self.image = image
+        self.landmarks = landmarks  # (33, 4) float32 array, or None when no pose was found
+        self.layer = None  # (BGR drawing, mask of the pixels it covers)
+
+    @property
+    def size(self):
+        return self.image.shape[1], self.image.shape[0]
+
+    def annotation_layer(self):
+        """Landmarks drawn on an empty canvas, with the mask of drawn pixels."""
+        if self.layer is None:
+            canvas = np.zeros_like(self.image)
+            if self.landmarks is not None:
+                draw_pose(canvas, array_to_landmarks(self.landmarks))
+            self.layer = canvas, canvas.any(axis=2)
+        return self.layer
+
+    def annotated(self):
+        """A copy of the image with the annotation layer on top."""
+        canvas, mask = self.annotation_layer()
+        image = self.image.copy()
+        image[mask] = canvas[mask]
+        return image
+
+
+class StillImageAnalyzer:
+    """
+    Shared still-image pose analysis for the apps.
+
+    Results are memoized per image file and resolution, keyed by absolute path, file
+    modification time and size, so an unchanged image is detected at most once and
+    an edited one is detected again. At the reference cache's resolution landmarks
+    also go to the on-disk ReferenceCache, so they survive restarts.
+    """
+
+    def __init__(self, cache=None, size=REFERENCE_SIZE, memo_size=IMAGE_MEMO_SIZE):
+        self.cache = cache if cache is not None else ReferenceCache(size=size)
+        self.size = tuple(size)
+        self.memo_size = memo_size
+        self.landmarks = {}  # key -> landmarks (or None when no pose was found)
+        self.images = OrderedDict()  # key -> StillImage, least recently used first
+        self.lock = threading.Lock()
+        self.detections = 0  # Images that needed MediaPipe
+        self.hits = 0  # Analyses answered from the memo or the disk cache
+
+    def _key(self, image_path, size):
+        try:
+            st = os.stat(image_path)
+        except OSError:
+            return None
+        return os.path.abspath(image_path), st.st_mtime_ns, st.st_size, size
+
+    def _detect(self, image_path, image, size):
+        """Landmarks for a resized image, from the disk cache when it has this resolution."""
+        if size == self.cache.size:
+            landmarks = self.cache.get(image_path)
+            if landmarks is not None:
+                self.hits += 1
+                return landmarks
+        landmarks = self.cache.detect(image)
+        self.detections += 1
+        if landmarks is not None and size == self.cache.size:
+            self.cache.put(image_path, landmarks)
+            self.cache.save()
+        return landmarks
+
+    def _remember(self, key, still):
+        with self.lock:
+            self.images[key] = still
+            self.images.move_to_end(key)
+            while len(self.images) > self.memo_size:
+                self.images.popitem(last=False)
+
+    def analyze(self, image_path, size=None, image=None):
+        """
+        Return the StillImage for a file at ``size`` (default: the reference size), or
+        None when the file cannot be read. ``image`` may pass an already decoded copy.
+        """
+        size = tuple(size or self.size)
+        key = self._key(image_path, size)
+        if key is None:
+            return None
+        with self.lock:
+            still = self.images.get(key)
+            if still is not None:
+                self.images.move_to_end(key)
+                self.hits += 1
+                return still
+
+        if image is None:
+            image = load_reference_image(image_path, size)
+            if image is None:
+                return None
+        elif (image.shape[1], image.shape[0]) != size:
+            image = cv2.resize(image, size)
+        else:
+            image = image.copy()  # The caller keeps its own array writable
+        image.setflags(write=False)  # Shared by every caller; annotate with annotated()
+
+        with self.lock:
+            known = key in self.landmarks
+            landmarks = self.landmarks.get(key)
+        if known:
+            self.hits += 1
+        else:
+            landmarks = self._detect(image_path, image, size)
+            with self.lock:
+                self.landmarks[key] = landmarks
+        still = StillImage(image_path, image, landmarks)
+        self._remember(key, still)
+        return still
+
+    def analyze_folder(self, folder=IMAGE_FOLDER, size=None, workers=None):
+        """
+        Detect every image in a folder (or list of paths) on a process pool.
+
+        Images already memoized or in the disk cache are skipped. Returns a dict
+        of path -> landmarks (None where no pose was found); ``analyze()`` on
+        any of them afterwards needs no detection.
+        """
+        size = tuple(size or self.size)
+        image_paths = list_images(folder) if isinstance(folder, str) else list(folder)
+        results, pending = {}, []
+        for image_path in image_paths:
+            key = self._key(image_path, size)
+            if key is None:
+                continue
+            with self.lock:
+                known = key in self.landmarks
+                landmarks = self.landmarks.get(key)
+            if not known and size == self.cache.size:
+                landmarks = self.cache.get(image_path)
+                known = landmarks is not None
+            if known:
+                self.hits += 1
+                results[image_path] = landmarks
+                with self.lock:
+                    self.landmarks[key] = landmarks
+            else:
+                pending.append((image_path, key))
+
+        if pending:
+            print(f"Detecting poses in {len(pending)} image(s)...")
+            keys = dict(pending)
+            with process_pool(workers) as executor:
+                paths = [image_path for image_path, _ in pending]
+                for image_path, landmarks in executor.map(partial(detect_image, size=size), paths,
+                                                          chunksize=CHUNK_SIZE):
+                    self.detections += 1
+                    results[image_path] = landmarks
+                    with self.lock:
+                        self.landmarks[keys[image_path]] = landmarks
+                    if landmarks is not None and size == self.cache.size:
+                        self.cache.put(image_path, landmarks)
+            self.cache.save()
+        return results
+
+    def warm_up(self):
+        """Build the MediaPipe graph now, e.g. from a background thread."""
+        self.cache.detect(np.zeros((self.size[1], self.size[0], 3), dtype=np.uint8))
+
+    def close(self):
+        self.cache.save()
+        self.cache.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Detect the poses in a folder of images on several processes.")
+    parser.add_argument("folder", nargs="?", default=IMAGE_FOLDER, help="Folder of images")
+    parser.add_argument("--size", default="x".join(map(str, REFERENCE_SIZE)), help="Resolution, e.g. 640x480")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    args = parser.parse_args()
+
+    analyzer = StillImageAnalyzer()
+    start = time.perf_counter()
+    results = analyzer.analyze_folder(args.folder, tuple(int(v) for v in args.size.split("x")), args.workers)
+    elapsed = time.perf_counter() - start
+    for path, landmarks in results.items():
+        if landmarks is None:
+            print(f"No pose detected in {path}.")
+    found = sum(landmarks is not None for landmarks in results.values())
+    print(f"{len(results)} image(s), {found} with a pose, {analyzer.detections} detected "
+          f"and {analyzer.hits} cached in {elapsed:.2f} s.")
+    analyzer.close()
@@ -0,0 +1,31 @@
+import numpy as np
+from landmarks import NUM_LANDMARKS, LANDMARK_FIELDS, PoseLandmark as P
+
+FPS = 30.0
+
+
+def pose(arms=np.pi / 2, knees_out=False):
+    """
+    A standing person as a (33, 4) landmark array with both arms raised ``arms`` radians
+    from hanging down (out to the sides by default), optionally with the knees bent outwards.
+    """
+    landmarks = np.zeros((NUM_LANDMARKS, LANDMARK_FIELDS), dtype=np.float32)
+    landmarks[:, 3] = 1.0
+    points = {
+        P.LEFT_SHOULDER: (0.45, 0.3), P.RIGHT_SHOULDER: (0.55, 0.3),
+        P.LEFT_HIP: (0.46, 0.55), P.RIGHT_HIP: (0.54, 0.55),
+        P.LEFT_KNEE: (0.46, 0.7), P.RIGHT_KNEE: (0.54, 0.7),
+        P.LEFT_ANKLE: (0.46, 0.85), P.RIGHT_ANKLE: (0.54, 0.85),
+    }
+    for shoulder, elbow, wrist, side in [(P.LEFT_SHOULDER, P.LEFT_ELBOW, P.LEFT_WRIST, -1),
+                                         (P.RIGHT_SHOULDER, P.RIGHT_ELBOW, P.RIGHT_WRIST, 1)]:
+        x, y = points[shoulder]
+        direction = np.array([side * np.sin(arms), np.cos(arms)]) * 0.1
+        points[elbow] = (x + direction[0], y + direction[1])
+        points[wrist] = (x + 2 * direction[0], y + 2 * direction[1])
+    if knees_out:
+        points.update({P.LEFT_KNEE: (0.35, 0.6), P.LEFT_ANKLE: (0.45, 0.62),
+                       P.RIGHT_KNEE: (0.65, 0.6), P.RIGHT_ANKLE: (0.55, 0.62)})
+    for index, (x, y) in points.items():
+        landmarks[index, :2] = x, y
+    return landmarks
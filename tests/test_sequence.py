@@ -0,0 +1,39 @@
+import numpy as np
+from poses import FPS, pose
+from recording import SessionRecorder
+from sequence import ReferenceSequence, SequenceTracker, replay
+
+
+def flow(seconds, move_seconds):
+    """Arms sweep up over ``move_seconds`` and are then held up until ``seconds``."""
+    times = np.arange(0, seconds, 1 / FPS)
+    return times, [pose(np.pi * min(t / move_seconds, 1.0)) for t in times]
+
+
+def record(path, times, landmarks):
+    recorder = SessionRecorder(str(path))
+    for timestamp, pose_landmarks in zip(times, landmarks):
+        recorder.append(pose_landmarks, timestamp)
+    recorder.close()
+    return str(path)
+
+
+def test_flow_ending_in_a_hold_finishes(tmp_path):
+    teacher = record(tmp_path / "teacher.rec", *flow(10, 8))
+    student = record(tmp_path / "student.rec", *flow(40, 8))
+    tracker = SequenceTracker(ReferenceSequence.from_recording(teacher))
+
+    replay(tracker, student)
+    assert tracker.last_update.finished
+    assert tracker.last_update.progress == 1.0
+
+
+def test_flow_does_not_finish_before_the_hold_is_over():
+    times, landmarks = flow(40, 8)
+    tracker = SequenceTracker(ReferenceSequence.from_timeline(*flow(10, 8)))
+    finished_at = None
+    for timestamp, pose_landmarks in zip(times, landmarks):
+        if tracker.update(pose_landmarks, timestamp).finished and finished_at is None:
+            finished_at = timestamp
+    assert finished_at is not None
+    assert 9.5 <= finished_at <= 11.0
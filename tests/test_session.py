@@ -0,0 +1,37 @@
+import numpy as np
+from poses import FPS, pose
+from session import PoseSession
+
+
+def wrong_pose():
+    """Arms up and knees out, well below the match threshold against arms out."""
+    return pose(arms=np.pi, knees_out=True)
+
+
+def run(session, landmarks, seconds, start=100.0):
+    return [session.evaluate(landmarks, start + frame / FPS) for frame in range(int(seconds * FPS))]
+
+
+def test_perfect_pose_never_gets_feedback():
+    reference = pose()
+    session = PoseSession(reference_landmarks=reference)
+    updates = run(session, reference, 5)
+    assert updates[0].similarity > 0.99
+    assert not any(update.feedback_due for update in updates)
+    assert updates[-1].matched
+
+
+def test_reentering_the_pose_gets_no_feedback():
+    reference = pose()
+    session = PoseSession(reference_landmarks=reference)
+    run(session, reference, 2)
+    run(session, wrong_pose(), 0.5, start=102.0)  # Leaves the match; feedback is due again by 105
+    updates = run(session, reference, 2, start=105.0)
+    assert not any(update.feedback_due for update in updates)
+
+
+def test_wrong_pose_gets_feedback():
+    session = PoseSession(reference_landmarks=pose())
+    updates = run(session, wrong_pose(), 5)
+    assert updates[0].similarity < session.similarity_threshold
+    assert sum(update.feedback_due for update in updates) >= 2
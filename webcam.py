@@ -1,81 +1,118 @@
+from startup import mark  # First, so startup marks are measured from process start
+import argparse
+import json
+import threading
 import cv2
-import mediapipe as mp
+from pipeline import FramePipeline
+from frame_sources import WindowSink, add_source_arguments, sink_from_args, source_from_args
+from adaptive import AdaptiveController
+from landmarks import draw_pose
+from instrumentation import get_logger, metrics
 
-# Initialize MediaPipe Pose detection
-mp_pose = mp.solutions.pose
-mp_drawing = mp.solutions.drawing_utils
-pose = mp_pose.Pose()
+# Adjusts frame skipping, resolution and model complexity to keep up with the camera
+controller = AdaptiveController(use_roi=True)
 
 # Counter to track how many times a pose has been detected
 detection_counter = 0
 
+logger = get_logger(__name__)
+show_overlay = False  # Draw FPS and per-stage latency on the feed (toggle with 'o')
 
-def detect_pose_webcam():
+
+def process_frame(frame):
     """
-    Detect pose from the webcam feed, track detection counts, and allow user to quit with 'q'.
+    Detect pose in a single frame and draw the landmarks and detection count on it.
+    Runs on the pipeline's inference thread.
     """
     global detection_counter
 
-    # Open the webcam
-    cap = cv2.VideoCapture(0)
-    if not cap.isOpened():
-        print("Error: Could not access the webcam.")
-        return
+    # Convert the frame to RGB
+    with metrics.span("preprocess"):
+        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
 
-    print("Press 'q' to exit, 'r' to reset the detection counter.")
+    # Process the frame for pose detection (skipped frames reuse extrapolated landmarks)
+    pose_landmarks, inferred = controller.process(rgb_frame)
+    if inferred:
+        mark("first_inference")
 
-    try:
-        frame_skip = 2  # Process every nth frame to improve performance
-        frame_count = 0
+    # If landmarks are detected, draw them and increment the counter
+    if pose_landmarks:
+        with metrics.span("drawing"):
+            draw_pose(frame, pose_landmarks)
+        if inferred:
+            detection_counter += 1
+            logger.debug("Pose Detected! Count: %d", detection_counter)
 
-        while cap.isOpened():
-            ret, frame = cap.read()
-            if not ret:
-                print("Error: Failed to capture frame from webcam.")
-                break
+    # Display the detection count on the frame
+    cv2.putText(frame, f"Detections: {detection_counter}", (10, 30),
+                cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+    if show_overlay:
+        metrics.overlay(frame)
+    return frame
 
-            frame_count += 1
-            if frame_count % frame_skip != 0:
-                continue  # Skip frames to improve performance
 
-            # Convert the frame to RGB
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+def detect_pose_webcam(cap=None, sink=None):
+    """
+    Detect pose from the webcam feed, track detection counts, and allow user to quit with 'q'.
+    ``cap`` may be any frame source (the webcam by default) and ``sink`` a NullSink to run without windows.
+    """
+    global detection_counter, show_overlay
 
-            # Process the frame for pose detection
-            result = pose.process(rgb_frame)
+    # Load MediaPipe while the camera opens
+    threading.Thread(target=lambda: (controller.warm_up(), mark("inference_ready")), daemon=True).start()
 
-            # If landmarks are detected, draw them and increment the counter
-            if result.pose_landmarks:
-                detection_counter += 1
-                mp_drawing.draw_landmarks(frame, result.pose_landmarks, mp_pose.POSE_CONNECTIONS)
-                print(f"Pose Detected! Count: {detection_counter}")
+    # Open the webcam
+    cap = cap if cap is not None else cv2.VideoCapture(0)
+    sink = sink or WindowSink()
+    if not cap.isOpened():
+        print("Error: Could not access the webcam.")
+        return
 
-            # Display the detection count on the frame
-            cv2.putText(frame, f"Detections: {detection_counter}", (10, 30),
-                        cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
+    print("Press 'q' to exit, 'r' to reset the detection counter, 'o' to toggle the performance overlay.")
+    metrics.start_export()  # Only when $POSE_METRICS_FILE is set
 
-            # Display the frame
-            cv2.imshow("Pose Detection - Webcam", frame)
+    pipeline = FramePipeline(cap, process_frame)
+    pipeline.start()
 
-            # Break the loop on 'q' key press or reset counter on 'r'
-            key = cv2.waitKey(1) & 0xFF
+    try:
+        while pipeline.running:
+            # Display the most recent processed frame
+            frame = pipeline.get(timeout=0.1)
+            with metrics.span("display"):
+                if frame is not None:
+                    sink.show("Pose Detection - Webcam", frame)
+                key = sink.poll_key(1)
+            if frame is not None:
+                metrics.frame_done()
+                mark("first_window")
+
+            # Break the loop on 'q' key press, reset counter on 'r', toggle the overlay on 'o'
             if key == ord('q'):
                 print("Stopping webcam detection loop...")
                 break
             elif key == ord('r'):
                 detection_counter = 0
                 print("Detection counter reset.")
+            elif key == ord('o'):
+                show_overlay = not show_overlay
 
     except KeyboardInterrupt:
         print("\nKeyboard Interrupt detected. Exiting the webcam detection loop.")
     finally:
-        # Release the webcam and destroy windows
-        cap.release()
-        cv2.destroyAllWindows()
+        # Stop the pipeline, release the webcam and destroy windows
+        pipeline.stop()
+        sink.close()
         print(f"Total poses detected: {detection_counter}")
 
 
 if __name__ == "__main__":
-    detect_pose_webcam()
-    pose.close()
+    parser = argparse.ArgumentParser(description="Detect poses in a live feed.")
+    add_source_arguments(parser)
+    args = parser.parse_args()
+    sink = sink_from_args(args)
+    detect_pose_webcam(source_from_args(args), sink)
+    if args.headless:
+        print(f"Run: {json.dumps(sink.summary())}")
+        print(f"Stages: {json.dumps(metrics.summary())}")
+    controller.close()
     print("Program terminated gracefully.")
\ No newline at end of file